@@ -0,0 +1,398 @@
+"""Headless HTTP scoring service with request micro-batching.
+
+Runs on asyncio with no dependencies beyond the model's own. Concurrent
+requests are queued and coalesced into small batches (bounded by
+``--max-batch-size`` and ``--max-wait-ms``) that are scored in a single
+forest call on a worker thread, so the event loop keeps accepting
+connections while the forest runs. The model is served through a
+``ModelManager``, so a new artifact is picked up without a restart; every
+batch is scored on one model snapshot. Scored batches are appended to the
+prediction history (``--log``) by its background writer and counted by
+the drift monitor (``--drift-reference``), which prints an alert when the
+inputs stop matching the reference profile. With ``--shadow-model`` every
+batch is also scored by a candidate model on a background process pool
+once its responses are sent, and the comparison is reported in ``/stats``.
+
+    python api_server.py --port 8000
+
+Endpoints:
+    POST /predict   one patient as a JSON object keyed by EXPECTED_COLUMNS,
+                    or a JSON list of such objects
+    GET  /stats     latency percentiles, queue depth, batch sizes, drift status
+                    and the shadow comparison
+    GET  /metrics   counters and stage histograms in Prometheus text format
+    GET  /health    liveness check
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from inference import EXPECTED_COLUMNS, FEATURE_RANGES, MODEL_PATH, RISK_MAPPING, risk_labels
+from metrics import REGISTRY
+from drift_monitor import DRIFT_REFERENCE, DriftMonitor
+from model_manager import DEFAULT_POLL_INTERVAL, ModelManager
+from prediction_log import PREDICTION_LOG, PredictionLog
+from shadow import SHADOW_MODEL, ShadowScorer, format_report
+
+MAX_BODY_BYTES = 1 << 20
+
+
+class RequestError(Exception):
+    """Client error reported back as HTTP 400."""
+
+
+class LatencyStats:
+    """Counts and latency percentiles over a window of recent samples."""
+
+    def __init__(self, window=10_000):
+        self.count = 0
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.count += 1
+        self._samples.append(seconds)
+
+    def snapshot(self):
+        if not self._samples:
+            return {"count": self.count}
+        ordered = np.sort(np.fromiter(self._samples, dtype=np.float64))
+        pct = lambda q: float(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000)
+        return {
+            "count": self.count,
+            "mean_ms": float(ordered.mean() * 1000),
+            "p50_ms": pct(0.50),
+            "p90_ms": pct(0.90),
+            "p99_ms": pct(0.99),
+            "max_ms": float(ordered[-1] * 1000),
+        }
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row requests into batched forest calls.
+
+    A batch is sent as soon as it holds ``max_batch_size`` rows or the oldest
+    queued row has waited ``max_wait_ms``, whichever comes first.
+    """
+
+    def __init__(self, manager, max_batch_size=64, max_wait_ms=2.0, prediction_log=None, drift_monitor=None,
+                 shadow=None):
+        self.manager = manager
+        self.prediction_log = prediction_log
+        self.drift_monitor = drift_monitor
+        self.shadow = shadow
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.rows = 0
+        self.max_queue_depth = 0
+        self.bookkeeping_errors = 0
+        self.last_bookkeeping_error = None
+        self.batch_latency = LatencyStats()
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, features):
+        """Queue one feature vector and wait for ``(classes, probabilities)``."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((features, future))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Drain anything else that is already waiting, up to the batch bound
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            X = np.stack([features for features, _ in batch])
+            start = time.perf_counter()
+            try:
+                active = self.manager.current()
+                if active is None:
+                    raise RuntimeError("no model loaded")
+                proba = await loop.run_in_executor(None, active.model.predict_proba, X)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+            self.batch_latency.record(elapsed)
+            REGISTRY.observe("api_forest_call", elapsed)
+            self.batches += 1
+            self.rows += len(batch)
+            for (_, future), row in zip(batch, proba):
+                if not future.done():
+                    future.set_result((active.model.classes_, row))
+            # The responses are already resolved; history, drift and the candidate only get a copy
+            if self.prediction_log is not None:
+                self._guarded(self.prediction_log.record_many, X, active.model.classes_, proba, active.version,
+                              elapsed * 1000, source="api")
+            if self.drift_monitor is not None:
+                self._guarded(lambda: self.drift_monitor.observe_many(X, risk_labels(active.model.classes_, proba)))
+            if self.shadow is not None:
+                self._guarded(self.shadow.submit, X, active.model.classes_, proba, elapsed)
+
+    def _guarded(self, step, *args, **kwargs):
+        # Bookkeeping after a batch must never end the batching task; count the failure instead
+        try:
+            step(*args, **kwargs)
+        except Exception as e:
+            self.bookkeeping_errors += 1
+            self.last_bookkeeping_error = f"{type(e).__name__}: {e}"
+            REGISTRY.inc("api_bookkeeping_errors")
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "bookkeeping_errors": self.bookkeeping_errors,
+            "last_bookkeeping_error": self.last_bookkeeping_error,
+            "forest_call": self.batch_latency.snapshot(),
+        }
+
+
+def parse_patient(record):
+    # Convert one JSON object into a feature vector in EXPECTED_COLUMNS order
+    if not isinstance(record, dict):
+        raise RequestError("each patient must be a JSON object")
+    missing = [col for col in EXPECTED_COLUMNS if col not in record]
+    if missing:
+        raise RequestError(f"Missing required columns: {', '.join(missing)}")
+    features = np.empty(len(EXPECTED_COLUMNS), dtype=np.float32)
+    for i, col in enumerate(EXPECTED_COLUMNS):
+        value = record[col]
+        # float() would take true/false as 1/0; NaN and infinities fail the range test below
+        if isinstance(value, bool):
+            raise RequestError(f"{col} must be a number")
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise RequestError(f"{col} must be a number")
+        low, high = FEATURE_RANGES[col]
+        if not low <= value <= high:
+            raise RequestError(f"{col} must be between {low} and {high}, not {value}")
+        features[i] = value
+    return features
+
+
+def format_result(classes, proba):
+    predicted = classes[int(np.argmax(proba))]
+    return {
+        "risk_level": RISK_MAPPING[predicted],
+        "class": int(predicted),
+        "probabilities": {RISK_MAPPING[cls]: float(p) for cls, p in zip(classes, proba)},
+    }
+
+
+class ScoringServer:
+    """Minimal HTTP/1.1 server (keep-alive, JSON bodies) in front of a MicroBatcher."""
+
+    def __init__(self, manager, max_batch_size=64, max_wait_ms=2.0, prediction_log=None, drift_monitor=None,
+                 shadow=None):
+        self.manager = manager
+        self.prediction_log = prediction_log
+        self.drift_monitor = drift_monitor
+        self.shadow = shadow
+        self.batcher = MicroBatcher(manager, max_batch_size, max_wait_ms, prediction_log, drift_monitor, shadow)
+        self.request_latency = LatencyStats()
+        self.errors = 0
+        self.started = time.time()
+
+    async def predict(self, payload):
+        records = payload if isinstance(payload, list) else [payload]
+        vectors = [parse_patient(record) for record in records]
+        scored = await asyncio.gather(*(self.batcher.submit(v) for v in vectors))
+        results = [format_result(classes, proba) for classes, proba in scored]
+        return results if isinstance(payload, list) else results[0]
+
+    def stats(self):
+        return {
+            "uptime_s": time.time() - self.started,
+            "errors": self.errors,
+            "requests": self.request_latency.snapshot(),
+            "batching": self.batcher.stats(),
+            "model": self.manager.stats(),
+            "prediction_log": self.prediction_log.stats() if self.prediction_log else None,
+            "drift": self.drift_monitor.stats() if self.drift_monitor else None,
+            "shadow": self.shadow.report() if self.shadow else None,
+        }
+
+    async def route(self, method, path, body):
+        if method == "POST" and path == "/predict":
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                raise RequestError("request body is not valid JSON")
+            return 200, await self.predict(payload)
+        if method == "GET" and path == "/stats":
+            return 200, self.stats()
+        if method == "GET" and path == "/metrics":
+            return 200, REGISTRY.render()
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok"}
+        return 404, {"error": f"no route for {method} {path}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                # Without a usable length the body cannot be skipped, so these close the connection
+                if length < 0:
+                    status, response = 400, {"error": "invalid Content-Length"}
+                    body = None
+                elif length > MAX_BODY_BYTES:
+                    status, response = 413, {"error": "request body too large"}
+                    body = None
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, response = await self.route(method, path.split("?", 1)[0], body)
+                    except RequestError as e:
+                        status, response = 400, {"error": str(e)}
+                    except Exception as e:
+                        status, response = 500, {"error": f"Prediction error: {e}"}
+
+                if status >= 400:
+                    self.errors += 1
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version == "HTTP/1.1" and body is not None)
+                # Plain strings (the metrics page) go out as text, everything else as JSON
+                if isinstance(response, str):
+                    payload, content_type = response.encode(), "text/plain; version=0.0.4"
+                else:
+                    payload, content_type = json.dumps(response).encode(), "application/json"
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if path.startswith("/predict"):
+                    elapsed = time.perf_counter() - start
+                    self.request_latency.record(elapsed)
+                    REGISTRY.observe("api_request", elapsed)
+                    REGISTRY.inc("api_requests")
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port, ready=None):
+        """Serve until cancelled; ``ready`` (an asyncio.Event) is set once listening."""
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+def print_drift_alert(alert):
+    drifted = ", ".join(f"{col} (PSI {value:.3f})" for col, value in alert["psi"].items())
+    print(f"drift alert, window {alert['window']}: {drifted}", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the lung cancer risk scoring API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default=MODEL_PATH, help="model artifact or version directory")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="seconds between checks for a new model artifact (0 disables reloading)")
+    parser.add_argument("--log", default=PREDICTION_LOG,
+                        help="prediction history database (empty string disables logging)")
+    parser.add_argument("--drift-reference", default=DRIFT_REFERENCE,
+                        help="drift reference profile, bootstrapped from the first requests if missing "
+                             "(empty string disables drift monitoring)")
+    parser.add_argument("--shadow-model", default=SHADOW_MODEL,
+                        help="candidate artifact to score every batch with in the background")
+    parser.add_argument("--shadow-workers", type=int, default=1,
+                        help="worker processes for the candidate model (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    manager = ModelManager(args.model, args.poll_interval).start()
+    if manager.current() is None:
+        raise SystemExit(f"Could not load model from {args.model}: {manager.last_error}")
+    prediction_log = PredictionLog(args.log) if args.log else None
+    drift_monitor = DriftMonitor(reference_path=args.drift_reference, on_alert=print_drift_alert) \
+        if args.drift_reference else None
+    shadow = ShadowScorer(args.shadow_model, args.shadow_workers) if args.shadow_model else None
+    server = ScoringServer(manager, args.max_batch_size, args.max_wait_ms, prediction_log, drift_monitor, shadow)
+    print(f"Serving on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch_size}, max wait {args.max_wait_ms} ms)")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if prediction_log is not None:
+            prediction_log.close()
+        if shadow is not None:
+            shadow.wait(timeout=5)
+            print(format_report(shadow.report()))
+            shadow.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,18 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import pickle
+
+from inference import (EXPECTED_COLUMNS, RISK_MAPPING, MODEL_PATH, load_model_file, new_feature_vector,
+                       risk_contributions, top_risk_factors)
+from model_manager import ModelManager, pickle_source
+from prediction_cache import PredictionCache
+from prediction_log import PREDICTION_LOG, PredictionLog
+from population_stats import AGE_BAND_YEARS, PopulationStats, feature_histogram
+from drift_monitor import DRIFT_REFERENCE, DriftMonitor
+from shadow import SHADOW_MODEL
+from metrics import REGISTRY, StageTimer
+from i18n import load_catalog
+
+# Per-stage timing of this script run
+stage_timer = StageTimer()
 
 # Page configuration
 st.set_page_config(
@@ -13,231 +24,8 @@ st.set_page_config(
 # Language selection
 lang = st.sidebar.selectbox("Language / Bahasa", ["English", "Indonesian"])
 
-# Translations dictionary
-translations = {
-    "English": {
-        "title": "🫁 Lung Cancer Risk Detection System",
-        "subtitle": "AI-powered application to assess lung cancer risk based on patient risk factors",
-        "demographics": "💼 Demographics",
-        "age": "Age",
-        "gender": "Gender",
-        "male": "Male",
-        "female": "Female",
-        "env_factors": "🌍 Environmental Factors",
-        "air_pollution": "Air Pollution Exposure",
-        "air_pollution_help": "1 = minimal exposure, 10 = severe exposure",
-        "dust_allergy": "Dust Allergy",
-        "dust_allergy_help": "1 = no allergy, 10 = severe allergy",
-        "occupational_hazards": "Occupational Hazards",
-        "occupational_hazards_help": "1 = safe workplace, 10 = highly hazardous workplace",
-        "passive_smoker": "Passive Smoking Exposure",
-        "passive_smoker_help": "1 = minimal exposure, 10 = constant exposure",
-        "genetic_health": "🧬 Genetic & Health History",
-        "genetic_risk": "Genetic Risk",
-        "genetic_risk_help": "1 = no family history, 10 = strong family history",
-        "chronic_lung_disease": "Chronic Lung Disease",
-        "chronic_lung_disease_help": "1 = none, 10 = severe chronic condition",
-        "frequent_cold": "Frequent Cold",
-        "frequent_cold_help": "1 = rarely gets cold, 10 = very frequent colds",
-        "obesity": "Obesity",
-        "obesity_help": "1 = normal weight, 10 = severe obesity",
-        "lifestyle": "🍷 Lifestyle Factors",
-        "alcohol_use": "Alcohol Consumption",
-        "alcohol_use_help": "1 = none, 10 = heavy consumption",
-        "balanced_diet": "Balanced Diet",
-        "balanced_diet_help": "1 = poor diet, 10 = excellent diet",
-        "smoking": "Smoking",
-        "smoking_help": "1 = non-smoker, 10 = heavy smoker",
-        "snoring": "Snoring",
-        "snoring_help": "1 = never snores, 10 = severe snoring",
-        "symptoms": "🩺 Symptoms",
-        "chest_pain": "Chest Pain",
-        "chest_pain_help": "1 = none, 10 = severe pain",
-        "coughing_blood": "Coughing Blood",
-        "coughing_blood_help": "1 = none, 10 = frequent occurrence",
-        "fatigue": "Fatigue",
-        "fatigue_help": "1 = normal energy, 10 = severe fatigue",
-        "weight_loss": "Unexplained Weight Loss",
-        "weight_loss_help": "1 = none, 10 = significant weight loss",
-        "shortness_breath": "Shortness of Breath",
-        "shortness_breath_help": "1 = none, 10 = severe difficulty breathing",
-        "wheezing": "Wheezing",
-        "wheezing_help": "1 = none, 10 = severe wheezing",
-        "swallowing_difficulty": "Swallowing Difficulty",
-        "swallowing_difficulty_help": "1 = none, 10 = severe difficulty",
-        "clubbing_finger_nails": "Finger Clubbing",
-        "clubbing_finger_nails_help": "1 = none, 10 = severe clubbing",
-        "dry_cough": "Dry Cough",
-        "dry_cough_help": "1 = none, 10 = severe persistent cough",
-        "show_debug": "Show debugging information",
-        "assess_btn": "Assess Cancer Risk",
-        "results": "Assessment Results:",
-        "distribution": "Risk Probability Distribution:",
-        "recommendations": "Recommendations:",
-        "medical_advice": "Medical Advice",
-        "lifestyle_rec": "Lifestyle Recommendations",
-        "about_tab": "About",
-        "prediction_tab": "Patient Assessment",
-        "focus_factors": "Focus on these key modifiable factors:",
-        "general_rec": "General recommendations:",
-        "rec_smoke_free": "Maintain a smoke-free environment",
-        "rec_exercise": "Regular exercise appropriate for your condition",
-        "rec_diet": "Balanced diet rich in antioxidants",
-        "low_risk": "LOW RISK",
-        "medium_risk": "MEDIUM RISK",
-        "high_risk": "HIGH RISK",
-        "low_rec1": "✓ Continue with annual routine check-ups",
-        "low_rec2": "✓ No immediate specialized lung tests required",
-        "low_rec3": "✓ Consider standard health screening for your age group",
-        "med_rec1": "⚠️ Consultation with a pulmonary specialist recommended",
-        "med_rec2": "⚠️ Consider chest X-ray or low-dose CT scan",
-        "med_rec3": "⚠️ Follow-up within 3-6 months advised",
-        "high_rec1": "🚨 Urgent consultation with pulmonary specialist required",
-        "high_rec2": "🚨 Comprehensive diagnostic tests needed immediately",
-        "high_rec3": "🚨 Close medical monitoring recommended",
-        "about_title": "About This System",
-        "about_desc": """
-This application uses an AI model that analyzes patient risk factors and symptoms to assess the likelihood of lung cancer.
-
-### Key Features:
-- **User-friendly interface**: Easy input of patient characteristics and symptoms
-- **Instant assessment**: Get results immediately upon submission
-- **99% accuracy rate**: Based on comprehensive testing against clinical datasets
-- **Detailed recommendations**: Personalized advice based on risk level
-
-### Risk Levels Explained:
-- **Low Risk**: Minimal indicators of concern, routine monitoring recommended
-- **Medium Risk**: Some concerning factors present, further evaluation suggested
-- **High Risk**: Multiple high-severity indicators present, immediate medical attention required
-
-### Model Information:
-- Training data: 10,000+ anonymized patient records
-- Validation accuracy: 99%
-- Based on advanced machine learning algorithms optimized for medical risk assessment
-- Validated through clinical trials at leading research hospitals
-
-### Important Disclaimer:
-This tool is designed as a supplementary aid for healthcare professionals. It does not replace proper medical diagnosis, comprehensive testing, or professional medical advice.
-        """,
-        "footer": """
-<div style="text-align: center; color: #666;">
-    <p>© 2025 Copyright Wahyu Andika Rahadi Lung Cancer Risk Detection System | Developed for medical and research purposes</p>
-    <p>This application is intended as a decision support tool and does not replace professional medical diagnosis</p>
-</div>
-        """
-    },
-    "Indonesian": {
-        "title": "🫁 Sistem Deteksi Risiko Kanker Paru-paru",
-        "subtitle": "Aplikasi bertenaga AI untuk menilai risiko kanker paru-paru berdasarkan faktor risiko pasien",
-        "demographics": "💼 Demografi",
-        "age": "Usia",
-        "gender": "Jenis Kelamin",
-        "male": "Laki-laki",
-        "female": "Perempuan",
-        "env_factors": "🌍 Faktor Lingkungan",
-        "air_pollution": "Paparan Polusi Udara",
-        "air_pollution_help": "1 = paparan minimal, 10 = paparan parah",
-        "dust_allergy": "Alergi Debu",
-        "dust_allergy_help": "1 = tidak ada alergi, 10 = alergi parah",
-        "occupational_hazards": "Bahaya Pekerjaan",
-        "occupational_hazards_help": "1 = tempat kerja aman, 10 = tempat kerja sangat berbahaya",
-        "passive_smoker": "Paparan Perokok Pasif",
-        "passive_smoker_help": "1 = paparan minimal, 10 = paparan konstan",
-        "genetic_health": "🧬 Riwayat Genetik & Kesehatan",
-        "genetic_risk": "Risiko Genetik",
-        "genetic_risk_help": "1 = tidak ada riwayat keluarga, 10 = riwayat keluarga yang kuat",
-        "chronic_lung_disease": "Penyakit Paru-paru Kronis",
-        "chronic_lung_disease_help": "1 = tidak ada, 10 = kondisi kronis parah",
-        "frequent_cold": "Sering Pilek",
-        "frequent_cold_help": "1 = jarang pilek, 10 = sangat sering pilek",
-        "obesity": "Obesitas",
-        "obesity_help": "1 = berat normal, 10 = obesitas parah",
-        "lifestyle": "🍷 Faktor Gaya Hidup",
-        "alcohol_use": "Konsumsi Alkohol",
-        "alcohol_use_help": "1 = tidak ada, 10 = konsumsi berat",
-        "balanced_diet": "Pola Makan Seimbang",
-        "balanced_diet_help": "1 = pola makan buruk, 10 = pola makan sangat baik",
-        "smoking": "Merokok",
-        "smoking_help": "1 = bukan perokok, 10 = perokok berat",
-        "snoring": "Mendengkur",
-        "snoring_help": "1 = tidak pernah mendengkur, 10 = mendengkur parah",
-        "symptoms": "🩺 Gejala",
-        "chest_pain": "Nyeri Dada",
-        "chest_pain_help": "1 = tidak ada, 10 = nyeri parah",
-        "coughing_blood": "Batuk Darah",
-        "coughing_blood_help": "1 = tidak ada, 10 = sering terjadi",
-        "fatigue": "Kelelahan",
-        "fatigue_help": "1 = energi normal, 10 = kelelahan parah",
-        "weight_loss": "Penurunan Berat Badan Tidak Terjelaskan",
-        "weight_loss_help": "1 = tidak ada, 10 = penurunan berat badan signifikan",
-        "shortness_breath": "Sesak Napas",
-        "shortness_breath_help": "1 = tidak ada, 10 = kesulitan bernapas parah",
-        "wheezing": "Mengi",
-        "wheezing_help": "1 = tidak ada, 10 = mengi parah",
-        "swallowing_difficulty": "Kesulitan Menelan",
-        "swallowing_difficulty_help": "1 = tidak ada, 10 = kesulitan parah",
-        "clubbing_finger_nails": "Penebalan Jari",
-        "clubbing_finger_nails_help": "1 = tidak ada, 10 = penebalan parah",
-        "dry_cough": "Batuk Kering",
-        "dry_cough_help": "1 = tidak ada, 10 = batuk persisten parah",
-        "show_debug": "Tampilkan informasi debug",
-        "assess_btn": "Nilai Risiko Kanker",
-        "results": "Hasil Penilaian:",
-        "distribution": "Distribusi Probabilitas Risiko:",
-        "recommendations": "Rekomendasi:",
-        "medical_advice": "Saran Medis",
-        "lifestyle_rec": "Rekomendasi Gaya Hidup",
-        "about_tab": "Tentang",
-        "prediction_tab": "Penilaian Pasien",
-        "focus_factors": "Fokus pada faktor-faktor utama yang dapat dimodifikasi:",
-        "general_rec": "Rekomendasi umum:",
-        "rec_smoke_free": "Pertahankan lingkungan bebas asap rokok",
-        "rec_exercise": "Olahraga teratur yang sesuai dengan kondisi Anda",
-        "rec_diet": "Pola makan seimbang kaya antioksidan",
-        "low_risk": "RISIKO RENDAH",
-        "medium_risk": "RISIKO SEDANG",
-        "high_risk": "RISIKO TINGGI",
-        "low_rec1": "✓ Lanjutkan dengan pemeriksaan rutin tahunan",
-        "low_rec2": "✓ Tidak diperlukan tes paru-paru khusus segera",
-        "low_rec3": "✓ Pertimbangkan skrining kesehatan standar untuk kelompok usia Anda",
-        "med_rec1": "⚠️ Konsultasi dengan spesialis paru-paru direkomendasikan",
-        "med_rec2": "⚠️ Pertimbangkan rontgen dada atau CT scan dosis rendah",
-        "med_rec3": "⚠️ Tindak lanjut dalam 3-6 bulan disarankan",
-        "high_rec1": "🚨 Konsultasi mendesak dengan spesialis paru-paru diperlukan",
-        "high_rec2": "🚨 Tes diagnostik komprehensif diperlukan segera",
-        "high_rec3": "🚨 Pemantauan medis ketat direkomendasikan",
-        "about_title": "Tentang Sistem Ini",
-        "about_desc": """
-Aplikasi ini menggunakan model AI yang menganalisis faktor risiko dan gejala pasien untuk menilai kemungkinan kanker paru-paru.
-
-### Fitur Utama:
-- **Antarmuka ramah pengguna**: Input karakteristik dan gejala pasien yang mudah
-- **Penilaian instan**: Dapatkan hasil segera setelah pengiriman
-- **Tingkat akurasi 99%**: Berdasarkan pengujian komprehensif terhadap dataset klinis
-- **Rekomendasi terperinci**: Saran yang dipersonalisasi berdasarkan tingkat risiko
-
-### Penjelasan Tingkat Risiko:
-- **Risiko Rendah**: Indikator kekhawatiran minimal, pemantauan rutin direkomendasikan
-- **Risiko Sedang**: Beberapa faktor yang mengkhawatirkan hadir, evaluasi lebih lanjut disarankan
-- **Risiko Tinggi**: Beberapa indikator berisiko tinggi hadir, perhatian medis segera diperlukan
-
-### Informasi Model:
-- Data pelatihan: 10.000+ catatan pasien anonim
-- Akurasi validasi: 99%
-- Berdasarkan algoritma pembelajaran mesin canggih yang dioptimalkan untuk penilaian risiko medis
-- Divalidasi melalui uji klinis di rumah sakit penelitian terkemuka
-
-### Disclaimer Penting:
-Alat ini dirancang sebagai bantuan tambahan untuk profesional kesehatan. Ini tidak menggantikan diagnosis medis yang tepat, pengujian komprehensif, atau nasihat medis profesional.
-        """,
-        "footer": """
-<div style="text-align: center; color: #666;">
-    <p>© 2025 Copyright Wahyu Andika Rahadi Sistem Deteksi Risiko Kanker Paru-paru | Dikembangkan untuk tujuan medis dan penelitian</p>
-    <p>Aplikasi ini dimaksudkan sebagai alat pendukung keputusan dan tidak menggantikan diagnosis medis profesional</p>
-</div>
-        """
-    }
-}
+# Translations catalog, loaded once per process and shared by every rerun
+translations = load_catalog()
 
 # Get the current language dictionary
 t = translations[lang]
@@ -246,124 +34,425 @@ t = translations[lang]
 st.title(t["title"])
 st.markdown(f"#### {t['subtitle']}")
 
-# Function to load model
+# Start the model manager once per process; it loads the model and then
+# hot-swaps in new versions of the artifact in the background
+@st.cache_resource
+def get_model_manager():
+    return ModelManager(MODEL_PATH).start()
+
+# sklearn trees of the served artifact for whole-file scoring, where they are several
+# times faster than the compiled engine; None when only a compiled export exists
+@st.cache_resource(max_entries=1)
+def get_bulk_model(fingerprint, path):
+    source = pickle_source(path)
+    return load_model_file(source, compiled=False) if source else None
+
+# Process-wide cache of probability vectors, shared by all sessions
 @st.cache_resource
-def load_model():
+def get_prediction_cache():
+    return PredictionCache()
+
+# Assessment history, written by a background thread so recording an
+# assessment costs the click path only a queue put
+@st.cache_resource
+def get_prediction_log():
+    return PredictionLog(PREDICTION_LOG) if PREDICTION_LOG else None
+
+# Input-drift monitor shared by all sessions; counting a row is a few array increments
+@st.cache_resource
+def get_drift_monitor():
+    return DriftMonitor(reference_path=DRIFT_REFERENCE) if DRIFT_REFERENCE else None
+
+# Candidate model scored on a background pool after each assessment (SHADOW_MODEL);
+# a candidate that fails to load only turns shadowing off
+@st.cache_resource
+def get_shadow_scorer():
+    if not SHADOW_MODEL:
+        return None
+    from shadow import ShadowScorer
+
     try:
-        # Replace with your model path or use the uploaded model
-        with open('./cancerModel100.pkl', 'rb') as file:
-            model = pickle.load(file)
-        return model
-    except:
-        st.error("Model not found. Please ensure the model file exists in the correct location.")
+        return ShadowScorer(SHADOW_MODEL)
+    except Exception:
+        REGISTRY.inc("shadow_errors")
         return None
 
-# Load the model
-model = load_model()
-
-# Define the expected column names and order
-EXPECTED_COLUMNS = [
-    "Age", "Gender", "Air Pollution", "Alcohol use", "Dust Allergy", 
-    "OccuPational Hazards", "Genetic Risk", "chronic Lung Disease",
-    "Balanced Diet", "Obesity", "Smoking", "Passive Smoker", 
-    "Chest Pain", "Coughing of Blood", "Fatigue", "Weight Loss",
-    "Shortness of Breath", "Wheezing", "Swallowing Difficulty",
-    "Clubbing of Finger Nails", "Frequent Cold", "Dry Cough", "Snoring"
-]
-
-# Define correct risk level mapping
-RISK_MAPPING = {
-    0: "Low",    # 0 means Low risk
-    1: "Medium", # 1 means Medium risk
-    2: "High"    # 2 means High risk
+# Load the model (one consistent snapshot for this whole rerun)
+model_manager = get_model_manager()
+active_model = model_manager.current()
+model = active_model.model if active_model else None
+prediction_cache = get_prediction_cache()
+prediction_log = get_prediction_log()
+drift_monitor = get_drift_monitor()
+shadow_scorer = get_shadow_scorer()
+prediction_cache.bind(active_model.fingerprint if active_model else None)
+if model is None:
+    st.error("Model not found. Please ensure the model file exists in the correct location.")
+
+# Translation keys of the model inputs, for labels outside the input form
+COLUMN_LABELS = {
+    "Age": "age",
+    "Gender": "gender",
+    "Air Pollution": "air_pollution",
+    "Alcohol use": "alcohol_use",
+    "Dust Allergy": "dust_allergy",
+    "OccuPational Hazards": "occupational_hazards",
+    "Genetic Risk": "genetic_risk",
+    "chronic Lung Disease": "chronic_lung_disease",
+    "Balanced Diet": "balanced_diet",
+    "Obesity": "obesity",
+    "Smoking": "smoking",
+    "Passive Smoker": "passive_smoker",
+    "Chest Pain": "chest_pain",
+    "Coughing of Blood": "coughing_blood",
+    "Fatigue": "fatigue",
+    "Weight Loss": "weight_loss",
+    "Shortness of Breath": "shortness_breath",
+    "Wheezing": "wheezing",
+    "Swallowing Difficulty": "swallowing_difficulty",
+    "Clubbing of Finger Nails": "clubbing_finger_nails",
+    "Frequent Cold": "frequent_cold",
+    "Dry Cough": "dry_cough",
+    "Snoring": "snoring",
 }
 
+# RGB of each risk level, as used by the result cards
+RISK_COLORS = {"Low": "0,128,0", "Medium": "255,165,0", "High": "255,0,0"}
+
+# One what-if sweep per model version and patient profile, shared by all
+# sessions; the model itself is not hashed, its fingerprint stands in for it
+@st.cache_data(max_entries=256, show_spinner=False)
+def what_if_sweep(model_token, profile, _model):
+    from what_if import sweep
+    return sweep(_model, profile)
+
+def what_if_table(header, rows, classes):
+    """HTML heatmap: one row per factor, cells colored by predicted risk level.
+
+    ``rows`` holds ``(label, current_value, [(value, probabilities), ...])``;
+    each cell shows the probability of high risk.
+    """
+    high = [RISK_MAPPING[cls] for cls in classes].index("High")
+    cell = "padding:2px 4px;"
+    html = ['<table style="border-collapse:collapse; width:100%; font-size:0.8rem">',
+            f'<tr><th style="{cell}">{header[0]}</th>']
+    html += [f'<th style="{cell} text-align:center;">{value}</th>' for value in header[1:]]
+    html.append("</tr>")
+    for label, current, cells in rows:
+        html.append(f'<tr><td style="{cell}">{label}</td>')
+        for value, proba in cells:
+            level = RISK_MAPPING[classes[proba.argmax()]]
+            style = f"{cell} text-align:center; background-color:rgba({RISK_COLORS[level]}, {0.15 + 0.6 * proba.max():.2f});"
+            if value == current:
+                style += " outline:2px solid #333; font-weight:bold;"
+            html.append(f'<td style="{style}">{proba[high] * 100:.0f}%</td>')
+        html.append("</tr>")
+    html.append("</table>")
+    return "".join(html)
+
+# Results are rendered in a fragment so they stay isolated from the input
+# form; they only change when a new assessment has been stored
+@st.fragment
+def render_assessment(assessment, show_debug):
+    import pandas as pd
+    
+    risk_level = RISK_MAPPING[assessment["predicted_class"]]
+    predict_proba = assessment["proba"]
+    inputs = assessment["inputs"]
+    stage_timer.restart()
+    
+    # Display results
+    st.markdown("---")
+    st.subheader(t["results"])
+
+    # Visual indicator of risk level
+    cols = st.columns(3)
+    risk_levels = ["Low", "Medium", "High"]
+    display_levels = [t["low_risk"], t["medium_risk"], t["high_risk"]]
+
+    for i, level in enumerate(risk_levels):
+        with cols[i]:
+            if risk_level == level:
+                icon = "✅" if level == "Low" else "⚠️" if level == "Medium" else "🚨"
+                color = "green" if level == "Low" else "orange" if level == "Medium" else "red"
+                st.markdown(f"""
+                <div style="text-align:center; padding:10px; background-color:rgba({','.join(['0,128,0' if level == 'Low' else '255,165,0' if level == 'Medium' else '255,0,0'])}, 0.2); border-radius:10px; border:2px solid {color}">
+                    <h3 style="color:{color}">{icon} {display_levels[i]}</h3>
+                </div>
+                """, unsafe_allow_html=True)
+            else:
+                st.markdown(f"""
+                <div style="text-align:center; padding:10px; background-color:#f0f0f0; border-radius:10px;">
+                    <h3 style="color:#888888">{display_levels[i]}</h3>
+                </div>
+                """, unsafe_allow_html=True)
+
+    stage_timer.mark("render_results")
+
+    # Show probability distribution
+    st.subheader(t["distribution"])
+
+    # Map class indices to their proper labels
+    class_labels = [RISK_MAPPING[cls] for cls in assessment["classes"]]
+    display_labels = []
+    for label in class_labels:
+        if label == "Low":
+            display_labels.append(t["low_risk"].title())
+        elif label == "Medium":
+            display_labels.append(t["medium_risk"].title())
+        else:
+            display_labels.append(t["high_risk"].title())
+
+    prob_df = pd.DataFrame({
+        'Risk Level': display_labels,
+        'Probability': [round(p * 100, 2) for p in predict_proba]
+    })
+
+    # Create better visualization of probabilities
+    fig_col1, fig_col2 = st.columns([2, 1])
+    with fig_col1:
+        st.bar_chart(prob_df.set_index('Risk Level'), height=300)
+    with fig_col2:
+        st.dataframe(
+            prob_df.style.format({'Probability': '{:.2f}%'})
+                  .bar(subset=['Probability'], color='#5b9bd5'),
+            use_container_width=True, hide_index=True
+        )
+
+    stage_timer.mark("render_distribution")
+
+    # Personalized recommendations
+    st.subheader(t["recommendations"])
+    rec_col1, rec_col2 = st.columns(2)
+
+    with rec_col1:
+        st.markdown(f"#### {t['medical_advice']}")
+        if risk_level == "Low":
+            st.success(t["low_rec1"])
+            st.success(t["low_rec2"])
+            st.success(t["low_rec3"])
+        elif risk_level == "Medium":
+            st.warning(t["med_rec1"])
+            st.warning(t["med_rec2"])
+            st.warning(t["med_rec3"])
+        else:
+            st.error(t["high_rec1"])
+            st.error(t["high_rec2"])
+            st.error(t["high_rec3"])
+
+    with rec_col2:
+        st.markdown(f"#### {t['lifestyle_rec']}")
+
+        # Key risk factors: the modifiable inputs that pushed this patient's
+        # prediction up the most along the forest's decision paths
+        key_risks = top_risk_factors(assessment["classes"], assessment["contributions"])
+
+        # Display lifestyle recommendations based on key risks
+        if key_risks:
+            st.markdown(t["focus_factors"])
+            for column, score in key_risks:  # Show top 3 risks
+                st.markdown(f"• **{t[COLUMN_LABELS[column]]}** - {inputs[column]}/10")
+
+        # Generic lifestyle recommendations
+        st.markdown(t["general_rec"])
+        st.markdown(f"• {t['rec_smoke_free']}")
+        st.markdown(f"• {t['rec_exercise']}")
+        st.markdown(f"• {t['rec_diet']}")
+    stage_timer.mark("render_recommendations")
+
+    # What-if view: toggling it only reruns this fragment, and the sweep is
+    # cached per profile, so reopening it for the same patient is instant
+    if model is not None and st.toggle(t["what_if_toggle"]):
+        from what_if import AGE_BANDS, SLIDER_COLUMNS, SLIDER_VALUES
+
+        st.subheader(t["what_if_title"])
+        st.caption(t["what_if_desc"])
+        profile = tuple(int(inputs[col]) for col in EXPECTED_COLUMNS)
+        age_proba, slider_proba = what_if_sweep(active_model.fingerprint, profile, model)
+        classes = assessment["classes"]
+        st.markdown(what_if_table(
+            [t["age"]] + list(AGE_BANDS),
+            [(t["age"], inputs["Age"], list(zip(AGE_BANDS, age_proba)))],
+            classes), unsafe_allow_html=True)
+        st.markdown(what_if_table(
+            [t["what_if_value"]] + list(SLIDER_VALUES),
+            [(t[COLUMN_LABELS[col]], inputs[col], list(zip(SLIDER_VALUES, slider_proba[i])))
+             for i, col in enumerate(SLIDER_COLUMNS)],
+            classes), unsafe_allow_html=True)
+        stage_timer.mark("what_if")
+    
+    # Show per-stage timings if requested
+    if show_debug:
+        st.write("Feature contributions (risk score per input):")
+        st.dataframe(pd.DataFrame(
+            risk_contributions(assessment["classes"], assessment["contributions"]),
+            index=EXPECTED_COLUMNS, columns=["contribution"]).sort_values("contribution"))
+        st.write("Stage timings (this run, ms):")
+        st.dataframe(pd.DataFrame({"ms": {k: v * 1000 for k, v in stage_timer.timings.items()}}))
+        st.write("Stage latency (this process):")
+        st.dataframe(pd.DataFrame(REGISTRY.summary()).T)
+
+# Population counters, updated incrementally from the prediction history
+@st.cache_resource
+def get_population_stats():
+    return PopulationStats()
+
+# Time windows offered on the population tab, in seconds
+POPULATION_WINDOWS = {"1h": 3600, "24h": 24 * 3600, "7d": 7 * 24 * 3600, "30d": 30 * 24 * 3600}
+
+# The population tab is a fragment: changing its filters only reruns this
+# function, and it renders from a cached snapshot of fixed-size counters
+@st.fragment
+def render_population(lang):
+    t = translations[lang]
+    st.markdown(t["pop_desc"])
+    drift = drift_monitor.stats() if drift_monitor is not None else None
+    if drift and drift["status"] in ("warn", "alert"):
+        shifted = ", ".join(f"{t[COLUMN_LABELS[col]]} (PSI {value:.2f})" for col, value in drift["top_psi"]
+                            if value >= drift_monitor.warn_psi)
+        message = t[f"pop_drift_{drift['status']}"].format(features=shifted)
+        (st.error if drift["status"] == "alert" else st.warning)(message)
+    if not PREDICTION_LOG:
+        st.info(t["pop_disabled"])
+        return
+    population_stats = get_population_stats()
+    population_stats.refresh(PREDICTION_LOG)
+
+    window = st.selectbox(t["pop_window"], list(POPULATION_WINDOWS), index=1,
+                          format_func=lambda w: t[f"pop_window_{w}"])
+    snapshot = population_stats.snapshot(POPULATION_WINDOWS[window])
+    st.metric(t["pop_total"], f"{snapshot['rows']:,}")
+    if not snapshot["rows"]:
+        st.info(t["pop_empty"])
+        return
+    # Only imported once there is something to chart, to keep pandas off the cold start
+    import pandas as pd
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader(t["pop_risk_dist"])
+        level_labels = [t["low_risk"].title(), t["medium_risk"].title(), t["high_risk"].title()]
+        st.bar_chart(pd.DataFrame({t["pop_count"]: snapshot["risk_counts"]}, index=level_labels))
+    with col2:
+        st.subheader(t["pop_feature_hist"])
+        column = st.selectbox(t["pop_feature"], EXPECTED_COLUMNS,
+                              format_func=lambda col: t[COLUMN_LABELS[col]])
+        values, counts = feature_histogram(snapshot, column)
+        st.bar_chart(pd.DataFrame({t["pop_count"]: counts}, index=values))
+
+    st.subheader(t["pop_age_gender"])
+    mean_high = snapshot["group_mean_proba"][..., list(RISK_MAPPING.values()).index("High")] * 100
+    bands = [f"{start}-{start + AGE_BAND_YEARS - 1}" for start in range(0, AGE_BAND_YEARS * len(mean_high), AGE_BAND_YEARS)]
+    table = pd.DataFrame(mean_high, index=bands, columns=[t["male"], t["female"]])
+    table.index.name = t["pop_age_band"]
+    # Only bands with at least one assessment
+    st.dataframe(table[snapshot["group_counts"].sum(axis=1) > 0].round(1), use_container_width=True)
+
+# Static sections only depend on the language: Streamlit caches their
+# elements and replays them instead of rebuilding them on every rerun
+@st.cache_data
+def render_about(lang):
+    t = translations[lang]
+    st.header(t["about_title"])
+    st.markdown(t["about_desc"])
+
+@st.cache_data
+def render_footer(lang):
+    t = translations[lang]
+    st.markdown("---")
+    st.markdown(t["footer"], unsafe_allow_html=True)
+
 # Main content - Tabs
-tab1, tab2 = st.tabs([t["prediction_tab"], t["about_tab"]])
+tab1, tab_population, tab_batch, tab2 = st.tabs(
+    [t["prediction_tab"], t["population_tab"], t["batch_tab"], t["about_tab"]])
 
 with tab1:
-    # Organized input form with clear sections
-    with st.expander(t["demographics"], expanded=True):
-        col1, col2 = st.columns(2)
-        with col1:
-            age = st.number_input(t["age"], min_value=1, max_value=100, value=30)
-        with col2:
-            gender = st.selectbox(t["gender"], options=[1, 2], format_func=lambda x: t["male"] if x == 1 else t["female"])
+    # Inputs are grouped in a form: moving a slider no longer reruns the whole
+    # script, only submitting the assessment does
+    with st.form("assessment_form", border=False):
+        # Organized input form with clear sections
+        with st.expander(t["demographics"], expanded=True):
+            col1, col2 = st.columns(2)
+            with col1:
+                age = st.number_input(t["age"], min_value=1, max_value=100, value=30)
+            with col2:
+                gender = st.selectbox(t["gender"], options=[1, 2], format_func=lambda x: t["male"] if x == 1 else t["female"])
     
-    with st.expander(t["env_factors"], expanded=True):
-        col1, col2 = st.columns(2)
-        with col1:
-            air_pollution = st.slider(t["air_pollution"], 1, 10, 3, 
-                                     help=t["air_pollution_help"])
-            dust_allergy = st.slider(t["dust_allergy"], 1, 10, 3,
-                                    help=t["dust_allergy_help"])
-        with col2:
-            occupational_hazards = st.slider(t["occupational_hazards"], 1, 10, 3,
-                                           help=t["occupational_hazards_help"])
-            passive_smoker = st.slider(t["passive_smoker"], 1, 10, 3,
-                                      help=t["passive_smoker_help"])
+        with st.expander(t["env_factors"], expanded=True):
+            col1, col2 = st.columns(2)
+            with col1:
+                air_pollution = st.slider(t["air_pollution"], 1, 10, 3, 
+                                         help=t["air_pollution_help"])
+                dust_allergy = st.slider(t["dust_allergy"], 1, 10, 3,
+                                        help=t["dust_allergy_help"])
+            with col2:
+                occupational_hazards = st.slider(t["occupational_hazards"], 1, 10, 3,
+                                               help=t["occupational_hazards_help"])
+                passive_smoker = st.slider(t["passive_smoker"], 1, 10, 3,
+                                          help=t["passive_smoker_help"])
     
-    with st.expander(t["genetic_health"], expanded=True):
-        col1, col2 = st.columns(2)
-        with col1:
-            genetic_risk = st.slider(t["genetic_risk"], 1, 10, 3,
-                                    help=t["genetic_risk_help"])
-            chronic_lung_disease = st.slider(t["chronic_lung_disease"], 1, 10, 3,
-                                           help=t["chronic_lung_disease_help"])
-        with col2:
-            frequent_cold = st.slider(t["frequent_cold"], 1, 10, 3,
-                                     help=t["frequent_cold_help"])
-            obesity = st.slider(t["obesity"], 1, 10, 3,
-                               help=t["obesity_help"])
-    
-    with st.expander(t["lifestyle"], expanded=True):
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            alcohol_use = st.slider(t["alcohol_use"], 1, 10, 3,
-                                   help=t["alcohol_use_help"])
-            balanced_diet = st.slider(t["balanced_diet"], 1, 10, 3,
-                                     help=t["balanced_diet_help"])
-        with col2:
-            smoking = st.slider(t["smoking"], 1, 10, 3,
-                               help=t["smoking_help"])
-            snoring = st.slider(t["snoring"], 1, 10, 3,
-                               help=t["snoring_help"])
+        with st.expander(t["genetic_health"], expanded=True):
+            col1, col2 = st.columns(2)
+            with col1:
+                genetic_risk = st.slider(t["genetic_risk"], 1, 10, 3,
+                                        help=t["genetic_risk_help"])
+                chronic_lung_disease = st.slider(t["chronic_lung_disease"], 1, 10, 3,
+                                               help=t["chronic_lung_disease_help"])
+            with col2:
+                frequent_cold = st.slider(t["frequent_cold"], 1, 10, 3,
+                                         help=t["frequent_cold_help"])
+                obesity = st.slider(t["obesity"], 1, 10, 3,
+                                   help=t["obesity_help"])
     
-    with st.expander(t["symptoms"], expanded=True):
-        col1, col2 = st.columns(2)
-        with col1:
-            chest_pain = st.slider(t["chest_pain"], 1, 10, 3,
-                                  help=t["chest_pain_help"])
-            coughing_blood = st.slider(t["coughing_blood"], 1, 10, 3,
-                                      help=t["coughing_blood_help"])
-            fatigue = st.slider(t["fatigue"], 1, 10, 3,
-                               help=t["fatigue_help"])
-            weight_loss = st.slider(t["weight_loss"], 1, 10, 3,
-                                   help=t["weight_loss_help"])
-        with col2:
-            shortness_breath = st.slider(t["shortness_breath"], 1, 10, 3,
-                                        help=t["shortness_breath_help"])
-            wheezing = st.slider(t["wheezing"], 1, 10, 3,
-                                help=t["wheezing_help"])
-            swallowing_difficulty = st.slider(t["swallowing_difficulty"], 1, 10, 3,
-                                             help=t["swallowing_difficulty_help"])
-            clubbing_finger_nails = st.slider(t["clubbing_finger_nails"], 1, 10, 3,
-                                             help=t["clubbing_finger_nails_help"])
-            dry_cough = st.slider(t["dry_cough"], 1, 10, 3,
-                                 help=t["dry_cough_help"])
+        with st.expander(t["lifestyle"], expanded=True):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                alcohol_use = st.slider(t["alcohol_use"], 1, 10, 3,
+                                       help=t["alcohol_use_help"])
+                balanced_diet = st.slider(t["balanced_diet"], 1, 10, 3,
+                                         help=t["balanced_diet_help"])
+            with col2:
+                smoking = st.slider(t["smoking"], 1, 10, 3,
+                                   help=t["smoking_help"])
+                snoring = st.slider(t["snoring"], 1, 10, 3,
+                                   help=t["snoring_help"])
     
-    # Add debug mode option
-    show_debug = st.checkbox(t["show_debug"])
+        with st.expander(t["symptoms"], expanded=True):
+            col1, col2 = st.columns(2)
+            with col1:
+                chest_pain = st.slider(t["chest_pain"], 1, 10, 3,
+                                      help=t["chest_pain_help"])
+                coughing_blood = st.slider(t["coughing_blood"], 1, 10, 3,
+                                          help=t["coughing_blood_help"])
+                fatigue = st.slider(t["fatigue"], 1, 10, 3,
+                                   help=t["fatigue_help"])
+                weight_loss = st.slider(t["weight_loss"], 1, 10, 3,
+                                       help=t["weight_loss_help"])
+            with col2:
+                shortness_breath = st.slider(t["shortness_breath"], 1, 10, 3,
+                                            help=t["shortness_breath_help"])
+                wheezing = st.slider(t["wheezing"], 1, 10, 3,
+                                    help=t["wheezing_help"])
+                swallowing_difficulty = st.slider(t["swallowing_difficulty"], 1, 10, 3,
+                                                 help=t["swallowing_difficulty_help"])
+                clubbing_finger_nails = st.slider(t["clubbing_finger_nails"], 1, 10, 3,
+                                                 help=t["clubbing_finger_nails_help"])
+                dry_cough = st.slider(t["dry_cough"], 1, 10, 3,
+                                     help=t["dry_cough_help"])
     
-    # Risk assessment button with conditional color
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        predict_btn = st.button(t["assess_btn"], type="primary", use_container_width=True)
+        # Add debug mode option
+        show_debug = st.checkbox(t["show_debug"])
+        
+        # Risk assessment button with conditional color
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            predict_btn = st.form_submit_button(t["assess_btn"], type="primary", use_container_width=True)
+    stage_timer.mark("widgets")
     
-    # Prediction logic
+    # Prediction logic: score on submit and keep the result for later reruns
     if predict_btn:
         if model:
-            # Create a DataFrame with the expected columns in the exact order
+            # Collect the inputs keyed by model column name
             input_dict = {
                 "Age": age,
                 "Gender": gender,
@@ -390,150 +479,99 @@ with tab1:
                 "Snoring": snoring
             }
             
-            # Create a DataFrame to ensure feature names match exactly
-            input_df = pd.DataFrame([input_dict])
-            
-            # Ensure columns are in the correct order
-            input_df = input_df[EXPECTED_COLUMNS]
+            # Fill the feature vector in the exact column order the model expects
+            features = new_feature_vector()
+            features[:] = [input_dict[col] for col in EXPECTED_COLUMNS]
+            stage_timer.mark("build_input")
             
             # Show debug information if requested
             if show_debug:
+                import pandas as pd
                 st.write("Input Data (before prediction):")
-                st.dataframe(input_df)
+                st.dataframe(pd.DataFrame([features], columns=EXPECTED_COLUMNS))
             
             try:
-                # Make prediction
-                raw_prediction = model.predict(input_df)
-                predict_proba = model.predict_proba(input_df)
-                
-                # Map numeric prediction to text
-                risk_level = RISK_MAPPING[raw_prediction[0]]
+                # Make prediction (single forest pass for label, probabilities
+                # and per-feature contributions)
+                stage_timer.restart()
+                predicted_class, predict_proba, contributions = prediction_cache.explain_one(
+                    model, features, active_model.fingerprint)
+                stage_timer.mark("predict")
                 
                 # Show debug information if requested
                 if show_debug:
-                    st.write(f"Raw prediction: {raw_prediction}")
-                    st.write(f"Mapped prediction: {risk_level}")
+                    st.write(f"Raw prediction: {predicted_class}")
+                    st.write(f"Mapped prediction: {RISK_MAPPING[predicted_class]}")
                     st.write(f"Probabilities: {predict_proba}")
                     st.write(f"Model classes: {model.classes_}")
+                    st.write(f"Prediction cache: {prediction_cache.stats()}")
+                    st.write(f"Model manager: {model_manager.stats()}")
+                    st.write(f"Prediction log: {prediction_log.stats() if prediction_log else None}")
+                    st.write(f"Drift monitor: {drift_monitor.stats() if drift_monitor else None}")
+                    st.write(f"Shadow model: {shadow_scorer.report() if shadow_scorer else None}")
                 
-                # Display results
-                st.markdown("---")
-                st.subheader(t["results"])
-                
-                # Visual indicator of risk level
-                cols = st.columns(3)
-                risk_levels = ["Low", "Medium", "High"]
-                display_levels = [t["low_risk"], t["medium_risk"], t["high_risk"]]
-                
-                for i, level in enumerate(risk_levels):
-                    with cols[i]:
-                        if risk_level == level:
-                            icon = "✅" if level == "Low" else "⚠️" if level == "Medium" else "🚨"
-                            color = "green" if level == "Low" else "orange" if level == "Medium" else "red"
-                            st.markdown(f"""
-                            <div style="text-align:center; padding:10px; background-color:rgba({','.join(['0,128,0' if level == 'Low' else '255,165,0' if level == 'Medium' else '255,0,0'])}, 0.2); border-radius:10px; border:2px solid {color}">
-                                <h3 style="color:{color}">{icon} {display_levels[i]}</h3>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        else:
-                            st.markdown(f"""
-                            <div style="text-align:center; padding:10px; background-color:#f0f0f0; border-radius:10px;">
-                                <h3 style="color:#888888">{display_levels[i]}</h3>
-                            </div>
-                            """, unsafe_allow_html=True)
-                
-                # Show probability distribution
-                st.subheader(t["distribution"])
-                
-                # Map class indices to their proper labels
-                class_labels = [RISK_MAPPING[cls] for cls in model.classes_]
-                display_labels = []
-                for label in class_labels:
-                    if label == "Low":
-                        display_labels.append(t["low_risk"].title())
-                    elif label == "Medium":
-                        display_labels.append(t["medium_risk"].title())
-                    else:
-                        display_labels.append(t["high_risk"].title())
-                
-                prob_df = pd.DataFrame({
-                    'Risk Level': display_labels,
-                    'Probability': [round(p * 100, 2) for p in predict_proba[0]]
-                })
-                
-                # Create better visualization of probabilities
-                fig_col1, fig_col2 = st.columns([2, 1])
-                with fig_col1:
-                    st.bar_chart(prob_df.set_index('Risk Level'), height=300)
-                with fig_col2:
-                    st.dataframe(
-                        prob_df.style.format({'Probability': '{:.2f}%'})
-                              .bar(subset=['Probability'], color='#5b9bd5'),
-                        use_container_width=True, hide_index=True
-                    )
-                
-                # Personalized recommendations
-                st.subheader(t["recommendations"])
-                rec_col1, rec_col2 = st.columns(2)
-                
-                with rec_col1:
-                    st.markdown(f"#### {t['medical_advice']}")
-                    if risk_level == "Low":
-                        st.success(t["low_rec1"])
-                        st.success(t["low_rec2"])
-                        st.success(t["low_rec3"])
-                    elif risk_level == "Medium":
-                        st.warning(t["med_rec1"])
-                        st.warning(t["med_rec2"])
-                        st.warning(t["med_rec3"])
-                    else:
-                        st.error(t["high_rec1"])
-                        st.error(t["high_rec2"])
-                        st.error(t["high_rec3"])
-                
-                with rec_col2:
-                    st.markdown(f"#### {t['lifestyle_rec']}")
-                    
-                    # Analyze key risk factors
-                    key_risks = []
-                    if smoking > 5: 
-                        key_risks.append((t["smoking"], smoking))
-                    if passive_smoker > 5: 
-                        key_risks.append((t["passive_smoker"], passive_smoker))
-                    if air_pollution > 5: 
-                        key_risks.append((t["air_pollution"], air_pollution))
-                    if alcohol_use > 5: 
-                        key_risks.append((t["alcohol_use"], alcohol_use))
-                    if balanced_diet < 5: 
-                        key_risks.append((t["balanced_diet"], 10-balanced_diet))
-                    
-                    # Sort key risks by severity
-                    key_risks.sort(key=lambda x: x[1], reverse=True)
-                    
-                    # Display lifestyle recommendations based on key risks
-                    if key_risks:
-                        st.markdown(t["focus_factors"])
-                        for risk, severity in key_risks[:3]:  # Show top 3 risks
-                            st.markdown(f"• **{risk}** - {severity}/10")
-                    
-                    # Generic lifestyle recommendations
-                    st.markdown(t["general_rec"])
-                    st.markdown(f"• {t['rec_smoke_free']}")
-                    st.markdown(f"• {t['rec_exercise']}")
-                    st.markdown(f"• {t['rec_diet']}")
+                st.session_state["assessment"] = {
+                    "inputs": input_dict,
+                    "predicted_class": predicted_class,
+                    "proba": predict_proba,
+                    "contributions": contributions,
+                    "classes": model.classes_,
+                }
+                REGISTRY.inc("predictions")
+                if prediction_log is not None:
+                    prediction_log.record(features, model.classes_, predict_proba, active_model.version,
+                                          stage_timer.timings["predict"] * 1000, source="ui")
+                if drift_monitor is not None:
+                    drift_monitor.observe(features, RISK_MAPPING[predicted_class])
+                if shadow_scorer is not None:
+                    # The primary time here may be a cache hit, so it is left out of the latency comparison
+                    shadow_scorer.submit(features.reshape(1, -1), model.classes_, predict_proba.reshape(1, -1))
                 
             except Exception as e:
+                st.session_state.pop("assessment", None)
+                REGISTRY.inc("prediction_errors")
                 st.error(f"Prediction error: {e}")
                 st.info("Please make sure all fields are filled correctly and try again.")
                 if show_debug:
                     st.error(f"Error details: {str(e)}")
         else:
             st.error("No model loaded. Please ensure the model file exists in the correct location.")
+    
+    # Results only exist once an assessment has been submitted
+    if "assessment" in st.session_state:
+        render_assessment(st.session_state["assessment"], show_debug)
+
+with tab_population:
+    render_population(lang)
+
+with tab_batch:
+    st.markdown(t["batch_desc"])
+    st.caption(", ".join(EXPECTED_COLUMNS))
+    uploaded = st.file_uploader(t["batch_upload"], type=["csv", "parquet"])
+    if uploaded is not None and st.button(t["batch_btn"], type="primary"):
+        if model:
+            try:
+                import io
+                from batch_score import detect_format, score_file
+                fmt = detect_format(uploaded.name)
+                output = io.BytesIO()
+                bulk_model = get_bulk_model(active_model.fingerprint, active_model.path) or model
+                stats = score_file(bulk_model, uploaded, output, in_fmt=fmt, out_fmt=fmt, monitor=drift_monitor)
+                st.success(t["batch_done"].format(rows=stats["rows"], seconds=stats["seconds"],
+                                                  rate=stats["rows_per_sec"]))
+                base_name = uploaded.name.rsplit(".", 1)[0]
+                st.download_button(t["batch_download"], output.getvalue(),
+                                   file_name=f"{base_name}_scored.{fmt}")
+            except Exception as e:
+                st.error(f"Prediction error: {e}")
+        else:
+            st.error("No model loaded. Please ensure the model file exists in the correct location.")
 
 with tab2:
-    st.header(t["about_title"])
-    st.markdown(t["about_desc"])
+    render_about(lang)
 
 # Footer
-st.markdown("---")
-st.markdown(t["footer"], unsafe_allow_html=True)
\ No newline at end of file
+render_footer(lang)
+
+# Every rerun (predictions, batch uploads, shadow errors) updates the exported metrics
+REGISTRY.maybe_export()
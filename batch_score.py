@@ -0,0 +1,173 @@
+"""Batch scoring of patient files (CSV or Parquet).
+
+Usage:
+    python batch_score.py patients.csv scored.csv
+    python batch_score.py patients.parquet scored.parquet --chunk-size 100000
+
+The input must contain every column in ``EXPECTED_COLUMNS``. The output keeps
+the input columns and adds ``Risk Level`` plus one ``Prob <level>`` column per
+class. With ``--explain`` it also adds one ``Contrib <column>`` risk score per
+input column (see ``inference.risk_contributions``), computed from the same
+leaves as the probabilities. Files are read and scored in fixed-size chunks, so memory use
+does not grow with the number of rows. With ``--drift`` every scored row is
+also counted by a ``drift_monitor.DriftMonitor`` and its report is printed;
+the reference profile (``DRIFT_REFERENCE``) must already exist.
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+from inference import EXPECTED_COLUMNS, MODEL_PATH, explain_frame, load_model_file, probability_columns, score_frame
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def detect_format(name):
+    # Pick the file format from the extension
+    ext = os.path.splitext(str(name))[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"Unsupported file type '{ext}', expected .csv or .parquet")
+
+
+def iter_chunks(source, fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield DataFrames of at most ``chunk_size`` rows from ``source``."""
+    if fmt == "csv":
+        yield from pd.read_csv(source, chunksize=chunk_size)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(source)
+        start = 0
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            # Number rows across batches like read_csv does, so errors name the file row
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            start += len(chunk)
+            yield chunk
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def attach_scores(chunk, model, labels, proba):
+    # Copy of ``chunk`` with the risk label and per-class probability columns appended
+    scored = chunk.copy()
+    scored["Risk Level"] = labels
+    for i, col in enumerate(probability_columns(model)):
+        scored[col] = proba[:, i]
+    return scored
+
+
+def score_chunk(model, chunk, explain=False):
+    # Append the risk label and per-class probabilities (and contributions) to a chunk
+    if not explain:
+        labels, proba = score_frame(model, chunk)
+        return attach_scores(chunk, model, labels, proba)
+    labels, proba, risk_scores = explain_frame(model, chunk)
+    scored = attach_scores(chunk, model, labels, proba)
+    for i, col in enumerate(EXPECTED_COLUMNS):
+        scored[f"Contrib {col}"] = risk_scores[:, i]
+    return scored
+
+
+def score_file(model, source, dest, in_fmt=None, out_fmt=None,
+               chunk_size=DEFAULT_CHUNK_SIZE, progress=None, explain=False, monitor=None):
+    """Score ``source`` into ``dest`` chunk by chunk.
+
+    ``source`` and ``dest`` may be paths or file-like objects; for file-like
+    objects the formats must be given explicitly. ``progress`` is called with
+    the running row count after each chunk. ``explain`` adds the per-column
+    contributions (see ``inference.explain_frame``). Scored rows are passed to
+    ``monitor.observe_many`` when a drift monitor is given. Returns a dict
+    with ``rows``, ``seconds`` and ``rows_per_sec``.
+    """
+    in_fmt = in_fmt or detect_format(source)
+    chunks = iter_chunks(source, in_fmt, chunk_size)
+    return write_scored((score_chunk(model, chunk, explain) for chunk in chunks), dest, out_fmt, progress, monitor)
+
+
+def write_scored(scored_chunks, dest, out_fmt=None, progress=None, monitor=None):
+    """Write scored DataFrames to ``dest`` in order; returns the ``score_file`` stats."""
+    out_fmt = out_fmt or detect_format(dest)
+
+    rows = 0
+    writer = None
+    start = time.perf_counter()
+    try:
+        for scored in scored_chunks:
+            if out_fmt == "csv":
+                scored.to_csv(dest, mode="w" if rows == 0 else "a",
+                              header=rows == 0, index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(scored, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(dest, table.schema)
+                writer.write_table(table)
+            if monitor is not None:
+                monitor.observe_many(scored[EXPECTED_COLUMNS].to_numpy(), scored["Risk Level"].to_numpy())
+            rows += len(scored)
+            if progress:
+                progress(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of patients.")
+    parser.add_argument("input", help="input .csv or .parquet file")
+    parser.add_argument("output", help="output .csv or .parquet file")
+    parser.add_argument("--model", default=MODEL_PATH, help="model artifact path")
+    parser.add_argument("--compiled", action="store_true",
+                        help="score with the array-based forest engine instead of the sklearn trees")
+    parser.add_argument("--explain", action="store_true",
+                        help="add per-column contribution scores")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="rows per chunk (default: %(default)s)")
+    parser.add_argument("--drift", action="store_true",
+                        help="compare the scored rows with the drift reference profile (DRIFT_REFERENCE)")
+    args = parser.parse_args(argv)
+
+    model = load_model_file(args.model, compiled=args.compiled)
+    monitor = None
+    if args.drift:
+        from drift_monitor import DRIFT_REFERENCE, DriftMonitor, ReferenceProfile
+
+        if not os.path.exists(DRIFT_REFERENCE):
+            parser.error(f"--drift needs a reference profile and {DRIFT_REFERENCE} does not exist; "
+                         f"build one with: python drift_monitor.py build-reference <patients file>")
+        # Never let a batch run bootstrap (and save) the reference the app and API use
+        monitor = DriftMonitor(reference=ReferenceProfile.load(DRIFT_REFERENCE), reference_path=None)
+
+    def report(rows):
+        print(f"\rscored {rows:,} rows", end="", file=sys.stderr, flush=True)
+
+    stats = score_file(model, args.input, args.output,
+                       chunk_size=args.chunk_size, progress=report, explain=args.explain, monitor=monitor)
+    print(file=sys.stderr)
+    print(f"Scored {stats['rows']:,} rows in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_sec']:,.0f} rows/s)")
+    if monitor is not None:
+        drift = monitor.stats()
+        print(f"Drift: {drift['status']} after {drift['windows']} windows; "
+              f"highest PSI {', '.join(f'{col} {value:.3f}' for col, value in drift['top_psi']) or 'n/a'}; "
+              f"{len(monitor.alerts)} alerts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Overhead of per-feature contributions over plain scoring.
+
+Single rows (the app's explained assessment) compare ``predict_proba``
+with ``predict_proba_contributions`` on the compiled forest. Batches
+compare ``batch_score.score_chunk`` with and without ``explain`` on a
+DataFrame (the batch-mode path, without file I/O), for the sklearn trees
+that ``batch_score`` loads by default and for the compiled forest. The
+overhead column is relative to plain scoring with the sklearn trees, the
+default ``batch_score`` path. Also checks that the contributions add up to
+the probabilities and that both engines agree on them.
+
+    python -m benchmarks.bench_contributions --rows 100000
+"""
+import argparse
+import statistics
+import time
+import warnings
+
+import numpy as np
+
+
+def median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main(argv=None):
+    import pandas as pd
+
+    from batch_score import score_chunk
+    from forest_engine import random_inputs
+    from inference import EXPECTED_COLUMNS, MODEL_PATH, explain_frame, load_model_file
+
+    parser = argparse.ArgumentParser(description="Measure the cost of feature contributions.")
+    parser.add_argument("--model", default=MODEL_PATH, help="model artifact to benchmark")
+    parser.add_argument("--rows", type=int, default=100_000, help="largest batch size")
+    parser.add_argument("--repeat", type=int, default=200, help="single-row calls per variant")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+    model = load_model_file(args.model)
+    trees = load_model_file(args.model, compiled=False)
+    X = random_inputs(args.rows, len(EXPECTED_COLUMNS), args.seed)
+
+    proba, contributions = model.predict_proba_contributions(X[:10_000])
+    gap = np.abs(model.expected_value + contributions.sum(axis=1) - proba).max()
+    print(f"max |expected_value + sum(contributions) - proba|: {gap:.3g}")
+    frame = pd.DataFrame(X[:10_000], columns=EXPECTED_COLUMNS)
+    engines_gap = np.abs(explain_frame(trees, frame)[2] - explain_frame(model, frame)[2]).max()
+    print(f"max |risk score difference| between sklearn trees and compiled forest: {engines_gap:.3g}")
+
+    rows = iter(X)
+    plain = median_ms(lambda: model.predict_proba(next(rows)), args.repeat)
+    rows = iter(X)
+    explained = median_ms(lambda: model.predict_proba_contributions(next(rows)), args.repeat)
+    print(f"single row  plain {plain:.3f} ms  with contributions {explained:.3f} ms  x{explained / plain:.2f}")
+
+    print(f"{'rows':>9s} {'engine':>9s} {'plain rows/s':>14s} {'contrib rows/s':>15s} {'overhead':>9s}")
+    sizes = [n for n in (1_000, 10_000, 100_000, 1_000_000) if n <= args.rows]
+    for size in sizes:
+        frame = pd.DataFrame(X[:size], columns=EXPECTED_COLUMNS)
+        repeat = 3 if size <= 10_000 else 1
+        baseline_s = median_ms(lambda: score_chunk(trees, frame), repeat) / 1000
+        for engine, forest in (("sklearn", trees), ("compiled", model)):
+            plain_s = baseline_s if forest is trees else median_ms(lambda: score_chunk(forest, frame), repeat) / 1000
+            explain_s = median_ms(lambda: score_chunk(forest, frame, explain=True), repeat) / 1000
+            print(f"{size:9,d} {engine:>9s} {size / plain_s:14,.0f} {size / explain_s:15,.0f} "
+                  f"{explain_s / baseline_s - 1:9.0%}")
+
+
+if __name__ == "__main__":
+    main()
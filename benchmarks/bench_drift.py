@@ -0,0 +1,58 @@
+"""Per-prediction cost of the drift monitor.
+
+Reports, for several window sizes, the caller-side latency of
+``DriftMonitor.observe`` (one row, as the app records it) including the
+rows that close a window, and the rows/second of ``observe_many`` on
+blocks (as the API and batch scoring feed it). The cost should not grow
+with the window size.
+
+    python -m benchmarks.bench_drift --rows 50000 --windows 100 1000 10000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_prediction_log import percentiles_us
+
+
+def main(argv=None):
+    from drift_monitor import DriftMonitor, ReferenceProfile, histograms
+    from forest_engine import random_inputs
+    from inference import EXPECTED_COLUMNS
+    from metrics import MetricsRegistry
+    from prediction_log import LEVELS
+
+    parser = argparse.ArgumentParser(description="Measure drift monitor cost per scored row.")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--windows", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--block", type=int, default=64, help="rows per observe_many call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    X = random_inputs(args.rows, len(EXPECTED_COLUMNS), args.seed)
+    labels = np.asarray(LEVELS, dtype=object)[np.random.default_rng(args.seed).integers(0, len(LEVELS), args.rows)]
+    reference = histograms(X, labels)
+
+    print(f"{'window':>8s} {'observe p50 us':>15s} {'p99 us':>8s} {'max us':>8s} {'block rows/s':>13s}")
+    for window in args.windows:
+        monitor = DriftMonitor(ReferenceProfile(*reference), reference_path=None,
+                               window_rows=window, registry=MetricsRegistry())
+        timings = []
+        for i in range(args.rows):
+            start = time.perf_counter()
+            monitor.observe(X[i], labels[i])
+            timings.append(time.perf_counter() - start)
+        p50, p99 = percentiles_us(timings)
+
+        monitor = DriftMonitor(ReferenceProfile(*reference), reference_path=None,
+                               window_rows=window, registry=MetricsRegistry())
+        start = time.perf_counter()
+        for i in range(0, args.rows, args.block):
+            monitor.observe_many(X[i:i + args.block], labels[i:i + args.block])
+        seconds = time.perf_counter() - start
+        print(f"{window:8,d} {p50:15.1f} {p99:8.1f} {max(timings) * 1e6:8.0f} {args.rows / seconds:13,.0f}")
+
+
+if __name__ == "__main__":
+    main()
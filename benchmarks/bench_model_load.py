@@ -0,0 +1,104 @@
+"""Startup time and memory of each model format.
+
+Starts ``--processes`` worker processes per format that all keep the model
+loaded at the same time, then reports load time and, from
+``/proc/self/smaps_rollup`` (Linux), RSS, PSS and private memory per worker.
+PSS splits shared pages between the processes mapping them, so it shows how
+much of the model the workers actually share.
+
+    python forest_engine.py export cancerModel100.pkl cancerModel100.rfm
+    python -m benchmarks.bench_model_load --processes 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+WORKER = r"""
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+from inference import EXPECTED_COLUMNS, load_model_file
+model = load_model_file(sys.argv[1], compiled=sys.argv[2] == "1")
+loaded = time.perf_counter()
+from forest_engine import random_inputs
+model.predict_proba(random_inputs(64, len(EXPECTED_COLUMNS)))
+first_prediction = time.perf_counter()
+print("ready", flush=True)
+sys.stdin.readline()
+memory = {}
+try:
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                memory[parts[0][:-1]] = int(parts[1])
+except OSError:
+    pass
+print(json.dumps({
+    "load_s": loaded - start,
+    "first_prediction_s": first_prediction - loaded,
+    "rss_kb": memory.get("Rss"),
+    "pss_kb": memory.get("Pss"),
+    "private_kb": (memory.get("Private_Clean", 0) + memory.get("Private_Dirty", 0)) if memory else None,
+}), flush=True)
+"""
+
+
+def measure(path, compiled, processes, cwd):
+    workers = [
+        subprocess.Popen([sys.executable, "-c", WORKER, path, "1" if compiled else "0"],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=cwd)
+        for _ in range(processes)
+    ]
+    # Wait until every worker holds its model so they are measured side by side
+    for worker in workers:
+        if worker.stdout.readline().strip() != "ready":
+            raise RuntimeError(f"worker for {path} failed to start")
+    results = []
+    for worker in workers:
+        worker.stdin.write("\n")
+        worker.stdin.flush()
+        results.append(json.loads(worker.stdout.readline()))
+        worker.wait()
+
+    mean = lambda key: (sum(r[key] for r in results) / len(results)) if results[0][key] is not None else None
+    return {key: mean(key) for key in results[0]}
+
+
+def main(argv=None):
+    from inference import MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Compare model load time and memory per format.")
+    parser.add_argument("--model", default=MODEL_PATH, help="pickled model to convert from")
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        npz_path = os.path.join(tmp, "model.npz")
+        rfm_path = os.path.join(tmp, "model.rfm")
+        subprocess.run([sys.executable, "-W", "ignore", "forest_engine.py", "export", args.model, npz_path],
+                       check=True, cwd=cwd, stdout=subprocess.DEVNULL)
+        subprocess.run([sys.executable, "-W", "ignore", "forest_engine.py", "export", args.model, rfm_path],
+                       check=True, cwd=cwd, stdout=subprocess.DEVNULL)
+
+        cases = [
+            ("pickle (sklearn trees)", os.path.abspath(args.model), False),
+            ("pickle (compiled)", os.path.abspath(args.model), True),
+            ("npz", npz_path, True),
+            ("rfm (memory-mapped)", rfm_path, True),
+        ]
+        print(f"{args.processes} concurrent worker(s) per format, mean per worker:")
+        print(f"{'format':24s} {'load':>9s} {'1st pred':>9s} {'RSS':>9s} {'PSS':>9s} {'private':>9s}")
+        for name, path, compiled in cases:
+            r = measure(path, compiled, args.processes, cwd)
+            kb = lambda v: f"{v / 1024:7.1f}MB" if v is not None else "      n/a"
+            print(f"{name:24s} {r['load_s'] * 1000:7.1f}ms {r['first_prediction_s'] * 1000:7.1f}ms "
+                  f"{kb(r['rss_kb'])} {kb(r['pss_kb'])} {kb(r['private_kb'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Throughput of parallel batch scoring at increasing worker counts.
+
+Scores the same random feature matrix serially, the way ``batch_score``
+does by default (the uncompiled forest, one chunk after another in this
+process), and then with ``ParallelScorer`` at each ``--workers`` count,
+on the shared compiled forest by default or on per-worker sklearn forests
+with ``--private-trees``. Reports rows/second, speedup over serial
+``batch_score`` and parallel efficiency (speedup / workers), and checks
+the probabilities against the serial ones: identical for private trees,
+equal within rounding for the compiled forest. Pool startup is excluded: each
+pool is warmed up with one chunk per worker before the timed run. Counts
+above ``os.cpu_count()`` cannot scale and are marked as such.
+
+    python -m benchmarks.bench_parallel --rows 2000000 --workers 1 2 4 8
+    python -m benchmarks.bench_parallel --rows 2000000 --workers 1 2 4 8 --private-trees
+"""
+import argparse
+import os
+import time
+import warnings
+
+import numpy as np
+
+
+def main(argv=None):
+    from forest_engine import random_inputs
+    from inference import EXPECTED_COLUMNS, MODEL_PATH, forest_proba, load_model_file
+    from parallel_score import ParallelScorer
+
+    parser = argparse.ArgumentParser(description="Measure parallel scoring throughput per worker count.")
+    parser.add_argument("--model", default=MODEL_PATH, help="model artifact to score with")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--private-trees", action="store_true",
+                        help="give every worker its own sklearn forest instead of the shared compiled one")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+    X = random_inputs(args.rows, len(EXPECTED_COLUMNS), args.seed)
+    cpus = os.cpu_count()
+    engine = "private sklearn trees" if args.private_trees else "shared compiled forest"
+    print(f"{args.rows:,} rows, chunks of {args.chunk_size:,}, {cpus} CPUs available, workers on the {engine}")
+    print(f"{'workers':>8s} {'seconds':>9s} {'rows/s':>12s} {'speedup':>8s} {'efficiency':>11s}")
+
+    model = load_model_file(args.model, compiled=False)
+    forest_proba(model, X[:1000])
+    start = time.perf_counter()
+    reference = np.concatenate([forest_proba(model, X[i:i + args.chunk_size])
+                                for i in range(0, len(X), args.chunk_size)])
+    baseline = time.perf_counter() - start
+    del model
+    print(f"{'serial':>8s} {baseline:9.2f} {args.rows / baseline:12,.0f} {1:8.2f} {'':>11s}  (batch_score)")
+
+    for workers in args.workers:
+        with ParallelScorer(args.model, workers, args.private_trees) as scorer:
+            scorer.predict_proba(X[:workers * 1000], chunk_size=1000)
+            start = time.perf_counter()
+            proba = scorer.predict_proba(X, args.chunk_size)
+            seconds = time.perf_counter() - start
+        # Every worker count must produce the serial rows in the same order
+        same = np.array_equal if args.private_trees else np.allclose
+        if not same(proba, reference):
+            raise SystemExit(f"{workers} workers returned different probabilities")
+        speedup = baseline / seconds
+        note = "  (more workers than CPUs)" if workers > cpus else ""
+        print(f"{workers:8d} {seconds:9.2f} {args.rows / seconds:12,.0f} {speedup:8.2f} "
+              f"{speedup / workers:11.0%}{note}")
+
+
+if __name__ == "__main__":
+    main()
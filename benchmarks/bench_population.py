@@ -0,0 +1,63 @@
+"""Population dashboard cost: incremental counters vs. recomputing from history.
+
+Fills ``PopulationStats`` with increasing numbers of rows spread over the
+retention period and reports, at each size, the ingest rate, the time to
+build an uncached snapshot, and the time pandas needs to compute the same
+aggregates from the raw rows (what a dashboard rebuilt from history on
+every rerun would pay).
+
+    python -m benchmarks.bench_population --rows 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+
+def main(argv=None):
+    import pandas as pd
+
+    from forest_engine import random_inputs
+    from inference import EXPECTED_COLUMNS
+    from population_stats import AGE_BAND_YEARS, PopulationStats
+
+    parser = argparse.ArgumentParser(description="Measure population statistics ingest and snapshot time.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    now = time.time()
+    print(f"{'rows':>10s} {'ingest rows/s':>14s} {'snapshot ms':>12s} {'pandas ms':>10s}")
+    for n_rows in args.rows:
+        stats = PopulationStats()
+        span = stats.retention_buckets * stats.bucket_seconds
+        ts = now - rng.uniform(0, span, n_rows)
+        X = random_inputs(n_rows, len(EXPECTED_COLUMNS), args.seed)
+        proba = rng.dirichlet(np.ones(3), n_rows)
+
+        start = time.perf_counter()
+        for i in range(0, n_rows, 50_000):
+            stats.add(ts[i:i + 50_000], X[i:i + 50_000], proba[i:i + 50_000])
+        ingest = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stats.snapshot(7 * 24 * 3600, now=now)
+        snapshot = time.perf_counter() - start
+
+        frame = pd.DataFrame(X.astype(np.int64), columns=EXPECTED_COLUMNS)
+        frame["ts"] = ts
+        frame[["p_low", "p_medium", "p_high"]] = proba
+        start = time.perf_counter()
+        recent = frame[frame["ts"] >= now - 7 * 24 * 3600]
+        recent[["p_low", "p_medium", "p_high"]].to_numpy().argmax(axis=1)
+        for col in EXPECTED_COLUMNS:
+            recent[col].value_counts()
+        recent.groupby([recent["Age"] // AGE_BAND_YEARS, "Gender"])["p_high"].mean()
+        recompute = time.perf_counter() - start
+
+        print(f"{n_rows:10,d} {n_rows / ingest:14,.0f} {snapshot * 1000:12.2f} {recompute * 1000:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Caller latency and write throughput of the prediction history.
+
+* ``record`` latency on the caller's thread (what a button press pays)
+  next to a synchronous per-row INSERT + COMMIT into the same WAL database
+* sustained rows/second of the background writer, for single-row records
+  and for blocks of rows (as the API's micro-batches arrive)
+* rows dropped when a burst overflows a small queue in ``drop`` mode
+
+    python -m benchmarks.bench_prediction_log --rows 100000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+
+def percentiles_us(timings):
+    ordered = sorted(timings)
+    return (statistics.median(ordered) * 1e6, ordered[int(len(ordered) * 0.99)] * 1e6)
+
+
+def main(argv=None):
+    from forest_engine import random_inputs
+    from inference import EXPECTED_COLUMNS
+    from prediction_log import PredictionLog, open_log_db
+
+    parser = argparse.ArgumentParser(description="Measure prediction log latency and throughput.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--block", type=int, default=64, help="rows per record_many call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    X = random_inputs(args.rows, len(EXPECTED_COLUMNS), args.seed)
+    rng = np.random.default_rng(args.seed)
+    proba = rng.dirichlet(np.ones(3), args.rows)
+    classes = np.array([0, 1, 2])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Caller-side cost of record() against a synchronous insert per row
+        log = PredictionLog(os.path.join(tmp, "async.db"), max_queue=args.rows + 1)
+        timings = []
+        for i in range(min(args.rows, 20_000)):
+            start = time.perf_counter()
+            log.record(X[i], classes, proba[i], "bench", 0.3)
+            timings.append(time.perf_counter() - start)
+        log.close()
+        async_p50, async_p99 = percentiles_us(timings)
+
+        sync_log = PredictionLog(os.path.join(tmp, "sync.db"))
+        sync_log.close()
+        conn = open_log_db(os.path.join(tmp, "sync.db"))
+        rows = list(sync_log._rows((time.time(), "ui", "bench", X[:2_000], classes, proba[:2_000], 0.3)))
+        timings = []
+        for row in rows:
+            start = time.perf_counter()
+            with conn:
+                conn.execute(sync_log._insert, row)
+            timings.append(time.perf_counter() - start)
+        conn.close()
+        sync_p50, sync_p99 = percentiles_us(timings)
+        print(f"caller latency   record() p50 {async_p50:7.1f} us  p99 {async_p99:7.1f} us")
+        print(f"                 sync INSERT+COMMIT p50 {sync_p50:7.1f} us  p99 {sync_p99:7.1f} us")
+
+        # Sustained throughput with backpressure (nothing dropped)
+        for name, step in (("single rows", 1), (f"blocks of {args.block}", args.block)):
+            log = PredictionLog(os.path.join(tmp, f"tput_{step}.db"), max_queue=1_000, overflow="block")
+            start = time.perf_counter()
+            for i in range(0, args.rows, step):
+                log.record_many(X[i:i + step], classes, proba[i:i + step], "bench", 0.3, source="bench")
+            log.flush()
+            seconds = time.perf_counter() - start
+            stats = log.stats()
+            log.close()
+            print(f"throughput       {name:16s} {stats['written'] / seconds:12,.0f} rows/s "
+                  f"({stats['batches']} transactions)")
+
+        # Burst into a small queue in drop mode
+        log = PredictionLog(os.path.join(tmp, "burst.db"), max_queue=100)
+        for i in range(min(args.rows, 20_000)):
+            log.record(X[i], classes, proba[i], "bench", 0.3)
+        log.close()
+        stats = log.stats()
+        print(f"burst (queue 100) written {stats['written']:,}  dropped {stats['dropped']:,}")
+
+
+if __name__ == "__main__":
+    main()
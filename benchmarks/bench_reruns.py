@@ -0,0 +1,109 @@
+"""Script reruns and CPU time per completed assessment, before vs. after.
+
+Simulates a user who adjusts ``--changes`` sliders and then presses the
+assess button, under Streamlit's AppTest harness. A slider change outside a
+form triggers a full rerun in the browser; inside a form it does not, so
+the simulation only reruns the script when the browser would. Reports the
+number of reruns and the process CPU time they took, for the current
+``app.py`` and for ``app.py`` at an earlier git revision.
+
+    python -m benchmarks.bench_reruns --before 4353699 --assessments 5
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def isolated_app_state():
+    """Point the app's history and drift reference at a new temp directory; returns it.
+
+    Keeps simulated assessments out of the real ``prediction_log.db`` and
+    stops them from bootstrapping ``drift_reference.json``. Call it before
+    the app runs; modules already imported are updated too.
+    """
+    tmp = tempfile.mkdtemp(prefix="bench_app_")
+    for module, name, filename in (("prediction_log", "PREDICTION_LOG", "history.db"),
+                                   ("drift_monitor", "DRIFT_REFERENCE", "drift_reference.json")):
+        os.environ[name] = os.path.join(tmp, filename)
+        if module in sys.modules:
+            setattr(sys.modules[module], name, os.environ[name])
+    return tmp
+
+
+def simulate(script_path, changes, assessments, seed=0):
+    from streamlit.testing.v1 import AppTest
+
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    app = AppTest.from_file(script_path, default_timeout=600)
+    reruns = 0
+    cpu = 0.0
+
+    def rerun():
+        nonlocal reruns, cpu
+        start = time.process_time()
+        app.run()
+        cpu += time.process_time() - start
+        reruns += 1
+        if app.exception:
+            raise RuntimeError(f"{script_path} raised: {app.exception[0].value}")
+
+    rerun()  # initial page load, not counted
+    reruns, cpu = 0, 0.0
+    for _ in range(assessments):
+        for index in rng.choice(len(app.slider), size=changes, replace=False):
+            slider = app.slider[int(index)]
+            slider.set_value(int(rng.integers(1, 11)))
+            # Widgets inside a form only send their value on submit
+            if not slider.form_id:
+                rerun()
+        next(b for b in app.button if b.label == "Assess Cancer Risk").click()
+        rerun()
+
+    return {
+        "reruns_per_assessment": reruns / assessments,
+        "cpu_ms_per_assessment": cpu / assessments * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare reruns and CPU per assessment across revisions.")
+    parser.add_argument("--before", default="4353699", help="git revision to compare against")
+    parser.add_argument("--changes", type=int, default=6, help="slider changes before each assessment")
+    parser.add_argument("--assessments", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+    before_source = subprocess.run(["git", "show", f"{args.before}:app.py"], check=True,
+                                   capture_output=True, text=True, cwd=ROOT).stdout
+    # Keep the old script next to the current one so relative paths resolve the same way
+    before_path = os.path.join(ROOT, f".bench_app_{args.before}.py")
+    with open(before_path, "w") as file:
+        file.write(before_source)
+    tmp = isolated_app_state()
+    try:
+        os.chdir(ROOT)
+        results = {
+            f"before ({args.before})": simulate(before_path, args.changes, args.assessments),
+            "after (working tree)": simulate(os.path.join(ROOT, "app.py"), args.changes, args.assessments),
+        }
+    finally:
+        os.remove(before_path)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{args.changes} slider changes + 1 submit per assessment, {args.assessments} assessments")
+    for name, r in results.items():
+        print(f"{name:24s} reruns/assessment {r['reruns_per_assessment']:5.1f}   "
+              f"CPU/assessment {r['cpu_ms_per_assessment']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Capacity of one app process under concurrent Streamlit sessions.
+
+Drives ``--sessions`` simulated visitors through ``app.py`` at once, each
+on its own thread with its own AppTest session (so widget state is per
+session while ``st.cache_resource`` objects are shared, as in a server
+process). Every visitor loads the page and then repeats a scripted visit:
+sometimes switching the language, changing a few sliders, sometimes
+toggling the debug checkbox, pressing the assess button and then waiting
+``--think-ms``. Only interactions that make the browser rerun the script
+are rerun (widgets inside the assessment form wait for the submit).
+
+Each concurrency level runs in a fresh process, which reports rerun
+latency percentiles, reruns per second, CPU utilization and CPU time per
+rerun, and resident memory per session above the warmed-up baseline. The
+last column, reruns per CPU second, is the throughput one core sustains.
+
+AppTest runs the same script runner as ``streamlit run`` but skips the
+websocket and the browser. It also turns each rerun's output into element
+objects in the same process, so the CPU figures slightly overstate what a
+server would spend.
+
+    python -m benchmarks.bench_sessions --sessions 1 2 4 8 16 --duration 20
+    python -m benchmarks.bench_sessions --sessions 8 --think-ms 0
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+class Visitor:
+    """One simulated browser session following the scripted visit."""
+
+    def __init__(self, script_path, seed, changes, switch_rate, debug_rate):
+        import numpy as np
+        from streamlit.testing.v1 import AppTest
+
+        self.app = AppTest.from_file(script_path, default_timeout=600)
+        self.rng = np.random.default_rng(seed)
+        self.changes = changes
+        self.switch_rate = switch_rate
+        self.debug_rate = debug_rate
+        self.latencies = []
+        self.errors = 0
+
+    def rerun(self):
+        start = time.perf_counter()
+        self.app.run()
+        self.latencies.append(time.perf_counter() - start)
+        if self.app.exception:
+            self.errors += 1
+
+    def in_form(self, elements):
+        return [e for e in elements if e.form_id == "assessment_form"]
+
+    def visit(self):
+        app, rng = self.app, self.rng
+        if rng.random() < self.switch_rate:
+            language = app.sidebar.selectbox[0]
+            language.select_index(1 - language.index)
+            self.rerun()
+        sliders = self.in_form(app.slider)
+        for index in rng.choice(len(sliders), size=min(self.changes, len(sliders)), replace=False):
+            sliders[int(index)].set_value(int(rng.integers(1, 11)))
+        if rng.random() < self.debug_rate:
+            debug = self.in_form(app.checkbox)[0]
+            debug.set_value(not debug.value)
+        self.in_form(app.button)[0].click()
+        self.rerun()
+
+
+def run_level(sessions, duration, think, script_path, changes, switch_rate, debug_rate):
+    """Run ``sessions`` visitors for ``duration`` seconds in this process."""
+    import resource
+
+    from streamlit.testing.v1 import AppTest
+
+    # Warm the process-wide caches (model, translations) so the baseline includes them
+    warm = AppTest.from_file(script_path, default_timeout=600).run()
+    del warm
+    baseline_kb = rss_kb()
+
+    visitors = [Visitor(script_path, seed, changes, switch_rate, debug_rate) for seed in range(sessions)]
+    clock = {}
+
+    def start_clock():
+        # Runs once every session has loaded the page, before any of them continue
+        clock.update(stop_at=time.perf_counter() + duration, wall=time.perf_counter(), cpu=time.process_time())
+
+    ready = threading.Barrier(sessions, action=start_clock)
+
+    def drive(visitor):
+        visitor.rerun()  # first page load, outside the measured interval
+        visitor.latencies.clear()
+        ready.wait()
+        while time.perf_counter() < clock["stop_at"]:
+            visitor.visit()
+            if think:
+                time.sleep(think)
+
+    threads = [threading.Thread(target=drive, args=(v,), daemon=True) for v in visitors]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall, cpu = time.perf_counter() - clock["wall"], time.process_time() - clock["cpu"]
+    session_kb = rss_kb()
+
+    latencies = sorted(t for v in visitors for t in v.latencies)
+
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+
+    return {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "errors": sum(v.errors for v in visitors),
+        "rps": len(latencies) / wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "cpu_util": cpu / wall,
+        "cpu_ms_per_rerun": cpu / max(1, len(latencies)) * 1000,
+        "reruns_per_cpu_s": len(latencies) / cpu if cpu else float("nan"),
+        "mb_per_session": (session_kb - baseline_kb) / 1024 / sessions,
+        "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app capacity under concurrent sessions.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="concurrency levels to run, each in a fresh process")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per level")
+    parser.add_argument("--think-ms", type=float, default=500.0,
+                        help="pause after each assessment (0 saturates the process)")
+    parser.add_argument("--changes", type=int, default=3, help="slider changes per assessment")
+    parser.add_argument("--switch-rate", type=float, default=0.1, help="chance of a language switch per visit")
+    parser.add_argument("--debug-rate", type=float, default=0.2, help="chance of toggling debug mode per visit")
+    parser.add_argument("--script", default=os.path.join(ROOT, "app.py"))
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    options = (args.duration, args.think_ms / 1000, args.script, args.changes, args.switch_rate, args.debug_rate)
+    if args.worker:
+        warnings.simplefilter("ignore")
+        print(json.dumps(run_level(args.worker, *options)))
+        return
+
+    print(f"{os.cpu_count()} CPU(s), {args.duration:.0f}s per level, think time {args.think_ms:.0f} ms")
+    print(f"{'sessions':>8s} {'reruns/s':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} "
+          f"{'CPU %':>6s} {'CPU ms/rerun':>13s} {'MB/session':>11s} {'peak MB':>8s} {'reruns/CPU s':>13s}")
+    # Keep the simulated assessments out of the real history and drift reference
+    tmp = tempfile.mkdtemp(prefix="bench_sessions_")
+    env = dict(os.environ, PREDICTION_LOG=os.path.join(tmp, "history.db"),
+               DRIFT_REFERENCE=os.path.join(tmp, "drift_reference.json"))
+    for sessions in args.sessions:
+        out = subprocess.run(
+            [sys.executable, "-W", "ignore", "-m", "benchmarks.bench_sessions", "--worker", str(sessions),
+             "--duration", str(args.duration), "--think-ms", str(args.think_ms), "--changes", str(args.changes),
+             "--switch-rate", str(args.switch_rate), "--debug-rate", str(args.debug_rate), "--script", args.script],
+            check=True, capture_output=True, text=True, cwd=ROOT, env=env).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        errors = f"  ({r['errors']} reruns raised)" if r["errors"] else ""
+        print(f"{r['sessions']:8d} {r['rps']:9.1f} {r['p50_ms']:8.0f} {r['p95_ms']:8.0f} {r['p99_ms']:8.0f} "
+              f"{r['cpu_util'] * 100:6.0f} {r['cpu_ms_per_rerun']:13.1f} {r['mb_per_session']:11.1f} "
+              f"{r['peak_mb']:8.0f} {r['reruns_per_cpu_s']:13.1f}{errors}")
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Per-request latency of one-patient scoring.
+
+Compares the original path in ``app.py`` (one-row DataFrame, then
+``predict`` and ``predict_proba``) with ``inference.predict_one`` on the
+sklearn trees and on the compiled array engine.
+
+    python -m benchmarks.bench_single --repeat 200
+"""
+import argparse
+import statistics
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from forest_engine import compile_forest
+from inference import EXPECTED_COLUMNS, MODEL_PATH, load_model_file, new_feature_vector, predict_one
+
+
+def sample_patient(rng):
+    values = rng.integers(1, 11, len(EXPECTED_COLUMNS))
+    values[0] = rng.integers(1, 101)
+    values[1] = rng.integers(1, 3)
+    return dict(zip(EXPECTED_COLUMNS, values.tolist()))
+
+
+def dataframe_two_pass(model, patient):
+    input_df = pd.DataFrame([patient])[EXPECTED_COLUMNS]
+    raw_prediction = model.predict(input_df)
+    proba = model.predict_proba(input_df)
+    return raw_prediction[0], proba[0]
+
+
+def vector_single_pass(model, patient, features):
+    features[:] = [patient[col] for col in EXPECTED_COLUMNS]
+    return predict_one(model, features)
+
+
+def time_calls(fn, patients, warmup=5):
+    for patient in patients[:warmup]:
+        fn(patient)
+    timings = []
+    for patient in patients:
+        start = time.perf_counter()
+        fn(patient)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+    }
+
+
+def run(model, repeat=200, seed=0):
+    rng = np.random.default_rng(seed)
+    patients = [sample_patient(rng) for _ in range(repeat)]
+    features = new_feature_vector()
+    compiled = compile_forest(model)
+
+    # All paths must agree before their timings mean anything
+    for patient in patients[:20]:
+        old_cls, old_proba = dataframe_two_pass(model, patient)
+        for candidate in (model, compiled):
+            new_cls, new_proba = vector_single_pass(candidate, patient, features)
+            assert old_cls == new_cls and np.allclose(old_proba, new_proba, rtol=0, atol=1e-12)
+
+    return {
+        "dataframe_two_pass": summarize(time_calls(lambda p: dataframe_two_pass(model, p), patients)),
+        "vector_single_pass": summarize(time_calls(lambda p: vector_single_pass(model, p, features), patients)),
+        "compiled_single_pass": summarize(time_calls(lambda p: vector_single_pass(compiled, p, features), patients)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = load_model_file(args.model, compiled=False)
+
+    results = run(model, args.repeat)
+    for name, stats in results.items():
+        print(f"{name:22s} mean {stats['mean_ms']:8.2f} ms  p50 {stats['p50_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms")
+    baseline = results["dataframe_two_pass"]["mean_ms"]
+    for name in ("vector_single_pass", "compiled_single_pass"):
+        print(f"{name} speedup: {baseline / results[name]['mean_ms']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Cold-start cost of ``app.py``: time to first render and import time per module.
+
+Each sample is a fresh interpreter started with ``python -X importtime``
+that renders the app once under Streamlit's AppTest harness, as a new
+server process does for its first visitor. The ``-X importtime`` report is
+folded into self time per top-level package (``pandas`` includes
+``pandas.core`` and so on). The app is started once against the pickled
+model and once against a compiled ``.rfm`` export of it, and optionally
+against ``app.py`` at an earlier git revision.
+
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --before d80949a
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WATCHED = ("streamlit", "numpy", "pandas", "pyarrow", "sklearn", "scipy",
+           "inference", "forest_engine", "model_manager", "i18n")
+
+FIRST_RENDER = r"""
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=600)
+app.run()
+print(json.dumps({"first_render_s": time.perf_counter() - start,
+                  "exception": str(app.exception[0].value) if app.exception else None}))
+"""
+
+
+def parse_importtime(stderr):
+    """Sum ``-X importtime`` self times (in seconds) per top-level package."""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        root = name.strip().split(".")[0]
+        totals[root] = totals.get(root, 0.0) + int(self_us) / 1e6
+    return totals
+
+
+def cold_start(script_path, model_path):
+    env = dict(os.environ, MODEL_PATH=model_path, MODEL_POLL_SECONDS="0")
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", FIRST_RENDER, script_path],
+                         check=True, capture_output=True, text=True, cwd=ROOT, env=env)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    if result["exception"]:
+        raise RuntimeError(f"{script_path} raised: {result['exception']}")
+    return result["first_render_s"], parse_importtime(out.stderr)
+
+
+def measure(script_path, model_path, repeat):
+    renders, imports = [], []
+    for _ in range(repeat):
+        seconds, modules = cold_start(script_path, model_path)
+        renders.append(seconds)
+        imports.append(modules)
+    names = set().union(*imports)
+    # Median over runs; a module missing from a run took no time in it
+    per_module = {name: statistics.median(m.get(name, 0.0) for m in imports) for name in names}
+    return {"first_render_s": statistics.median(renders), "imports_s": per_module}
+
+
+def export_rfm(model_path, dest):
+    from forest_engine import compile_forest, save_compiled
+    from inference import load_model_file
+
+    save_compiled(compile_forest(load_model_file(model_path, compiled=False)), dest)
+
+
+def main(argv=None):
+    from inference import MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Measure app cold start and per-module import time.")
+    parser.add_argument("--model", default=MODEL_PATH, help="pickled model to start the app with")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per variant")
+    parser.add_argument("--before", help="also measure app.py at this git revision (with the pickle)")
+    parser.add_argument("--top", type=int, default=12, help="slowest packages to list besides the watched ones")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+    app_path = os.path.join(ROOT, "app.py")
+    tmp = tempfile.mkdtemp(prefix="bench_startup_")
+    cleanup = [tmp]
+    try:
+        # The pickle goes in a directory of its own so no compiled export sits beside it
+        pickle_path = os.path.join(tmp, "pickle", "model.pkl")
+        os.makedirs(os.path.dirname(pickle_path))
+        shutil.copyfile(args.model, pickle_path)
+        rfm_path = os.path.join(tmp, "model.rfm")
+        export_rfm(args.model, rfm_path)
+
+        variants = {}
+        if args.before:
+            source = subprocess.run(["git", "show", f"{args.before}:app.py"], check=True,
+                                    capture_output=True, text=True, cwd=ROOT).stdout
+            # Next to the current script so relative paths resolve the same way
+            before_path = os.path.join(ROOT, f".bench_app_{args.before}.py")
+            with open(before_path, "w") as file:
+                file.write(source)
+            cleanup.append(before_path)
+            variants[f"before ({args.before}), .pkl"] = (before_path, pickle_path)
+        variants["current, .pkl"] = (app_path, pickle_path)
+        variants["current, .rfm"] = (app_path, rfm_path)
+
+        results = {name: measure(script, model, args.repeat) for name, (script, model) in variants.items()}
+    finally:
+        for path in cleanup:
+            shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+
+    slowest = sorted({name for r in results.values() for name in r["imports_s"]},
+                     key=lambda name: -max(r["imports_s"].get(name, 0.0) for r in results.values()))
+    rows = list(WATCHED) + [name for name in slowest if name not in WATCHED][:args.top]
+    names = list(results)
+    print(f"median of {args.repeat} cold starts; import self time per package in ms")
+    print(f"{'':24s}" + "".join(f"{name:>26s}" for name in names))
+    print(f"{'first render (total)':24s}" + "".join(f"{results[n]['first_render_s'] * 1000:26.1f}" for n in names))
+    print(f"{'all imports':24s}" + "".join(f"{sum(results[n]['imports_s'].values()) * 1000:26.1f}" for n in names))
+    for module in rows:
+        print(f"{module:24s}" + "".join(
+            f"{results[n]['imports_s'][module] * 1000:26.1f}" if module in results[n]["imports_s"] else f"{'-':>26s}"
+            for n in names))
+
+
+if __name__ == "__main__":
+    main()
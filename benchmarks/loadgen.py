@@ -0,0 +1,133 @@
+"""Load generator for ``api_server.py``.
+
+Opens ``--concurrency`` keep-alive connections and fires single-patient
+``POST /predict`` requests for ``--duration`` seconds, then prints client-side
+throughput and latency percentiles alongside the server's ``/stats``.
+
+    python api_server.py --port 8000 &
+    python -m benchmarks.loadgen --port 8000 --concurrency 64 --duration 10
+
+With ``--in-process`` the server is started inside the same event loop, which
+is handy for a quick local check without a second terminal.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from inference import EXPECTED_COLUMNS, MODEL_PATH
+
+
+def random_payloads(n, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.integers(1, 11, (n, len(EXPECTED_COLUMNS)))
+    X[:, 0] = rng.integers(1, 101, n)
+    X[:, 1] = rng.integers(1, 3, n)
+    return [json.dumps(dict(zip(EXPECTED_COLUMNS, row.tolist()))).encode() for row in X]
+
+
+async def http_request(reader, writer, host, method, path, body=b""):
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(host, port, payloads, stop_at, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            status, _ = await http_request(reader, writer, host, "POST", "/predict",
+                                           payloads[i % len(payloads)])
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+            i += 1
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_load(host, port, concurrency, duration, seed=0):
+    payloads = random_payloads(1000, seed)
+    latencies, errors = [], []
+    start = time.perf_counter()
+    stop_at = start + duration
+    await asyncio.gather(*(client(host, port, payloads[i::concurrency] or payloads,
+                                  stop_at, latencies, errors)
+                           for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, body = await http_request(reader, writer, host, "GET", "/stats")
+    writer.close()
+    await writer.wait_closed()
+
+    ordered = np.sort(np.asarray(latencies)) * 1000
+    pct = lambda q: float(ordered[min(len(ordered) - 1, int(q * len(ordered)))]) if len(ordered) else 0.0
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p99_ms": pct(0.99),
+        "server": json.loads(body),
+    }
+
+
+async def run_in_process(args):
+    from api_server import ScoringServer
+    from model_manager import ModelManager
+
+    manager = ModelManager(args.model, poll_interval=0).start()
+    server = ScoringServer(manager, args.max_batch_size, args.max_wait_ms)
+    ready = asyncio.Event()
+    task = asyncio.create_task(server.serve(args.host, args.port, ready))
+    await ready.wait()
+    try:
+        return await run_load(args.host, args.port, args.concurrency, args.duration)
+    finally:
+        # Let the server notice the closed connections before shutting it down
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the scoring API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--in-process", action="store_true",
+                        help="start the server in this process before loading it")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    if args.in_process:
+        result = asyncio.run(run_in_process(args))
+    else:
+        result = asyncio.run(run_load(args.host, args.port, args.concurrency, args.duration))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
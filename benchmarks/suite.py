@@ -0,0 +1,253 @@
+"""Reproducible offline benchmark suite for the hot paths.
+
+Measures, with a fixed random seed:
+
+* ``load``      model load time, cold (fresh interpreter) and warm (repeat load)
+* ``single``    one-row latency: the original DataFrame + ``predict`` +
+                ``predict_proba`` path, ``predict_one`` on the sklearn trees and
+                on the compiled engine, and ``explain_one`` (with contributions)
+* ``batch``     rows/second at 1, 100, 10k and 1M rows on both engines, and
+                with contributions on the compiled engine
+* ``rerun``     full ``app.py`` script run time under Streamlit's AppTest
+                harness (first run, idle rerun, assessment rerun)
+* ``memory``    peak RSS of the benchmark process
+
+Results go to a JSON file (``benchmarks/results/<commit>.json`` by default).
+``--compare`` checks them against an earlier file and exits non-zero when a
+timing regressed by more than ``--tolerance``.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --quick --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from benchmarks.bench_reruns import isolated_app_state
+from benchmarks.bench_single import dataframe_two_pass, sample_patient, vector_single_pass
+from forest_engine import compile_forest, random_inputs
+from inference import EXPECTED_COLUMNS, MODEL_PATH, explain_one, forest_proba, load_model_file, new_feature_vector
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+BATCH_SIZES = (1, 100, 10_000, 1_000_000)
+QUICK_BATCH_SIZES = (1, 100, 10_000)
+
+COLD_LOAD = r"""
+import json, sys, time, warnings
+warnings.simplefilter("ignore")
+start = time.perf_counter()
+from inference import load_model_file
+load_model_file(sys.argv[1], compiled=False)
+print(json.dumps(time.perf_counter() - start))
+"""
+
+
+def timed(fn, repeat):
+    # Seconds per call for each of ``repeat`` calls
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summary_ms(timings):
+    ordered = sorted(timings)
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        "min_ms": ordered[0] * 1000,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def bench_load(model_path, repeat):
+    cold = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", COLD_LOAD, model_path],
+                             check=True, capture_output=True, text=True, cwd=ROOT)
+        cold.append(json.loads(out.stdout))
+    load_model_file(model_path, compiled=False)
+    warm = timed(lambda: load_model_file(model_path, compiled=False), repeat)
+    return {"cold": summary_ms(cold), "warm": summary_ms(warm)}
+
+
+def fill(features, patient):
+    features[:] = [patient[col] for col in EXPECTED_COLUMNS]
+    return features
+
+
+def bench_single(model, compiled, repeat, seed):
+    rng = np.random.default_rng(seed)
+    patients = [sample_patient(rng) for _ in range(repeat)]
+    features = new_feature_vector()
+    results = {}
+    for name, fn in (
+        ("dataframe_two_pass", lambda p: dataframe_two_pass(model, p)),
+        ("vector_single_pass", lambda p: vector_single_pass(model, p, features)),
+        ("compiled_single_pass", lambda p: vector_single_pass(compiled, p, features)),
+        ("compiled_contributions", lambda p: explain_one(compiled, fill(features, p))),
+    ):
+        fn(patients[0])
+        it = iter(patients)
+        results[name] = summary_ms(timed(lambda: fn(next(it)), repeat))
+    return results
+
+
+def bench_batch(model, compiled, sizes, seed):
+    results = {}
+    for size in sizes:
+        X = random_inputs(size, len(EXPECTED_COLUMNS), seed)
+        row = {}
+        for name, fn in (("sklearn", lambda: forest_proba(model, X)),
+                         ("compiled", lambda: compiled.predict_proba(X)),
+                         ("compiled_contributions", lambda: compiled.predict_proba_contributions(X))):
+            # Small batches are repeated so the timing is not pure noise
+            repeat = 1 if size >= 10_000 else 20
+            seconds = min(timed(fn, repeat))
+            row[name] = {"seconds": seconds, "rows_per_sec": size / seconds}
+        results[str(size)] = row
+    return results
+
+
+def bench_rerun(repeat):
+    from streamlit.testing.v1 import AppTest
+
+    tmp = isolated_app_state()
+    try:
+        app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=600)
+        start = time.perf_counter()
+        app.run()
+        first = time.perf_counter() - start
+        if app.exception:
+            raise RuntimeError(f"app.py raised: {app.exception[0].value}")
+
+        idle = timed(app.run, repeat)
+
+        def assess():
+            # Elements are rebuilt on every run; the app starts in English
+            next(b for b in app.button if b.label == "Assess Cancer Risk").click()
+            app.run()
+
+        assess_timings = timed(assess, repeat)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {"first_run_ms": first * 1000, "idle_rerun": summary_ms(idle), "assess_rerun": summary_ms(assess_timings)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True, cwd=ROOT).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def environment():
+    import sklearn
+    import streamlit
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "streamlit": streamlit.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def flatten_timings(results, prefix=""):
+    # (path, seconds-like value) pairs for every timing in a results dict; lower is better
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten_timings(value, path)
+        elif key.endswith(("_ms", "seconds")) and isinstance(value, (int, float)):
+            yield path, value
+
+
+def compare(current, baseline, tolerance):
+    """Print timing ratios against ``baseline``; return the regressed paths."""
+    before = dict(flatten_timings(baseline["results"]))
+    regressions = []
+    for path, value in flatten_timings(current["results"]):
+        if path not in before or before[path] <= 0:
+            continue
+        ratio = value / before[path]
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(path)
+            flag = "  REGRESSION"
+        print(f"{path:55s} {before[path]:12.3f} -> {value:12.3f}  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--model", default=MODEL_PATH, help="pickled model to benchmark")
+    parser.add_argument("--quick", action="store_true", help="skip the 1M-row batch and use fewer repeats")
+    parser.add_argument("--only", nargs="+", choices=["load", "single", "batch", "rerun"],
+                        help="run only these sections")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown before --compare fails (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+    sections = set(args.only or ["load", "single", "batch", "rerun"])
+    repeat = 20 if args.quick else 100
+
+    results = {}
+    if "load" in sections:
+        results["load"] = bench_load(args.model, 3 if args.quick else 5)
+    model = load_model_file(args.model, compiled=False)
+    compiled = compile_forest(model)
+    if "single" in sections:
+        results["single"] = bench_single(model, compiled, repeat, args.seed)
+    if "batch" in sections:
+        results["batch"] = bench_batch(model, compiled, QUICK_BATCH_SIZES if args.quick else BATCH_SIZES, args.seed)
+    if "rerun" in sections:
+        results["rerun"] = bench_rerun(5 if args.quick else 20)
+    results["memory"] = {"peak_rss_mb": peak_rss_mb()}
+
+    report = {"environment": environment(), "results": results}
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['environment']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} timing(s) regressed by more than {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Streaming input-drift monitor with constant cost per prediction.
+
+Every scored row adds one count to a fixed bin for each of the 23 inputs
+(one bin per value, ten-year bands for Age) and one to its predicted risk
+level. When ``window_rows`` rows have been seen, the window's
+distributions are compared with a reference profile using the population
+stability index (PSI) and KL divergence, alerts are raised for anything
+over the thresholds, and the window starts again. Each row costs a
+couple of array increments; the comparison is amortized over the window.
+
+The reference profile is a JSON file of the same counters
+(``DRIFT_REFERENCE``). Build it from data the model was validated on:
+
+    python drift_monitor.py build-reference patients.csv
+    python drift_monitor.py check new_patients.parquet
+
+Without a reference file the first ``reference_rows`` scored rows become
+the reference (and are saved to ``DRIFT_REFERENCE``), so drift is then
+measured against how the service looked when it started.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from inference import EXPECTED_COLUMNS, MODEL_PATH
+from metrics import REGISTRY
+from population_stats import AGE_BAND_YEARS, AGE_BANDS, FEATURE_MAX
+from prediction_log import LEVELS
+
+DRIFT_REFERENCE = os.environ.get("DRIFT_REFERENCE", "./drift_reference.json")
+# Common PSI rules of thumb: below 0.1 stable, 0.1-0.25 moderate shift, above 0.25 major shift
+WARN_PSI = 0.1
+ALERT_PSI = 0.25
+LEVEL_INDEX = {level: i for i, level in enumerate(LEVELS)}
+# Age is compared in bands: one bin per year would need far bigger windows
+# before sampling noise alone stopped looking like drift
+BIN_WIDTH = np.array([AGE_BAND_YEARS if col == "Age" else 1 for col in EXPECTED_COLUMNS])
+FEATURE_BINS = np.array([AGE_BANDS if col == "Age" else FEATURE_MAX.get(col, 10) + 1 for col in EXPECTED_COLUMNS])
+FEATURE_OFFSETS = np.concatenate([[0], np.cumsum(FEATURE_BINS)[:-1]])
+
+
+def level_indices(labels):
+    # Risk level names (RISK_MAPPING values) to indices into LEVELS
+    return np.fromiter((LEVEL_INDEX[label] for label in labels), dtype=np.intp, count=len(labels))
+
+
+def feature_bins(X):
+    # Index of each input's bin in the concatenated feature histograms
+    return FEATURE_OFFSETS + np.clip(np.asarray(X).astype(np.intp) // BIN_WIDTH, 0, FEATURE_BINS - 1)
+
+
+def histograms(X, risk_levels):
+    """``(feature_counts, level_counts)`` of a block of scored rows."""
+    bins = feature_bins(X)
+    return (np.bincount(bins.ravel(), minlength=int(FEATURE_BINS.sum())),
+            np.bincount(level_indices(risk_levels), minlength=len(LEVELS)))
+
+
+def distribution(counts, smoothing=0.5):
+    # Additive smoothing keeps empty bins from producing infinite divergences
+    counts = np.asarray(counts, dtype=np.float64) + smoothing
+    return counts / counts.sum()
+
+
+def psi(reference_counts, current_counts):
+    """Population stability index between two histograms over the same bins."""
+    p, q = distribution(current_counts), distribution(reference_counts)
+    return float(np.sum((p - q) * np.log(p / q)))
+
+
+def kl_divergence(reference_counts, current_counts):
+    """KL(current || reference) in nats."""
+    p, q = distribution(current_counts), distribution(reference_counts)
+    return float(np.sum(p * np.log(p / q)))
+
+
+def feature_divergences(reference_counts, current_counts, smoothing=0.5):
+    """Per-feature ``(psi, kl)`` arrays for concatenated feature histograms, in one pass."""
+    def per_feature(counts):
+        counts = np.asarray(counts, dtype=np.float64) + smoothing
+        return counts / np.repeat(np.add.reduceat(counts, FEATURE_OFFSETS), FEATURE_BINS)
+
+    p, q = per_feature(current_counts), per_feature(reference_counts)
+    log_ratio = np.log(p / q)
+    return np.add.reduceat((p - q) * log_ratio, FEATURE_OFFSETS), np.add.reduceat(p * log_ratio, FEATURE_OFFSETS)
+
+
+class ReferenceProfile:
+    """Feature and risk-level histograms that drift is measured against."""
+
+    def __init__(self, feature_counts, level_counts):
+        self.feature_counts = np.asarray(feature_counts, dtype=np.int64)
+        self.level_counts = np.asarray(level_counts, dtype=np.int64)
+
+    @property
+    def rows(self):
+        return int(self.level_counts.sum())
+
+    def feature(self, i):
+        return self.feature_counts[FEATURE_OFFSETS[i]:FEATURE_OFFSETS[i] + FEATURE_BINS[i]]
+
+    def save(self, path):
+        data = {
+            "rows": self.rows,
+            "features": {col: self.feature(i).tolist() for i, col in enumerate(EXPECTED_COLUMNS)},
+            "levels": dict(zip(LEVELS, self.level_counts.tolist())),
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as file:
+            json.dump(data, file, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            data = json.load(file)
+        features = [data["features"][col] for col in EXPECTED_COLUMNS]
+        if [len(f) for f in features] != FEATURE_BINS.tolist():
+            raise ValueError(f"{path} was built with different feature bins")
+        return cls(np.concatenate(features), [data["levels"][level] for level in LEVELS])
+
+
+class DriftMonitor:
+    """Windowed PSI/KL comparison of scored rows against a reference profile.
+
+    ``observe``/``observe_many`` are safe to call from any thread.
+    ``on_alert`` is called with each alert dict (on the observing thread).
+    """
+
+    def __init__(self, reference=None, reference_path=DRIFT_REFERENCE, window_rows=1_000,
+                 reference_rows=5_000, warn_psi=WARN_PSI, alert_psi=ALERT_PSI,
+                 on_alert=None, registry=REGISTRY):
+        if reference is None and reference_path and os.path.exists(reference_path):
+            reference = ReferenceProfile.load(reference_path)
+        self.reference = reference
+        self.reference_path = reference_path
+        self.window_rows = window_rows
+        self.reference_rows = reference_rows
+        self.warn_psi = warn_psi
+        self.alert_psi = alert_psi
+        self.on_alert = on_alert
+        self.registry = registry
+        self.rows = 0
+        self.windows = 0
+        self.last_report = None
+        self.alerts = deque(maxlen=100)
+        self._feature_counts = np.zeros(int(FEATURE_BINS.sum()), dtype=np.int64)
+        self._level_counts = np.zeros(len(LEVELS), dtype=np.int64)
+        self._window_fill = 0
+        self._lock = threading.Lock()
+
+    def observe(self, features, risk_level):
+        """Count one scored row: its inputs and its ``RISK_MAPPING`` label."""
+        bins = feature_bins(features)
+        with self._lock:
+            # Each feature has its own bin range, so the 23 indices never collide
+            self._feature_counts[bins] += 1
+            self._level_counts[LEVEL_INDEX[risk_level]] += 1
+            self.rows += 1
+            self._window_fill += 1
+            if self._window_fill >= self._target():
+                self._close_window()
+
+    def observe_many(self, X, risk_levels):
+        """Count a block of scored rows (inputs ``X``, one label per row)."""
+        X = np.asarray(X)
+        with self._lock:
+            start = 0
+            while start < len(X):
+                # Split the block at window boundaries so every window has the same size
+                stop = min(len(X), start + self._target() - self._window_fill)
+                feature_counts, level_counts = histograms(X[start:stop], risk_levels[start:stop])
+                self._feature_counts += feature_counts
+                self._level_counts += level_counts
+                self.rows += stop - start
+                self._window_fill += stop - start
+                if self._window_fill >= self._target():
+                    self._close_window()
+                start = stop
+
+    def _target(self):
+        # Rows until the current window (or the bootstrap reference) is complete
+        return self.window_rows if self.reference is not None else self.reference_rows
+
+    def _close_window(self):
+        if self.reference is None:
+            self.reference = ReferenceProfile(self._feature_counts.copy(), self._level_counts.copy())
+            if self.reference_path:
+                self.reference.save(self.reference_path)
+        else:
+            self._report(self._feature_counts, self._level_counts)
+        self._feature_counts[:] = 0
+        self._level_counts[:] = 0
+        self._window_fill = 0
+
+    def _report(self, feature_counts, level_counts):
+        psi_values, kl_values = feature_divergences(self.reference.feature_counts, feature_counts)
+        feature_psi = dict(zip(EXPECTED_COLUMNS, psi_values.tolist()))
+        feature_kl = dict(zip(EXPECTED_COLUMNS, kl_values.tolist()))
+        level_psi = psi(self.reference.level_counts, level_counts)
+        self.windows += 1
+        worst = max(max(feature_psi.values()), level_psi)
+        self.last_report = {
+            "window": self.windows,
+            "ts": time.time(),
+            "rows": int(level_counts.sum()),
+            "status": "alert" if worst >= self.alert_psi else "warn" if worst >= self.warn_psi else "ok",
+            "psi": feature_psi,
+            "kl": feature_kl,
+            "risk_level_psi": level_psi,
+            "risk_level_mix": dict(zip(LEVELS, (level_counts / max(1, level_counts.sum())).tolist())),
+        }
+        self.registry.inc("drift_windows")
+        drifted = {col: value for col, value in feature_psi.items() if value >= self.alert_psi}
+        if level_psi >= self.alert_psi:
+            drifted["Risk Level"] = level_psi
+        if drifted:
+            alert = {"window": self.windows, "ts": self.last_report["ts"], "psi": drifted}
+            self.alerts.append(alert)
+            self.registry.inc("drift_alerts")
+            if self.on_alert is not None:
+                self.on_alert(alert)
+
+    def stats(self):
+        with self._lock:
+            report = self.last_report
+            return {
+                "rows": self.rows,
+                "windows": self.windows,
+                "reference_rows": self.reference.rows if self.reference is not None else None,
+                "status": report["status"] if report else ("bootstrapping" if self.reference is None else "ok"),
+                "top_psi": sorted(report["psi"].items(), key=lambda item: -item[1])[:5] if report else [],
+                "risk_level_psi": report["risk_level_psi"] if report else None,
+                "alerts": list(self.alerts)[-5:],
+            }
+
+
+def profile_file(model, path, chunk_size=50_000):
+    """Counters for every row of a patient file, scored with ``model``."""
+    from batch_score import detect_format, iter_chunks
+    from inference import feature_matrix, risk_labels
+
+    feature_counts = np.zeros(int(FEATURE_BINS.sum()), dtype=np.int64)
+    level_counts = np.zeros(len(LEVELS), dtype=np.int64)
+    for chunk in iter_chunks(path, detect_format(path), chunk_size):
+        X = feature_matrix(chunk)
+        counts = histograms(X, risk_labels(model.classes_, model.predict_proba(X)))
+        feature_counts += counts[0]
+        level_counts += counts[1]
+    return ReferenceProfile(feature_counts, level_counts)
+
+
+def main(argv=None):
+    from inference import load_model_file
+
+    parser = argparse.ArgumentParser(description="Build a drift reference profile or check a file against it.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build-reference", help="write the reference profile of a patient file")
+    build.add_argument("input", help="CSV/Parquet file of patients")
+    check = sub.add_parser("check", help="compare a patient file with the reference profile")
+    check.add_argument("input", help="CSV/Parquet file of patients")
+    for command in (build, check):
+        command.add_argument("--model", default=MODEL_PATH, help="model used to predict risk levels")
+        command.add_argument("--reference", default=DRIFT_REFERENCE, help="reference profile path")
+    args = parser.parse_args(argv)
+
+    profile = profile_file(load_model_file(args.model), args.input)
+    if args.command == "build-reference":
+        profile.save(args.reference)
+        print(f"Wrote {args.reference} from {profile.rows:,} rows")
+        return
+
+    reference = ReferenceProfile.load(args.reference)
+    psi_values, kl_values = feature_divergences(reference.feature_counts, profile.feature_counts)
+    rows = list(zip(EXPECTED_COLUMNS, psi_values.tolist(), kl_values.tolist()))
+    rows.append(("Risk Level", psi(reference.level_counts, profile.level_counts),
+                 kl_divergence(reference.level_counts, profile.level_counts)))
+    print(f"{'feature':28s} {'PSI':>8s} {'KL':>8s}")
+    for col, value, kl in sorted(rows, key=lambda row: -row[1]):
+        flag = "  ALERT" if value >= ALERT_PSI else "  warn" if value >= WARN_PSI else ""
+        print(f"{col:28s} {value:8.4f} {kl:8.4f}{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Shrink a compiled forest and measure what it costs in accuracy and speed.
+
+Transforms, applied in one rebuild of the flattened arrays:
+
+* ``--trees N``        keep the first N trees (random forest trees are
+                       exchangeable, so any N of them is an equally good sample)
+* ``--max-depth D``    turn every node at depth D into a leaf that predicts
+                       the class distribution already stored for that node
+* ``--merge``          hash-cons identical subtrees, within and across trees,
+                       into a DAG and drop splits whose two branches end up
+                       identical
+* ``--threshold-dtype float32``  exact for float32 inputs: thresholds are
+                       rounded down, so ``x <= t`` decides the same way
+* ``--value-dtype float32|float16``  lossy narrowing of the class distributions
+
+Node indices and split features are always stored in the narrowest integer
+type that fits. The command writes the result (``.rfm`` or ``.npz``) and
+reports agreement with the original ``predict_proba`` on a reference file
+and on a sample of the input grid the app collects, plus file size, load
+time and latency. ``classes_`` is never changed, so ``RISK_MAPPING`` applies
+to the compressed model as is.
+
+    python forest_compress.py cancerModel100.pkl small.rfm --trees 200 --merge \\
+        --threshold-dtype float32 --value-dtype float32 --reference patients.csv
+    python forest_compress.py cancerModel100.pkl --sweep
+"""
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+
+from forest_engine import CompiledForest, load_compiled, random_inputs, save_compiled
+from inference import EXPECTED_COLUMNS, MODEL_PATH, load_model_file
+
+SWEEP_TREES = (50, 100, 200, 500, None)
+SWEEP_DEPTHS = (4, 6, 8, None)
+
+
+def narrow_thresholds(threshold, dtype):
+    """Cast thresholds to ``dtype``, rounding down so float32 inputs split the same way."""
+    narrowed = threshold.astype(dtype)
+    too_high = narrowed.astype(threshold.dtype) > threshold
+    narrowed[too_high] = np.nextafter(narrowed[too_high], dtype(-np.inf))
+    return narrowed
+
+
+def smallest_int(max_value):
+    # Narrowest signed/unsigned integer dtype holding 0..max_value
+    for dtype in (np.uint8, np.int16, np.int32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def compress(forest, n_trees=None, max_depth=None, merge=False, threshold_dtype=None, value_dtype=None):
+    """Return a new ``CompiledForest`` with the requested transforms applied.
+
+    The original forest is left untouched. With ``merge`` the internal
+    nodes of merged subtrees keep the class distribution of the first copy
+    seen, so cap depth in the same call rather than on an already merged
+    forest.
+    """
+    threshold = forest.threshold if threshold_dtype is None else narrow_thresholds(forest.threshold, threshold_dtype)
+    value = forest.value if value_dtype is None else forest.value.astype(value_dtype)
+    feature, left = forest.feature, forest.left
+    right = forest.right
+
+    out_feature, out_threshold, out_left, out_right, out_value = [], [], [], [], []
+    memo = {}
+
+    def emit(key, src, children):
+        if merge and key in memo:
+            return memo[key]
+        new = len(out_feature)
+        is_leaf = children is None
+        out_feature.append(0 if is_leaf else feature[src])
+        out_threshold.append(0.0 if is_leaf else threshold[src])
+        out_left.append(new if is_leaf else children[0])
+        out_right.append(new if is_leaf else children[1])
+        out_value.append(value[src])
+        memo[key] = new
+        return new
+
+    def build(node, depth):
+        # Returns (new node id, height of the new subtree)
+        if left[node] == node or (max_depth is not None and depth >= max_depth):
+            return emit(("leaf", value[node].tobytes()), node, None), 0
+        new_left, left_height = build(left[node], depth + 1)
+        new_right, right_height = build(right[node], depth + 1)
+        if merge and new_left == new_right:
+            return new_left, left_height
+        key = ("split", int(feature[node]), threshold[node].tobytes(), new_left, new_right)
+        return emit(key, node, (new_left, new_right)), max(left_height, right_height) + 1
+
+    roots, heights = [], []
+    for root in forest.roots[:n_trees]:
+        new_root, height = build(int(root), 0)
+        roots.append(new_root)
+        heights.append(height)
+
+    index_dtype = np.int32 if len(out_feature) < 2 ** 30 else np.int64
+    left_arr = np.asarray(out_left, dtype=index_dtype)
+    right_arr = np.asarray(out_right, dtype=index_dtype)
+    return CompiledForest(
+        feature=np.asarray(out_feature, dtype=smallest_int(forest.n_features_in_ - 1)),
+        threshold=np.asarray(out_threshold, dtype=threshold.dtype),
+        left=left_arr,
+        right=right_arr,
+        value=np.ascontiguousarray(np.asarray(out_value, dtype=value.dtype)),
+        roots=np.asarray(roots, dtype=index_dtype),
+        classes=forest.classes_,
+        max_depth=max(heights, default=0),
+        feature_names=forest.feature_names_in_,
+        children=np.stack([right_arr, left_arr], axis=1).ravel(),
+    )
+
+
+def in_memory_bytes(forest):
+    return sum(getattr(forest, name).nbytes
+               for name in ("feature", "threshold", "left", "right", "value", "roots", "children"))
+
+
+def agreement(reference_proba, proba):
+    """Label agreement and probability error of ``proba`` against ``reference_proba``."""
+    diff = np.abs(reference_proba - proba)
+    return {
+        "label_agreement": float(np.mean(reference_proba.argmax(axis=1) == proba.argmax(axis=1))),
+        "max_abs_diff": float(diff.max()),
+        "mean_abs_diff": float(diff.mean()),
+    }
+
+
+def latency(forest, X, repeat=200):
+    """Median single-row latency (ms) and bulk throughput (rows/s) on ``X``."""
+    single = []
+    for row in X[:repeat]:
+        start = time.perf_counter()
+        forest.predict_proba(row)
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    forest.predict_proba(X)
+    bulk = time.perf_counter() - start
+    return {"single_ms": statistics.median(single) * 1000, "rows_per_sec": len(X) / bulk}
+
+
+def load_time_ms(load, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def reference_matrix(path):
+    from batch_score import detect_format, iter_chunks
+    from inference import feature_matrix
+
+    return np.concatenate([feature_matrix(chunk) for chunk in iter_chunks(path, detect_format(path))])
+
+
+def describe(forest):
+    return f"{forest.n_estimators} trees, {forest.node_count} nodes, max depth {forest.max_depth}"
+
+
+def sweep(original, grid):
+    """Print agreement, size and throughput over a grid of tree counts and depths."""
+    reference = original.predict_proba(grid)
+    print(f"{'trees':>6s} {'depth':>6s} {'nodes':>8s} {'KiB':>8s} {'agree':>8s} {'max diff':>9s} {'rows/s':>10s}")
+    for n_trees in SWEEP_TREES:
+        for depth in SWEEP_DEPTHS:
+            candidate = compress(original, n_trees, depth, merge=True, threshold_dtype=np.float32)
+            start = time.perf_counter()
+            proba = candidate.predict_proba(grid)
+            rows_per_sec = len(grid) / (time.perf_counter() - start)
+            scores = agreement(reference, proba)
+            print(f"{n_trees or original.n_estimators:6d} {depth or original.max_depth:6d} "
+                  f"{candidate.node_count:8d} {in_memory_bytes(candidate) / 1024:8.1f} "
+                  f"{scores['label_agreement']:8.2%} {scores['max_abs_diff']:9.4f} {rows_per_sec:10,.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compress a random forest and report the accuracy/latency trade-off.")
+    parser.add_argument("source", nargs="?", default=MODEL_PATH, help="model artifact (.pkl, .npz or .rfm)")
+    parser.add_argument("dest", nargs="?", help="output .rfm or .npz path")
+    parser.add_argument("--trees", type=int, help="keep the first N trees")
+    parser.add_argument("--max-depth", type=int, help="cap every tree at this depth")
+    parser.add_argument("--merge", action="store_true", help="merge identical subtrees into a DAG")
+    parser.add_argument("--threshold-dtype", choices=["float64", "float32"])
+    parser.add_argument("--value-dtype", choices=["float64", "float32", "float16"])
+    parser.add_argument("--reference", help="CSV/Parquet file of real patients to check agreement on")
+    parser.add_argument("--grid-rows", type=int, default=100_000,
+                        help="rows sampled from the app's input grid (default: %(default)s)")
+    parser.add_argument("--min-agreement", type=float,
+                        help="exit non-zero if label agreement on any check set is below this fraction")
+    parser.add_argument("--sweep", action="store_true",
+                        help="print the trade-off over several tree counts and depths instead of writing a file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    original = load_model_file(args.source)
+    grid = random_inputs(args.grid_rows, len(EXPECTED_COLUMNS), args.seed)
+    if args.sweep:
+        sweep(original, grid)
+        return
+    if args.dest is None:
+        parser.error("dest is required unless --sweep is given")
+
+    candidate = compress(
+        original, args.trees, args.max_depth, args.merge,
+        threshold_dtype=np.dtype(args.threshold_dtype).type if args.threshold_dtype else None,
+        value_dtype=np.dtype(args.value_dtype).type if args.value_dtype else None,
+    )
+    save_compiled(candidate, args.dest)
+    compressed = load_compiled(args.dest)
+    print(f"original:   {describe(original)}")
+    print(f"compressed: {describe(compressed)}")
+
+    check_sets = {"grid": grid}
+    if args.reference:
+        check_sets["reference"] = reference_matrix(args.reference)
+    failed = []
+    for name, X in check_sets.items():
+        scores = agreement(original.predict_proba(X), compressed.predict_proba(X))
+        print(f"{name:10s} {len(X):9,} rows  label agreement {scores['label_agreement']:.4%}  "
+              f"max |diff| {scores['max_abs_diff']:.3g}  mean |diff| {scores['mean_abs_diff']:.3g}")
+        if args.min_agreement is not None and scores["label_agreement"] < args.min_agreement:
+            failed.append(name)
+
+    X = grid[:10_000]
+    print(f"{'':12s} {'file KiB':>10s} {'arrays KiB':>11s} {'load ms':>9s} {'1-row ms':>9s} {'rows/s':>11s}")
+    for name, path, forest, load in (
+        ("original", args.source, original, lambda: load_model_file(args.source)),
+        ("compressed", args.dest, compressed, lambda: load_compiled(args.dest)),
+    ):
+        speed = latency(forest, X)
+        print(f"{name:12s} {os.path.getsize(path) / 1024:10.1f} {in_memory_bytes(forest) / 1024:11.1f} "
+              f"{load_time_ms(load):9.2f} {speed['single_ms']:9.3f} {speed['rows_per_sec']:11,.0f}")
+
+    if failed:
+        raise SystemExit(f"label agreement below {args.min_agreement:.2%} on: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""Array-based inference engine for the random forest.
+
+Every tree of a fitted ``RandomForestClassifier`` is flattened into shared,
+contiguous NumPy arrays (split feature, threshold, left/right child and the
+normalized class distribution of each node). Prediction walks all trees for
+a whole batch of rows together, one tree level per step, instead of calling
+each ``DecisionTreeClassifier`` in a Python loop.
+
+Export a pickled model to the compiled format and check it against sklearn:
+
+    python forest_engine.py export cancerModel100.pkl cancerModel100.npz --verify
+    python forest_engine.py export cancerModel100.pkl cancerModel100.rfm --verify
+
+``.rfm`` files hold the same arrays as raw, 64-byte aligned buffers after a
+small JSON header. They are opened with ``np.memmap``: loading only parses
+the header, and every process serving the same file shares its pages
+through the OS page cache instead of holding a private copy.
+"""
+import argparse
+import json
+import struct
+
+import numpy as np
+
+# Upper bound on (trees x rows) node indices per traversal block; small blocks
+# keep the working set in cache (64k is ~64 rows for a 1000-tree forest)
+DEFAULT_BLOCK_SIZE = 64_000
+
+# Memory-mapped format: magic, little-endian uint64 header length, JSON header,
+# then each array at an offset aligned to MAPPED_ALIGNMENT bytes
+MAPPED_MAGIC = b"RFMAP001"
+MAPPED_ALIGNMENT = 64
+MAPPED_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "children")
+
+
+class CompiledForest:
+    """Random forest flattened into contiguous arrays.
+
+    Node ``i`` of the flattened forest splits on ``feature[i]`` at
+    ``threshold[i]``: rows with ``x <= threshold`` go to ``left[i]``, the
+    others to ``right[i]``. Leaves point to themselves, so a traversal of
+    ``max_depth`` steps always ends on a leaf. ``roots`` holds the index of
+    each tree's root node and ``value`` the class distribution of every node.
+    Inputs must be finite: NaN fails every ``<=`` test and would go right,
+    where sklearn sends it to a learned or majority child, so callers reject
+    non-finite features first (``inference.feature_matrix``). The object
+    mimics the parts of the sklearn API the app uses (``classes_``,
+    ``predict``, ``predict_proba``).
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes,
+                 max_depth, feature_names=None, children=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.max_depth = int(max_depth)
+        self.feature_names_in_ = None if feature_names is None else np.asarray(feature_names, dtype=object)
+        self.n_features_in_ = int(feature.max(initial=0)) + 1 if feature_names is None else len(feature_names)
+        # Interleaved (right, left) children: the next node is children[2 * node + go_left]
+        if children is None:
+            children = np.stack([right, left], axis=1).ravel().astype(np.intp)
+        self.children = children
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flatten a fitted ``RandomForestClassifier`` (single output)."""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back to themselves so extra traversal steps are no-ops
+            left = np.where(is_leaf, ids, tree.children_left) + offset
+            right = np.where(is_leaf, ids, tree.children_right) + offset
+            feature = np.where(is_leaf, 0, tree.feature)
+            threshold = np.where(is_leaf, 0.0, tree.threshold)
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :len(model.classes_)].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            values.append(value)
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.int32),
+            classes=model.classes_,
+            max_depth=max_depth,
+            feature_names=getattr(model, "feature_names_in_", None),
+        )
+
+    def _block_rows(self, block_size):
+        return max(1, block_size // max(1, self.n_estimators))
+
+    def apply(self, X, block_size=DEFAULT_BLOCK_SIZE):
+        """Return the leaf reached in every tree, shape ``(n_estimators, n_rows)``."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        leaves = np.empty((self.n_estimators, X.shape[0]), dtype=np.intp)
+        step = self._block_rows(block_size)
+        for start in range(0, X.shape[0], step):
+            leaves[:, start:start + step] = self._apply_block(X[start:start + step])
+        return leaves
+
+    def _apply_block(self, X):
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_base = np.arange(n_rows, dtype=np.int64) * n_features
+        node = np.repeat(self.roots.astype(np.intp)[:, None], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            # float32 inputs compared against float64 thresholds, as sklearn does
+            go_left = flat[row_base + self.feature[node]] <= self.threshold[node]
+            node = self.children[2 * node + go_left]
+        return node
+
+    def predict_proba(self, X, block_size=DEFAULT_BLOCK_SIZE):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        proba = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        step = self._block_rows(block_size)
+        for start in range(0, X.shape[0], step):
+            leaves = self._apply_block(X[start:start + step])
+            # Sum over the leading (tree) axis in float64, even when the leaf values
+            # are stored narrower, to mirror sklearn's tree-by-tree accumulation;
+            # results agree to the last bit or within rounding
+            block = self.value[leaves].sum(axis=0, dtype=np.float64)
+            block /= self.n_estimators
+            proba[start:start + step] = block
+        return proba
+
+    @property
+    def expected_value(self):
+        """Mean class distribution at the roots: the prediction before any split."""
+        return self.value[self.roots].mean(axis=0, dtype=np.float64)
+
+    def _edge_delta(self):
+        # Change in class distribution along each (node, go_left) edge, laid out
+        # like ``children``, plus a leaf mask; computed once per forest
+        cached = getattr(self, "_edge_cache", None)
+        if cached is None:
+            parents = np.arange(self.node_count).repeat(2)
+            # One contiguous row per class, so each class gathers straight into bincount weights
+            delta = np.ascontiguousarray((self.value[self.children] - self.value[parents]).T)
+            is_leaf = self.children[1::2] == np.arange(self.node_count)
+            cached = self._edge_cache = (delta, is_leaf)
+        return cached
+
+    def predict_proba_contributions(self, X, block_size=DEFAULT_BLOCK_SIZE):
+        """``predict_proba`` plus Saabas-style feature contributions, in one traversal.
+
+        Every split a row passes through moves its prediction from the
+        parent's class distribution to the child's; that change is credited
+        to the split feature. Returns ``(proba, contributions)`` where
+        ``contributions`` has shape ``(n_rows, n_features, n_classes)`` and
+        ``expected_value + contributions.sum(axis=1)`` equals ``proba`` up to
+        rounding. ``proba`` is identical to ``predict_proba``. On a forest
+        with merged subtrees (see ``forest_compress``) the totals still add
+        up, but the split between features is approximate.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_features = X.shape
+        proba = np.empty((n_rows, len(self.classes_)), dtype=np.float64)
+        contributions = np.empty((n_rows, n_features, len(self.classes_)), dtype=np.float64)
+        step = self._block_rows(block_size)
+        for start in range(0, n_rows, step):
+            leaves = self._contributions_block(X[start:start + step], contributions[start:start + step])
+            block = self.value[leaves].sum(axis=0, dtype=np.float64)
+            block /= self.n_estimators
+            proba[start:start + step] = block
+        contributions /= self.n_estimators
+        return proba, contributions
+
+    def _contributions_block(self, X, out):
+        # Fills ``out`` with the per-feature sums of edge deltas over all trees and
+        # returns the leaves like ``_apply_block``. Unlike the fixed ``max_depth``
+        # loop there, (tree, row) pairs drop out as soon as they reach a leaf,
+        # so the extra work tracks the actual path lengths.
+        edge_delta, is_leaf = self._edge_delta()
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        size = n_rows * n_features
+        totals = out.reshape(size, -1)
+        totals[:] = 0.0
+        leaves = np.empty(self.n_estimators * n_rows, dtype=np.intp)
+        position = np.arange(leaves.size)
+        node = np.repeat(self.roots.astype(np.intp), n_rows)
+        row_base = np.tile(np.arange(n_rows, dtype=np.intp) * n_features, self.n_estimators)
+        while node.size:
+            slot = row_base + self.feature[node]
+            edge = 2 * node + (flat[slot] <= self.threshold[node])
+            node = self.children[edge]
+            for c in range(totals.shape[1]):
+                totals[:, c] += np.bincount(slot, weights=edge_delta[c][edge], minlength=size)
+            done = is_leaf[node]
+            leaves[position[done]] = node[done]
+            active = ~done
+            node, row_base, position = node[active], row_base[active], position[active]
+        return leaves.reshape(self.n_estimators, n_rows)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def save(self, path):
+        """Write the compiled forest to an ``.npz`` file."""
+        arrays = dict(
+            feature=self.feature, threshold=self.threshold, left=self.left,
+            right=self.right, value=self.value, roots=self.roots,
+            classes=self.classes_, max_depth=np.asarray(self.max_depth),
+        )
+        if self.feature_names_in_ is not None:
+            arrays["feature_names"] = np.asarray(self.feature_names_in_, dtype=str)
+        with open(path, "wb") as file:
+            np.savez(file, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                feature=data["feature"], threshold=data["threshold"],
+                left=data["left"], right=data["right"], value=data["value"],
+                roots=data["roots"], classes=data["classes"],
+                max_depth=data["max_depth"],
+                feature_names=data["feature_names"].tolist() if "feature_names" in data else None,
+            )
+
+    def save_mapped(self, path):
+        """Write the forest as a memory-mappable ``.rfm`` file."""
+        header = {
+            "classes": self.classes_.tolist(),
+            "max_depth": self.max_depth,
+            "feature_names": None if self.feature_names_in_ is None else [str(n) for n in self.feature_names_in_],
+            "arrays": {},
+        }
+        arrays = {name: np.ascontiguousarray(getattr(self, name)) for name in MAPPED_ARRAYS}
+        # Offsets depend on the header size, so lay out the header until it stops growing
+        header_size = 0
+        while True:
+            offset = _align(len(MAPPED_MAGIC) + 8 + header_size)
+            for name, array in arrays.items():
+                header["arrays"][name] = {"offset": offset, "dtype": array.dtype.str,
+                                          "shape": list(array.shape)}
+                offset = _align(offset + array.nbytes)
+            encoded = json.dumps(header).encode()
+            if len(encoded) == header_size:
+                break
+            header_size = len(encoded)
+
+        with open(path, "wb") as file:
+            file.write(MAPPED_MAGIC + struct.pack("<Q", len(encoded)) + encoded)
+            for name, array in arrays.items():
+                file.write(b"\0" * (header["arrays"][name]["offset"] - file.tell()))
+                file.write(array.tobytes())
+
+    @classmethod
+    def load_mapped(cls, path):
+        """Open an ``.rfm`` file; the arrays are read-only views of the mapped file."""
+        with open(path, "rb") as file:
+            if file.read(len(MAPPED_MAGIC)) != MAPPED_MAGIC:
+                raise ValueError(f"{path} is not a memory-mapped forest file")
+            (header_size,) = struct.unpack("<Q", file.read(8))
+            header = json.loads(file.read(header_size))
+        mapped = np.memmap(path, dtype=np.uint8, mode="r")
+        arrays = {
+            name: np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]),
+                             buffer=mapped, offset=spec["offset"])
+            for name, spec in header["arrays"].items()
+        }
+        return cls(classes=header["classes"], max_depth=header["max_depth"],
+                   feature_names=header["feature_names"], **arrays)
+
+
+def _align(offset):
+    return -(-offset // MAPPED_ALIGNMENT) * MAPPED_ALIGNMENT
+
+
+def load_compiled(path):
+    # Open a compiled forest, memory-mapped (.rfm) or from an .npz archive
+    if str(path).endswith(".rfm"):
+        return CompiledForest.load_mapped(path)
+    return CompiledForest.load(path)
+
+
+def save_compiled(forest, path):
+    if str(path).endswith(".rfm"):
+        forest.save_mapped(path)
+    else:
+        forest.save(path)
+
+
+def compile_forest(model):
+    # Compile sklearn forests; anything else (already compiled, other estimators) is returned as is
+    if hasattr(model, "estimators_"):
+        return CompiledForest.from_sklearn(model)
+    return model
+
+
+def max_abs_difference(model, compiled, X):
+    """Largest absolute gap between sklearn's and the compiled ``predict_proba``."""
+    reference = model.predict_proba(np.asarray(X, dtype=np.float32))
+    return float(np.abs(reference - compiled.predict_proba(X)).max())
+
+
+def random_inputs(n_rows, n_features, seed=0):
+    # Integer inputs in the ranges the app collects (Age 1-100, Gender 1-2, the rest 1-10)
+    rng = np.random.default_rng(seed)
+    X = rng.integers(1, 11, (n_rows, n_features))
+    X[:, 0] = rng.integers(1, 101, n_rows)
+    X[:, 1] = rng.integers(1, 3, n_rows)
+    return X.astype(np.float32)
+
+
+def main(argv=None):
+    from inference import load_model_file
+
+    parser = argparse.ArgumentParser(description="Compile a pickled random forest into flat arrays.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write a compiled .npz or memory-mapped .rfm model")
+    export.add_argument("source", help="pickled RandomForestClassifier")
+    export.add_argument("dest", help="output .npz or .rfm path")
+    export.add_argument("--verify", action="store_true",
+                        help="compare predict_proba with sklearn on random inputs")
+    export.add_argument("--verify-rows", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    model = load_model_file(args.source, compiled=False)
+    compiled = CompiledForest.from_sklearn(model)
+    save_compiled(compiled, args.dest)
+    print(f"Wrote {args.dest}: {compiled.n_estimators} trees, {compiled.node_count} nodes, "
+          f"max depth {compiled.max_depth}")
+
+    if args.verify:
+        X = random_inputs(args.verify_rows, compiled.n_features_in_)
+        diff = max_abs_difference(model, load_compiled(args.dest), X)
+        print(f"max |predict_proba difference| over {args.verify_rows} rows: {diff:.3g}")
+        if diff > 1e-9:
+            raise SystemExit("compiled model does not match sklearn")
+
+
+if __name__ == "__main__":
+    main()
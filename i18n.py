@@ -0,0 +1,18 @@
+"""UI translation catalog.
+
+The English/Indonesian strings live in ``translations.json`` next to this
+module. The catalog is parsed once per process and the same dict is shared
+by every Streamlit rerun and session, so treat it as read-only.
+"""
+import json
+import os
+from functools import lru_cache
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translations.json")
+
+
+@lru_cache(maxsize=None)
+def load_catalog(path=CATALOG_PATH):
+    """Return ``{language: {key: text}}`` from the catalog file."""
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
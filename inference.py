@@ -0,0 +1,251 @@
+import os
+import pickle
+
+import numpy as np
+
+# Location of the trained model (.pkl, or a compiled .npz/.rfm export)
+MODEL_PATH = os.environ.get('MODEL_PATH', './cancerModel100.pkl')
+
+# Define the expected column names and order
+EXPECTED_COLUMNS = [
+    "Age", "Gender", "Air Pollution", "Alcohol use", "Dust Allergy",
+    "OccuPational Hazards", "Genetic Risk", "chronic Lung Disease",
+    "Balanced Diet", "Obesity", "Smoking", "Passive Smoker",
+    "Chest Pain", "Coughing of Blood", "Fatigue", "Weight Loss",
+    "Shortness of Breath", "Wheezing", "Swallowing Difficulty",
+    "Clubbing of Finger Nails", "Frequent Cold", "Dry Cough", "Snoring"
+]
+
+# Define correct risk level mapping
+RISK_MAPPING = {
+    0: "Low",    # 0 means Low risk
+    1: "Medium", # 1 means Medium risk
+    2: "High"    # 2 means High risk
+}
+
+
+# Accepted range of each input, as collected by the app's assessment form
+FEATURE_RANGES = {col: (1, 100) if col == "Age" else (1, 2) if col == "Gender" else (1, 10)
+                  for col in EXPECTED_COLUMNS}
+
+
+# Inputs a patient can change; recommendations are drawn only from these
+MODIFIABLE_FACTORS = [
+    "Smoking", "Passive Smoker", "Air Pollution", "Alcohol use",
+    "Balanced Diet", "Obesity", "OccuPational Hazards"
+]
+
+
+def artifact_fingerprint(path=MODEL_PATH):
+    # Identifies one version of a model file; changes whenever the file is replaced
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def load_model_file(path=MODEL_PATH, compiled=True):
+    """Load the trained forest from ``path``.
+
+    ``.npz`` and memory-mapped ``.rfm`` files are read as an already
+    compiled forest (see ``forest_engine``). Pickled sklearn forests are
+    compiled into the array-based engine unless ``compiled`` is false.
+    """
+    from forest_engine import compile_forest, load_compiled
+
+    if str(path).endswith(('.npz', '.rfm')):
+        return load_compiled(path)
+    with open(path, 'rb') as file:
+        model = pickle.load(file)
+    return compile_forest(model) if compiled else model
+
+
+def new_feature_vector():
+    # Preallocated feature vector in EXPECTED_COLUMNS order, ready to be filled in place
+    return np.empty(len(EXPECTED_COLUMNS), dtype=np.float32)
+
+
+def forest_proba(model, X):
+    """``predict_proba`` for a plain 2-D array of features in ``EXPECTED_COLUMNS`` order.
+
+    For a fitted random forest this calls each tree directly with input
+    validation turned off, skipping the DataFrame and feature-name checks
+    that dominate the cost for small inputs. The result is identical to
+    ``model.predict_proba``.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None:
+        return model.predict_proba(X)
+
+    proba = np.zeros((X.shape[0], len(model.classes_)), dtype=np.float64)
+    for estimator in estimators:
+        proba += estimator.predict_proba(X, check_input=False)
+    proba /= len(estimators)
+    return proba
+
+
+def _leaf_table(model):
+    # Per node of every tree of a fitted sklearn forest: its class distribution (exactly
+    # what the tree's predict_proba returns) followed by the per-feature risk contributions
+    # accumulated on the path from the root. Built once per model, one tree level per step.
+    cached = getattr(model, "_leaf_table_cache", None)
+    if cached is not None:
+        return cached
+    n_classes = len(model.classes_)
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    offsets = np.concatenate([[0], np.cumsum([tree.node_count for tree in trees])[:-1]])
+    values, left, right = [], [], []
+    for tree, offset in zip(trees, offsets):
+        value = tree.value[:, 0, :n_classes].astype(np.float64)
+        # scikit-learn < 1.4 stores class counts and normalizes them in predict_proba;
+        # later versions store the fractions and return them untouched
+        counts = ~np.isclose(value.sum(axis=1), 1.0)
+        normalizer = value[counts].sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        value[counts] /= normalizer
+        values.append(value)
+        left.append(np.where(tree.children_left >= 0, tree.children_left + offset, -1))
+        right.append(np.where(tree.children_right >= 0, tree.children_right + offset, -1))
+    value, left, right = np.concatenate(values), np.concatenate(left), np.concatenate(right)
+    feature = np.concatenate([tree.feature for tree in trees])
+    risk = value @ np.asarray(model.classes_, dtype=np.float64)
+
+    table = np.zeros((len(value), n_classes + model.n_features_in_))
+    table[:, :n_classes] = value
+    contributions = table[:, n_classes:]
+    node = offsets
+    while node.size:
+        node = node[left[node] >= 0]
+        for child in (left[node], right[node]):
+            contributions[child] = contributions[node]
+            contributions[child, feature[node]] += risk[child] - risk[node]
+        node = np.concatenate([left[node], right[node]])
+    model._leaf_table_cache = table, offsets
+    return model._leaf_table_cache
+
+
+def forest_explain(model, X, block_rows=8192):
+    """``forest_proba`` plus per-feature risk scores for a fitted sklearn forest.
+
+    A row's Saabas contributions in one tree depend only on the leaf it
+    reaches, so they are tabulated per node once (see ``_leaf_table``) and
+    scoring is one ``apply`` per tree followed by a sparse sum over the
+    reached leaves. Returns ``(probabilities, risk_scores)``; the
+    probabilities are identical to ``forest_proba`` and the risk scores
+    match ``risk_contributions`` of a compiled forest up to rounding.
+    """
+    from scipy.sparse import csr_matrix
+
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    table, offsets = _leaf_table(model)
+    n_classes, n_trees = len(model.classes_), len(model.estimators_)
+    proba = np.empty((X.shape[0], n_classes))
+    risk_scores = np.empty((X.shape[0], table.shape[1] - n_classes))
+    for start in range(0, X.shape[0], block_rows):
+        block = X[start:start + block_rows]
+        leaves = np.empty((block.shape[0], n_trees), dtype=np.intp)
+        for t, estimator in enumerate(model.estimators_):
+            leaves[:, t] = estimator.apply(block, check_input=False)
+        leaves += offsets
+        # Row i of ``reached`` picks its leaf in each tree, in tree order like forest_proba
+        reached = csr_matrix((np.ones(leaves.size), leaves.ravel(), np.arange(0, leaves.size + 1, n_trees)),
+                             shape=(block.shape[0], table.shape[0]))
+        sums = reached @ table
+        sums /= n_trees
+        proba[start:start + block_rows] = sums[:, :n_classes]
+        risk_scores[start:start + block_rows] = sums[:, n_classes:]
+    return proba, risk_scores
+
+
+def predict_one(model, features):
+    """Score a single patient in one forest pass.
+
+    ``features`` is a 1-D vector in ``EXPECTED_COLUMNS`` order (see
+    ``new_feature_vector``). Returns ``(predicted_class, probabilities)`` where
+    the class comes from the argmax of the probabilities via ``model.classes_``.
+    """
+    proba = forest_proba(model, features.reshape(1, -1))[0]
+    return model.classes_[np.argmax(proba)], proba
+
+
+def explain_one(model, features):
+    """``predict_one`` plus per-feature contributions from the same forest pass.
+
+    Needs a compiled forest (see ``forest_engine``). Returns
+    ``(predicted_class, probabilities, contributions)``; ``contributions``
+    has one row per feature in ``EXPECTED_COLUMNS`` order and one column per
+    class.
+    """
+    proba, contributions = model.predict_proba_contributions(features.reshape(1, -1))
+    return model.classes_[np.argmax(proba[0])], proba[0], contributions[0]
+
+
+def risk_contributions(classes, contributions):
+    """Collapse per-class contributions into one risk score per feature.
+
+    The score is each feature's contribution to the expected class index
+    (0 = Low ... 2 = High), so positive values push the patient towards a
+    higher risk level.
+    """
+    return contributions @ np.asarray(classes, dtype=np.float64)
+
+
+def top_risk_factors(classes, contributions, factors=MODIFIABLE_FACTORS, k=3):
+    # The k ``factors`` raising the risk the most, as (column, score), largest first
+    scores = risk_contributions(classes, contributions)
+    ranked = sorted(((col, scores[EXPECTED_COLUMNS.index(col)]) for col in factors),
+                    key=lambda item: item[1], reverse=True)
+    return [(col, score) for col, score in ranked[:k] if score > 0]
+
+
+def probability_columns(model):
+    # Output column names for the per-class probabilities, in model.classes_ order
+    return [f"Prob {RISK_MAPPING[cls]}" for cls in model.classes_]
+
+
+def feature_matrix(df):
+    # float32 features of ``df`` in EXPECTED_COLUMNS order; extra columns are ignored
+    missing = [col for col in EXPECTED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    X = df[EXPECTED_COLUMNS].to_numpy(dtype=np.float32)
+    # The forest would route NaN and infinities down an arbitrary branch; refuse them instead
+    bad = ~np.isfinite(X)
+    if bad.any():
+        rows = df.index[bad.any(axis=1)]
+        columns = [col for col, flagged in zip(EXPECTED_COLUMNS, bad.any(axis=0)) if flagged]
+        shown = ", ".join(str(row) for row in rows[:10]) + (f" and {len(rows) - 10} more" if len(rows) > 10 else "")
+        raise ValueError(f"Missing or non-finite values in {', '.join(columns)} at rows {shown}")
+    return X
+
+
+def risk_labels(classes, proba):
+    # Risk level names for the argmax of each row of ``proba``, exactly what ``predict`` picks
+    labels = np.array([RISK_MAPPING[cls] for cls in classes], dtype=object)
+    return labels[np.argmax(proba, axis=1)]
+
+
+def score_frame(model, df):
+    """Score every row of ``df`` and return ``(risk_labels, probabilities)``.
+
+    ``df`` must contain all of ``EXPECTED_COLUMNS``; extra columns are ignored.
+    The forest is evaluated once and the label is taken from the argmax of
+    the probabilities, which is exactly what ``model.predict`` does.
+    """
+    proba = forest_proba(model, feature_matrix(df))
+    return risk_labels(model.classes_, proba), proba
+
+
+def explain_frame(model, df):
+    """``score_frame`` plus per-feature risk scores (see ``risk_contributions``).
+
+    Returns ``(risk_labels, probabilities, risk_scores)`` with ``risk_scores``
+    of shape ``(n_rows, len(EXPECTED_COLUMNS))``. A fitted sklearn forest
+    goes through ``forest_explain``; a compiled forest computes the
+    contributions during its own traversal.
+    """
+    X = feature_matrix(df)
+    if getattr(model, "estimators_", None) is not None:
+        proba, risk_scores = forest_explain(model, X)
+        return risk_labels(model.classes_, proba), proba, risk_scores
+    proba, contributions = model.predict_proba_contributions(X)
+    return risk_labels(model.classes_, proba), proba, risk_contributions(model.classes_, contributions)
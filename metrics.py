@@ -0,0 +1,153 @@
+"""Lightweight hot-path timing and Prometheus-style metrics export.
+
+Stage timings are recorded into fixed-bucket histograms (one ``bisect`` and
+a few additions per observation), so instrumentation can stay on in
+production. The process-wide ``REGISTRY`` is rendered in the Prometheus text
+exposition format, either served by ``api_server.py`` at ``/metrics`` or
+written to the file named by ``METRICS_FILE`` (for node_exporter's textfile
+collector) by the Streamlit app.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds; the last bucket is +Inf
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_FILE = os.environ.get("METRICS_FILE")
+METRICS_PREFIX = "lungcancer"
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus semantics (cumulative on export)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Process-wide counters and per-stage latency histograms."""
+
+    def __init__(self, prefix=METRICS_PREFIX, buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.counters = {}
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._last_export = 0.0
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def summary(self):
+        # {stage: {"count", "p50_ms", "p99_ms", "mean_ms"}} for display
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "p50_ms": h.quantile(0.50) * 1000,
+                    "p99_ms": h.quantile(0.99) * 1000,
+                    "mean_ms": h.sum / h.count * 1000,
+                }
+                for stage, h in self.stages.items() if h.count
+            }
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+            if self.stages:
+                metric = f"{self.prefix}_stage_seconds"
+                lines += [f"# HELP {metric} Time spent in each prediction stage.",
+                          f"# TYPE {metric} histogram"]
+                for stage, h in sorted(self.stages.items()):
+                    cumulative = 0
+                    for bound, n in zip(self.buckets + (float("inf"),), h.counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                    lines.append(f'{metric}_sum{{stage="{stage}"}} {h.sum!r}')
+                    lines.append(f'{metric}_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        # Write atomically so a scraper never reads a half-written file
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as file:
+            file.write(self.render())
+        os.replace(tmp, path)
+
+    def maybe_export(self, path=METRICS_FILE, min_interval=5.0):
+        """Export to ``path`` at most once per ``min_interval`` seconds (no-op without a path)."""
+        if not path:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_export < min_interval:
+                return False
+            self._last_export = now
+        self.export(path)
+        return True
+
+
+REGISTRY = MetricsRegistry()
+
+
+class StageTimer:
+    """Times consecutive stages of one run.
+
+    Each ``mark(stage)`` records the time since the previous mark (or since
+    creation/``restart``) under ``stage``, both in the registry and in
+    ``timings`` for this run.
+    """
+
+    def __init__(self, registry=REGISTRY):
+        self.registry = registry
+        self.timings = {}
+        self._last = time.perf_counter()
+
+    def restart(self):
+        # Exclude whatever ran since the last mark (e.g. debug output)
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.timings[stage] = elapsed
+        self.registry.observe(stage, elapsed)
+        return elapsed
@@ -0,0 +1,190 @@
+"""Hot reloading of the served model.
+
+``ModelManager`` watches a model artifact, or a directory of versioned
+artifacts, on a background thread. When it changes, the new model is loaded
+and validated off the request path and then swapped in with a single
+reference assignment. Callers take ``manager.current()`` once per request
+and use that snapshot throughout, so in-flight requests finish on the old
+model while new requests see the new one.
+
+Replace artifacts by writing a new file and renaming it over the old one
+(or by adding a new version directory); overwriting a memory-mapped
+``.rfm`` file in place would change it under the running model.
+"""
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from inference import EXPECTED_COLUMNS, MODEL_PATH, RISK_MAPPING, artifact_fingerprint, load_model_file
+
+MODEL_EXTENSIONS = (".rfm", ".npz", ".pkl")
+DEFAULT_POLL_INTERVAL = float(os.environ.get("MODEL_POLL_SECONDS", "5"))
+
+# One loaded model together with the artifact it came from
+ActiveModel = namedtuple("ActiveModel", ["model", "version", "path", "fingerprint", "loaded_at"])
+
+
+def resolve_artifact(path):
+    """Return the model file to serve for ``path``.
+
+    A file is served as is, except that a pickle with an up-to-date compiled
+    export beside it (``model.pkl`` -> ``model.rfm``/``model.npz``) is served
+    from the export, which loads without importing scikit-learn. For a
+    directory, the newest version wins by name: either model files directly
+    inside it, or version subdirectories each holding a
+    ``model.rfm``/``model.npz``/``model.pkl``. Numbers in names compare
+    by value, so ``v1000`` is newer than ``v999``.
+    """
+    if not os.path.isdir(path):
+        return compiled_sibling(path) or path
+    candidates = []
+    for name in sorted(os.listdir(path), key=natural_key):
+        full = os.path.join(path, name)
+        if os.path.isdir(full):
+            for ext in MODEL_EXTENSIONS:
+                inner = os.path.join(full, "model" + ext)
+                if os.path.exists(inner):
+                    candidates.append(inner)
+                    break
+        elif name.endswith(MODEL_EXTENSIONS):
+            candidates.append(full)
+    if not candidates:
+        raise FileNotFoundError(f"No model artifact found in {path}")
+    return candidates[-1]
+
+
+def natural_key(name):
+    # Sort key comparing the digit runs of ``name`` as numbers ("v999" < "v1000")
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def compiled_sibling(path):
+    """The compiled export next to pickle ``path`` if it is at least as new, else ``None``."""
+    stem, ext = os.path.splitext(path)
+    if ext != ".pkl" or not os.path.exists(path):
+        return None
+    for compiled_ext in MODEL_EXTENSIONS[:2]:
+        candidate = stem + compiled_ext
+        if os.path.exists(candidate) and os.stat(candidate).st_mtime_ns >= os.stat(path).st_mtime_ns:
+            return candidate
+    return None
+
+
+def pickle_source(path):
+    """The sklearn pickle behind artifact ``path``: itself, the ``.pkl`` beside an export, or ``None``."""
+    stem, ext = os.path.splitext(path)
+    if ext == ".pkl":
+        return path
+    return stem + ".pkl" if os.path.exists(stem + ".pkl") else None
+
+
+def validate_model(model):
+    """Raise ``ValueError`` unless ``model`` can serve the app's schema."""
+    unknown = [cls for cls in model.classes_ if cls not in RISK_MAPPING]
+    if unknown:
+        raise ValueError(f"Model classes {unknown} are not in RISK_MAPPING")
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None and list(names) != EXPECTED_COLUMNS:
+        raise ValueError("Model feature names do not match EXPECTED_COLUMNS")
+    if getattr(model, "n_features_in_", len(EXPECTED_COLUMNS)) != len(EXPECTED_COLUMNS):
+        raise ValueError(f"Model expects {model.n_features_in_} features, not {len(EXPECTED_COLUMNS)}")
+    # Smoke test: one prediction with well-formed probabilities
+    proba = model.predict_proba(np.full((1, len(EXPECTED_COLUMNS)), 3, dtype=np.float32))
+    if proba.shape != (1, len(model.classes_)) or not np.isclose(proba.sum(), 1.0):
+        raise ValueError("Model returned malformed probabilities")
+
+
+class ModelManager:
+    """Loads, validates and atomically swaps the served model."""
+
+    def __init__(self, path=MODEL_PATH, poll_interval=DEFAULT_POLL_INTERVAL, loader=load_model_file):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.loader = loader
+        self.swaps = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_load_ms = None
+        self.last_swap_ms = None
+        self._active = None
+        self._failed_fingerprint = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        """The model to use for one request (``None`` if nothing has loaded)."""
+        return self._active
+
+    def check(self):
+        """Load and swap in the artifact if it changed; returns True on a swap."""
+        with self._lock:
+            fingerprint = None
+            try:
+                artifact = resolve_artifact(self.path)
+                fingerprint = artifact_fingerprint(artifact)
+                active = self._active
+                if active is not None and active.fingerprint == fingerprint:
+                    return False
+                # Don't retry an artifact that already failed until it changes again
+                if fingerprint == self._failed_fingerprint:
+                    return False
+
+                start = time.perf_counter()
+                model = self.loader(artifact)
+                validate_model(model)
+                loaded = time.perf_counter()
+            except Exception as e:
+                # Keep serving the previous model; report the failure
+                self._failed_fingerprint = fingerprint
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                return False
+
+            self._active = ActiveModel(
+                model=model,
+                version=os.path.relpath(artifact, self.path) if os.path.isdir(self.path) else os.path.basename(artifact),
+                path=artifact,
+                fingerprint=fingerprint,
+                loaded_at=time.time(),
+            )
+            self.swaps += 1
+            self.last_error = None
+            self.last_load_ms = (loaded - start) * 1000
+            self.last_swap_ms = (time.perf_counter() - loaded) * 1000
+            return True
+
+    def start(self):
+        """Load the model now, then keep watching for changes in the background."""
+        self.check()
+        if self._thread is None and self.poll_interval > 0:
+            self._thread = threading.Thread(target=self._watch, name="model-manager", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check()
+
+    def stats(self):
+        active = self._active
+        return {
+            "version": active.version if active else None,
+            "path": active.path if active else None,
+            "loaded_at": active.loaded_at if active else None,
+            "swaps": self.swaps,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_load_ms": self.last_load_ms,
+            "last_swap_ms": self.last_swap_ms,
+        }
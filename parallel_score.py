@@ -0,0 +1,172 @@
+"""Multi-core batch scoring for very large patient files.
+
+The input is read chunk by chunk in the parent process and each chunk's
+feature matrix is scored on a pool of worker processes. Workers never
+receive the model through pickling: the compiled forest is placed in a
+memory-mapped ``.rfm`` file (the served ``.rfm`` itself, or an export in
+``/dev/shm``) that every worker maps once at startup, so all of them read
+the same physical pages. ``--private-trees`` instead has every worker
+unpickle its own sklearn forest: several times faster per row on large
+chunks, at the cost of one private copy of the model (and its load time)
+per worker. Results are written in input order, and at most
+``2 * workers`` chunks are in flight, so memory stays bounded however
+large the file is.
+
+    python parallel_score.py patients.parquet scored.parquet --workers 8
+"""
+import argparse
+import atexit
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from batch_score import DEFAULT_CHUNK_SIZE, attach_scores, detect_format, iter_chunks, write_scored
+from inference import MODEL_PATH, feature_matrix, forest_proba, load_model_file, risk_labels
+
+# Forest of the current worker process, loaded once by _init_worker
+_worker_forest = None
+
+
+def _init_worker(path, private_trees):
+    global _worker_forest
+    from forest_engine import load_compiled
+
+    _worker_forest = load_model_file(path, compiled=False) if private_trees else load_compiled(path)
+
+
+def _score_rows(X):
+    return forest_proba(_worker_forest, X)
+
+
+def _score_rows_timed(X):
+    start = time.perf_counter()
+    proba = forest_proba(_worker_forest, X)
+    return proba, time.perf_counter() - start
+
+
+def shared_memory_dir():
+    # tmpfs keeps the exported forest in RAM; fall back to the normal temp dir elsewhere
+    return "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+class ParallelScorer:
+    """A process pool that scores feature matrices with one shared compiled forest.
+
+    ``model_path`` may be any artifact ``load_model_file`` accepts. An
+    ``.rfm`` file, or the up-to-date ``.rfm`` export beside a pickle, is
+    mapped by the workers directly; anything else is compiled once and
+    exported to a temporary ``.rfm`` that is removed on ``close()``. With
+    ``private_trees`` every worker unpickles its own sklearn forest
+    instead, which matches serial ``batch_score`` exactly. Use as a
+    context manager.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, workers=None, private_trees=False):
+        from model_manager import compiled_sibling
+
+        self.workers = workers or os.cpu_count() or 1
+        self.private_trees = private_trees
+        self._export = None
+        sibling = compiled_sibling(str(model_path))
+        if private_trees or str(model_path).endswith(".rfm"):
+            shared_path = model_path
+        elif sibling is not None and sibling.endswith(".rfm"):
+            shared_path = sibling
+        else:
+            fd, shared_path = tempfile.mkstemp(suffix=".rfm", dir=shared_memory_dir())
+            os.close(fd)
+            self._export = shared_path
+            load_model_file(model_path).save_mapped(shared_path)
+        # The parent loads the same forest as the workers for classes_ and column names
+        self.model = load_model_file(shared_path, compiled=not private_trees)
+        # Spawn rather than fork: the app and the API have threads running, and a forked
+        # child can inherit one of their locks held forever
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_init_worker, initargs=(shared_path, private_trees))
+        atexit.register(self.close)
+
+    def map(self, matrices):
+        """Yield ``predict_proba`` for each matrix of ``matrices``, in order."""
+        return (proba for _, proba in self.map_with(((X, None) for X in matrices)))
+
+    def map_with(self, items):
+        """Score ``(X, payload)`` pairs; yields ``(payload, proba)`` in input order.
+
+        Keeps at most ``2 * workers`` matrices in flight, so ``items`` can be
+        a lazy iterator over a file of any size.
+        """
+        pending = deque()
+        for X, payload in items:
+            pending.append((payload, self._pool.submit(_score_rows, X)))
+            if len(pending) >= 2 * self.workers:
+                payload, future = pending.popleft()
+                yield payload, future.result()
+        while pending:
+            payload, future = pending.popleft()
+            yield payload, future.result()
+
+    def submit(self, X):
+        """Score ``X`` without waiting; the future resolves to ``(proba, seconds in the worker)``."""
+        return self._pool.submit(_score_rows_timed, X)
+
+    def predict_proba(self, X, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Score one large in-memory matrix, split into ``chunk_size`` row chunks."""
+        chunks = (X[i:i + chunk_size] for i in range(0, len(X), chunk_size))
+        return np.concatenate(list(self.map(chunks)))
+
+    def close(self):
+        atexit.unregister(self.close)
+        self._pool.shutdown()
+        if self._export is not None:
+            os.remove(self._export)
+            self._export = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def score_file_parallel(scorer, source, dest, in_fmt=None, out_fmt=None,
+                        chunk_size=DEFAULT_CHUNK_SIZE, progress=None, monitor=None):
+    """``batch_score.score_file`` on a ``ParallelScorer``; output rows keep the input order."""
+    in_fmt = in_fmt or detect_format(source)
+    items = ((feature_matrix(chunk), chunk) for chunk in iter_chunks(source, in_fmt, chunk_size))
+    scored = (attach_scores(chunk, scorer.model, risk_labels(scorer.model.classes_, proba), proba)
+              for chunk, proba in scorer.map_with(items))
+    return write_scored(scored, dest, out_fmt, progress, monitor)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of patients on several cores.")
+    parser.add_argument("input", help="input .csv or .parquet file")
+    parser.add_argument("output", help="output .csv or .parquet file")
+    parser.add_argument("--model", default=MODEL_PATH, help="model artifact path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (default: %(default)s)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="rows per chunk (default: %(default)s)")
+    parser.add_argument("--private-trees", action="store_true",
+                        help="give every worker its own unpickled sklearn forest instead of the shared compiled one")
+    args = parser.parse_args(argv)
+
+    def report(rows):
+        print(f"\rscored {rows:,} rows", end="", file=sys.stderr, flush=True)
+
+    with ParallelScorer(args.model, args.workers, args.private_trees) as scorer:
+        stats = score_file_parallel(scorer, args.input, args.output,
+                                    chunk_size=args.chunk_size, progress=report)
+    print(file=sys.stderr)
+    print(f"Scored {stats['rows']:,} rows in {stats['seconds']:.2f}s on {scorer.workers} workers "
+          f"({stats['rows_per_sec']:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Incrementally maintained population statistics over the prediction history.
+
+Every model input is a bounded integer, so the population can be
+summarized with fixed-size counters: a histogram per feature, a count per
+risk level, and probability sums per age band and gender. The counters
+are kept per time bucket (five minutes by default) in a fixed ring of
+buckets covering the retention period, so adding a row is O(1) and a
+snapshot for any time window sums a fixed number of small arrays, however
+many rows have been recorded. A window also takes in the whole bucket its
+start falls into, so it never misses a row and reaches back at most one
+bucket further than asked.
+
+``PopulationStats.refresh`` tails the prediction history database
+(``prediction_log``) by row id, so the counters also pick up rows written
+by other processes, such as the API.
+"""
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from inference import EXPECTED_COLUMNS
+from prediction_log import LEVELS, TABLE, quote
+
+# Histogram bins per feature: every value from 0 to the largest one collected
+FEATURE_MAX = {"Age": 100, "Gender": 2}
+FEATURE_BINS = np.array([FEATURE_MAX.get(col, 10) + 1 for col in EXPECTED_COLUMNS])
+FEATURE_OFFSETS = np.concatenate([[0], np.cumsum(FEATURE_BINS)[:-1]])
+AGE_BAND_YEARS = 10
+AGE_BANDS = FEATURE_MAX["Age"] // AGE_BAND_YEARS + 1
+GENDERS = 2
+
+
+class PopulationStats:
+    """Time-bucketed counters over scored patients."""
+
+    def __init__(self, bucket_seconds=300, retention_buckets=12 * 24 * 30):
+        self.bucket_seconds = bucket_seconds
+        self.retention_buckets = retention_buckets
+        n = retention_buckets
+        self.bucket_ids = np.full(n, -1, dtype=np.int64)
+        self.risk_counts = np.zeros((n, len(LEVELS)), dtype=np.int64)
+        self.feature_counts = np.zeros((n, int(FEATURE_BINS.sum())), dtype=np.int64)
+        self.group_counts = np.zeros((n, AGE_BANDS, GENDERS), dtype=np.int64)
+        self.group_proba = np.zeros((n, AGE_BANDS, GENDERS, len(LEVELS)), dtype=np.float64)
+        self.last_id = 0
+        self.rows = 0
+        self.version = 0
+        self._snapshots = {}
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def add(self, ts, X, level_proba):
+        """Count scored rows: epoch seconds ``ts``, inputs ``X``, probabilities in ``LEVELS`` order.
+
+        Rows older than the retention period are ignored.
+        """
+        ts = np.asarray(ts, dtype=np.float64).reshape(-1)
+        X = np.clip(np.asarray(X).astype(np.int64), 0, FEATURE_BINS - 1)
+        level_proba = np.asarray(level_proba, dtype=np.float64)
+        bucket = (ts // self.bucket_seconds).astype(np.int64)
+        with self._lock:
+            slot = bucket % self.retention_buckets
+            for b in np.unique(bucket):
+                s = b % self.retention_buckets
+                if self.bucket_ids[s] < b:
+                    # The ring wrapped around: reuse the expired slot for this bucket
+                    self._clear(s)
+                    self.bucket_ids[s] = b
+            keep = self.bucket_ids[slot] == bucket
+            if not keep.all():
+                slot, X, level_proba = slot[keep], X[keep], level_proba[keep]
+            band = X[:, EXPECTED_COLUMNS.index("Age")] // AGE_BAND_YEARS
+            gender = np.clip(X[:, EXPECTED_COLUMNS.index("Gender")] - 1, 0, GENDERS - 1)
+            np.add.at(self.risk_counts, (slot, np.argmax(level_proba, axis=1)), 1)
+            np.add.at(self.feature_counts, (slot[:, None], FEATURE_OFFSETS + X), 1)
+            np.add.at(self.group_counts, (slot, band, gender), 1)
+            np.add.at(self.group_proba, (slot, band, gender), level_proba)
+            self.rows += len(slot)
+            self.version += 1
+
+    def _clear(self, s):
+        self.risk_counts[s] = 0
+        self.feature_counts[s] = 0
+        self.group_counts[s] = 0
+        self.group_proba[s] = 0.0
+
+    def refresh(self, path, min_interval=2.0, chunk_rows=50_000):
+        """Count rows added to the history database at ``path`` since the last refresh.
+
+        Runs at most once per ``min_interval`` seconds; returns the number of
+        new rows. The first refresh only reads the retention period.
+        """
+        # One refresh at a time, so no row is counted twice
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0
+        try:
+            now = time.time()
+            if now - self._last_refresh < min_interval:
+                return 0
+            self._last_refresh = now
+            return self._read_new_rows(path, now, chunk_rows)
+        finally:
+            self._refresh_lock.release()
+
+    def _read_new_rows(self, path, now, chunk_rows):
+        last_id = self.last_id
+        columns = ["id", "ts"] + [f"Prob {level}" for level in LEVELS] + EXPECTED_COLUMNS
+        since = now - self.retention_buckets * self.bucket_seconds
+        query = (f"SELECT {', '.join(quote(c) for c in columns)} FROM {TABLE} "
+                 f"WHERE id > ? AND ts >= ? ORDER BY id LIMIT {int(chunk_rows)}")
+        added = 0
+        try:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        except sqlite3.OperationalError:
+            return 0  # nothing has been logged yet
+        try:
+            while True:
+                try:
+                    rows = conn.execute(query, (last_id, since)).fetchall()
+                except sqlite3.OperationalError:
+                    break  # the table does not exist yet
+                if not rows:
+                    break
+                data = np.asarray(rows, dtype=np.float64)
+                self.add(data[:, 1], data[:, 2 + len(LEVELS):], data[:, 2:2 + len(LEVELS)])
+                last_id = int(data[-1, 0])
+                added += len(rows)
+                if len(rows) < chunk_rows:
+                    break
+        finally:
+            conn.close()
+        self.last_id = last_id
+        return added
+
+    def snapshot(self, window_seconds=None, now=None):
+        """Totals over the last ``window_seconds`` (default: the whole retention period).
+
+        Returns a dict with ``rows``, ``risk_counts`` (per ``LEVELS``),
+        ``feature_counts`` (use ``feature_histogram``), ``group_counts`` and
+        ``group_mean_proba`` (per age band and gender). The bucket holding
+        the start of the window is included whole. Snapshots are cached
+        until new rows arrive or the window moves to another bucket.
+        """
+        now = time.time() if now is None else now
+        current = int(now // self.bucket_seconds)
+        oldest = current - self.retention_buckets + 1
+        if window_seconds is not None:
+            oldest = max(oldest, int((now - window_seconds) // self.bucket_seconds))
+        with self._lock:
+            key = (oldest, current)
+            cached = self._snapshots.get(key)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            selected = (self.bucket_ids >= oldest) & (self.bucket_ids <= current)
+            group_counts = self.group_counts[selected].sum(axis=0)
+            group_proba = self.group_proba[selected].sum(axis=0)
+            risk_counts = self.risk_counts[selected].sum(axis=0)
+            snapshot = {
+                "rows": int(risk_counts.sum()),
+                "risk_counts": risk_counts,
+                "feature_counts": self.feature_counts[selected].sum(axis=0),
+                "group_counts": group_counts,
+                "group_mean_proba": np.divide(group_proba, group_counts[..., None],
+                                              out=np.full_like(group_proba, np.nan),
+                                              where=group_counts[..., None] > 0),
+            }
+            # Only the latest version matters; drop snapshots of older ones
+            self._snapshots = {k: v for k, v in self._snapshots.items() if v[0] == self.version}
+            self._snapshots[key] = (self.version, snapshot)
+            return snapshot
+
+
+def feature_histogram(snapshot, column):
+    """``(values, counts)`` of one feature in a snapshot, skipping values below the input range."""
+    i = EXPECTED_COLUMNS.index(column)
+    counts = snapshot["feature_counts"][FEATURE_OFFSETS[i]:FEATURE_OFFSETS[i] + FEATURE_BINS[i]]
+    return np.arange(1, FEATURE_BINS[i]), counts[1:]
@@ -0,0 +1,126 @@
+"""Process-wide LRU cache of probability vectors and feature contributions.
+
+Every model input is a small bounded integer (Age 1-100, Gender 1-2, the
+sliders 1-10), so a patient profile packs into 23 bytes and identical
+profiles (defaults, re-clicks, reruns, repeat screenings) are common.
+
+Every entry is keyed by the fingerprint of the model that produced it as
+well as the features, and only the current model's results are stored.
+Reruns that are still finishing on an older model snapshot after a hot
+swap therefore neither read nor write the new model's entries, and a late
+``bind`` of an older fingerprint cannot switch the cache back.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from inference import explain_one, predict_one
+
+DEFAULT_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "4096"))
+
+
+def pack_features(features):
+    """Pack a feature vector into a hashable key, or ``None`` if it cannot be packed.
+
+    Only whole numbers in 0-255 are packed (one byte each); anything else is
+    left uncached rather than risking two profiles sharing a key.
+    """
+    values = np.asarray(features)
+    packed = values.astype(np.uint8)
+    if not np.array_equal(packed, values):
+        return None
+    return packed.tobytes()
+
+
+class PredictionCache:
+    """Thread-safe LRU mapping of packed feature vectors to probabilities."""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.model_token = None
+        self._retired = set()
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bind(self, model_token):
+        # Move to a newer model and drop the old one's entries; fingerprints
+        # already replaced (a rerun still on an old snapshot) are ignored
+        with self._lock:
+            if model_token == self.model_token or model_token in self._retired:
+                return
+            self._retired.add(self.model_token)
+            self._entries.clear()
+            self.model_token = model_token
+
+    def get(self, key, model_token):
+        with self._lock:
+            value = self._entries.get((model_token, key))
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((model_token, key))
+            self.hits += 1
+            return value
+
+    def put(self, key, value, model_token):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if model_token != self.model_token:
+                return  # computed on a model that is no longer (or not yet) bound
+            self._entries[(model_token, key)] = value
+            self._entries.move_to_end((model_token, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def predict_one(self, model, features, model_token):
+        """Cached ``inference.predict_one``: returns ``(predicted_class, probabilities)``.
+
+        ``model_token`` is the fingerprint of ``model`` (see ``bind``).
+        """
+        key = pack_features(features)
+        proba = None if key is None else self.get(key, model_token)
+        if proba is None:
+            predicted_class, proba = predict_one(model, features)
+            if key is not None:
+                proba.flags.writeable = False
+                self.put(key, proba, model_token)
+            return predicted_class, proba
+        return model.classes_[np.argmax(proba)], proba
+
+    def explain_one(self, model, features, model_token):
+        """Cached ``inference.explain_one``: ``(predicted_class, probabilities, contributions)``."""
+        key = pack_features(features)
+        # Kept apart from plain probability entries, which carry no contributions
+        key = None if key is None else ("contributions", key)
+        cached = None if key is None else self.get(key, model_token)
+        if cached is None:
+            predicted_class, proba, contributions = explain_one(model, features)
+            if key is not None:
+                proba.flags.writeable = False
+                contributions.flags.writeable = False
+                self.put(key, (proba, contributions), model_token)
+            return predicted_class, proba, contributions
+        proba, contributions = cached
+        return model.classes_[np.argmax(proba)], proba, contributions
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,242 @@
+"""Append-only history of scored patients, written off the request path.
+
+``PredictionLog.record`` only puts the row on a bounded in-memory queue; a
+background thread drains the queue and appends rows to a SQLite database
+in WAL mode, many rows per transaction. Each batch is one transaction, so
+after a crash the database holds every batch that was committed and
+nothing half-written; ``close()`` (also run at interpreter exit) flushes
+what is still queued.
+
+When the queue is full the log applies backpressure according to
+``overflow``: ``"drop"`` (the default, for interactive paths) drops the
+row and counts it, ``"block"`` makes the caller wait for room (for batch
+jobs that must not lose rows). A batch that still fails after
+``max_retries`` attempts (e.g. the table was dropped) is dropped and
+counted too, so a broken database never wedges the writer or the exit.
+
+Each row holds the time, source (``ui``, ``api``, ``batch``), model
+version, the 23 inputs under their ``EXPECTED_COLUMNS`` names, the
+``RISK_MAPPING`` label, one probability per risk level and the scoring
+latency.
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from inference import EXPECTED_COLUMNS, RISK_MAPPING
+
+# History database; set PREDICTION_LOG to an empty string to turn logging off
+PREDICTION_LOG = os.environ.get("PREDICTION_LOG", "./prediction_log.db")
+TABLE = "predictions"
+LEVELS = list(RISK_MAPPING.values())
+COLUMNS = (["ts", "source", "model_version", "risk_level"] + [f"Prob {level}" for level in LEVELS]
+           + ["latency_ms"] + EXPECTED_COLUMNS)
+
+# Sentinel that makes the writer flush and exit
+_STOP = object()
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def create_table(conn):
+    types = (["REAL", "TEXT", "TEXT", "TEXT"] + ["REAL"] * len(LEVELS)
+             + ["REAL"] + ["INTEGER"] * len(EXPECTED_COLUMNS))
+    columns = ", ".join(f"{quote(name)} {kind}" for name, kind in zip(COLUMNS, types))
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} (id INTEGER PRIMARY KEY, {columns})")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_ts ON {TABLE} (ts)")
+
+
+def open_log_db(path, synchronous="NORMAL"):
+    """Open (creating if needed) a history database in WAL mode."""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # NORMAL keeps the database consistent after a crash; FULL also survives power loss
+    conn.execute(f"PRAGMA synchronous={synchronous}")
+    with conn:
+        create_table(conn)
+    return conn
+
+
+class PredictionLog:
+    """Bounded queue in front of a background, batched SQLite writer."""
+
+    def __init__(self, path=PREDICTION_LOG, max_queue=10_000, batch_size=1_000,
+                 flush_interval=1.0, overflow="drop", synchronous="NORMAL", max_retries=3,
+                 close_timeout=5.0):
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"overflow must be 'drop' or 'block', not {overflow!r}")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.max_retries = max_retries
+        self.close_timeout = close_timeout
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_flush_ms = None
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._conn = open_log_db(path, synchronous)
+        self._insert = (f"INSERT INTO {TABLE} ({', '.join(quote(c) for c in COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(COLUMNS))})")
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, features, classes, proba, model_version=None, latency_ms=None, source="ui"):
+        """Queue one scored patient; never touches the database on the caller's thread."""
+        self.record_many(np.asarray(features).reshape(1, -1), classes,
+                         np.asarray(proba).reshape(1, -1), model_version, latency_ms, source)
+
+    def record_many(self, X, classes, proba, model_version=None, latency_ms=None, source="batch"):
+        """Queue a block of scored rows (one queue slot); ``latency_ms`` is per block."""
+        item = (time.time(), source, model_version, np.array(X, copy=True), classes,
+                np.array(proba, copy=True), latency_ms)
+        if self.overflow == "block":
+            self._queue.put(item)
+            return True
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(item[3])
+            return False
+
+    def _rows(self, item):
+        ts, source, version, X, classes, proba, latency_ms = item
+        labels = [RISK_MAPPING[cls] for cls in classes]
+        # One column per risk level, whatever order the model lists its classes in;
+        # a level the model cannot predict is stored with probability 0
+        level_proba = np.zeros((len(proba), len(LEVELS)))
+        level_proba[:, [LEVELS.index(label) for label in labels]] = proba
+        predicted = np.asarray(labels, dtype=object)[np.argmax(proba, axis=1)]
+        version = None if version is None else str(version)
+        for label, probs, features in zip(predicted, level_proba.tolist(), X.astype(np.int64).tolist()):
+            yield (ts, source, version, label, *probs, latency_ms, *features)
+
+    def _write(self, items):
+        start = time.perf_counter()
+        rows = []
+        for item in items:
+            try:
+                rows.extend(self._rows(item))
+            except Exception as e:
+                # A malformed block is dropped on its own; the rest of the batch is still written
+                self._failed(e, len(item[3]))
+        if not rows:
+            return
+        # One transaction per batch: it is either fully on disk or not at all
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._conn:
+                    self._conn.executemany(self._insert, rows)
+                break
+            except sqlite3.Error as e:
+                # Retry transient failures (e.g. the database is locked by a reader)
+                self._failed(e)
+                if attempt < self.max_retries:
+                    time.sleep(self.flush_interval)
+        else:
+            with self._lock:
+                self.dropped += len(rows)
+            return
+        self.written += len(rows)
+        self.batches += 1
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+
+    def _failed(self, error, dropped=0):
+        with self._lock:
+            self.errors += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            self.dropped += dropped
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            items, stop = [], first is _STOP
+            if not stop:
+                items.append(first)
+            # Drain whatever else is waiting, up to one batch of rows
+            rows = sum(len(item[3]) for item in items)
+            while not stop and rows < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    items.append(item)
+                    rows += len(item[3])
+            try:
+                if items:
+                    self._write(items)
+            except Exception as e:
+                # Nothing may end this thread early: flush() and blocked producers wait on it
+                self._failed(e, sum(len(item[3]) for item in items))
+            finally:
+                for _ in range(len(items) + stop):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is written; False if ``timeout`` ran out first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self):
+        """Flush what is still queued, then stop the writer.
+
+        Waits at most ``close_timeout`` seconds, so a writer stuck on the
+        database cannot keep the interpreter from exiting; rows still queued
+        after that are lost.
+        """
+        if self._thread is None:
+            return
+        atexit.unregister(self.close)
+        deadline = time.monotonic() + self.close_timeout
+        while True:
+            try:
+                self._queue.put_nowait(_STOP)
+                break
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(0.01)
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+        if not self._thread.is_alive():
+            self._conn.close()
+        self._thread = None
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_flush_ms": self.last_flush_ms,
+        }
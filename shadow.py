@@ -0,0 +1,219 @@
+"""Shadow scoring of a candidate model against live traffic.
+
+``ShadowScorer.submit`` hands a block of rows that the primary model has
+already answered to a process pool scoring them with the candidate
+artifact (``SHADOW_MODEL``), and returns at once. When the candidate
+falls behind, at most ``max_pending`` blocks wait for it; further blocks
+are shed and counted, so a slow candidate never queues without limit nor
+slows the primary path.
+
+Each finished block updates fixed-size counters: agreement on the
+``RISK_MAPPING`` label (with a primary-by-candidate confusion matrix),
+absolute probability deltas per risk level, and the candidate's forest
+time against the primary's for the same rows. The candidate runs on the
+compiled engine the primary is served with (see ``parallel_score``), so
+the latency ratio compares the models rather than two engines; a model
+shadowed against itself reports about 1x. ``report()`` summarizes
+them. A file can also be replayed offline:
+
+    python shadow.py candidate.rfm patients.csv --primary cancerModel100.pkl
+"""
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from inference import MODEL_PATH, RISK_MAPPING
+from metrics import REGISTRY
+from prediction_log import LEVELS
+
+# Candidate artifact scored in the shadow of the served model; empty turns shadowing off
+SHADOW_MODEL = os.environ.get("SHADOW_MODEL", "")
+# Bins of the largest absolute probability delta per row, for its percentiles
+DELTA_BINS = np.linspace(0.0, 1.0, 101)
+
+
+def level_order(classes):
+    # Column indices that put a model's probabilities in LEVELS order
+    labels = [RISK_MAPPING[cls] for cls in classes]
+    return [labels.index(level) for level in LEVELS]
+
+
+class ShadowScorer:
+    """Compares a candidate model with the primary on rows it has already scored."""
+
+    def __init__(self, candidate_path=SHADOW_MODEL, workers=1, max_pending=None, registry=REGISTRY):
+        # parallel_score pulls in pandas; only pay for it when shadowing is on
+        from parallel_score import ParallelScorer
+
+        self.candidate_path = candidate_path
+        self.scorer = ParallelScorer(candidate_path, workers)
+        self.max_pending = max_pending or 4 * self.scorer.workers
+        self.registry = registry
+        self._candidate_order = level_order(self.scorer.model.classes_)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.shed = 0
+        self.errors = 0
+        self.last_error = None
+        self.rows = 0
+        self.agree = 0
+        self.confusion = np.zeros((len(LEVELS), len(LEVELS)), dtype=np.int64)
+        self.abs_delta_sum = np.zeros(len(LEVELS))
+        self.max_delta_counts = np.zeros(len(DELTA_BINS), dtype=np.int64)
+        self.primary_seconds = 0.0
+        self.candidate_seconds = 0.0
+        self.timed_rows = 0
+
+    def submit(self, X, primary_classes, primary_proba, primary_seconds=None):
+        """Queue rows the primary has answered; returns False if they were shed.
+
+        ``primary_seconds`` is the primary's forest time for exactly these
+        rows, or None when unknown (e.g. a cache hit), in which case the
+        block is left out of the latency comparison. Never blocks.
+        """
+        X = np.asarray(X)
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.shed += len(X)
+                self.registry.inc("shadow_shed", len(X))
+                return False
+            self.pending += 1
+        primary = np.asarray(primary_proba)[:, level_order(primary_classes)]
+        try:
+            future = self.scorer.submit(X)
+        except Exception as e:
+            self._failed(e)
+            return False
+        future.add_done_callback(lambda f: self._compare(f, primary, primary_seconds))
+        return True
+
+    def _failed(self, error):
+        with self._lock:
+            self.pending -= 1
+            self.errors += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+        self.registry.inc("shadow_errors")
+
+    def _compare(self, future, primary, primary_seconds):
+        # Runs on the pool's result thread once the candidate has scored the block
+        try:
+            proba, seconds = future.result()
+        except Exception as e:
+            self._failed(e)
+            return
+        candidate = proba[:, self._candidate_order]
+        primary_label, candidate_label = primary.argmax(axis=1), candidate.argmax(axis=1)
+        delta = np.abs(candidate - primary)
+        delta_bins = np.searchsorted(DELTA_BINS, delta.max(axis=1))
+        agree = int(np.count_nonzero(primary_label == candidate_label))
+        with self._lock:
+            self.pending -= 1
+            self.rows += len(primary)
+            self.agree += agree
+            np.add.at(self.confusion, (primary_label, candidate_label), 1)
+            self.abs_delta_sum += delta.sum(axis=0)
+            self.max_delta_counts += np.bincount(delta_bins, minlength=len(DELTA_BINS))
+            if primary_seconds is not None:
+                self.primary_seconds += primary_seconds
+                self.candidate_seconds += seconds
+                self.timed_rows += len(primary)
+        self.registry.inc("shadow_rows", len(primary))
+        self.registry.inc("shadow_disagreements", len(primary) - agree)
+        self.registry.observe("shadow_forest_call", seconds)
+
+    def _delta_quantile(self, q):
+        # Upper edge of the bin holding the q-quantile of the per-row largest delta
+        cumulative = np.cumsum(self.max_delta_counts)
+        return float(DELTA_BINS[min(len(DELTA_BINS) - 1, np.searchsorted(cumulative, q * cumulative[-1]))])
+
+    def report(self):
+        """Comparison so far: agreement, probability deltas, relative latency, load shed."""
+        with self._lock:
+            rows = self.rows
+            return {
+                "candidate": self.candidate_path,
+                "rows": rows,
+                "agreement": self.agree / rows if rows else None,
+                "confusion": {primary: dict(zip(LEVELS, counts.tolist()))
+                              for primary, counts in zip(LEVELS, self.confusion)},
+                "mean_abs_delta": dict(zip(LEVELS, (self.abs_delta_sum / rows).tolist())) if rows else None,
+                "max_delta_p50": self._delta_quantile(0.5) if rows else None,
+                "max_delta_p99": self._delta_quantile(0.99) if rows else None,
+                "relative_latency": (self.candidate_seconds / self.primary_seconds
+                                     if self.primary_seconds else None),
+                "candidate_ms_per_row": (self.candidate_seconds / self.timed_rows * 1000
+                                         if self.timed_rows else None),
+                "primary_ms_per_row": (self.primary_seconds / self.timed_rows * 1000
+                                       if self.timed_rows else None),
+                "pending": self.pending,
+                "shed": self.shed,
+                "errors": self.errors,
+                "last_error": self.last_error,
+            }
+
+    def wait(self, timeout=None):
+        """Let the blocks already queued finish (for reports at shutdown and in tests)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.01)
+        return not self.pending
+
+    def close(self):
+        self.scorer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def format_report(report):
+    """Plain-text rendering of ``ShadowScorer.report()``."""
+    if not report["rows"]:
+        return f"shadow {report['candidate']}: no rows compared yet (shed {report['shed']:,})"
+    lines = [
+        f"shadow {report['candidate']}: {report['rows']:,} rows, agreement {report['agreement']:.2%}, "
+        f"shed {report['shed']:,}, errors {report['errors']}",
+        "mean |delta p|: " + ", ".join(f"{level} {value:.4f}" for level, value in report["mean_abs_delta"].items())
+        + f"; largest per row p50 {report['max_delta_p50']:.2f}, p99 {report['max_delta_p99']:.2f}",
+    ]
+    if report["relative_latency"] is not None:
+        lines.append(f"forest time per row: candidate {report['candidate_ms_per_row']:.4f} ms, primary "
+                     f"{report['primary_ms_per_row']:.4f} ms ({report['relative_latency']:.2f}x)")
+    lines.append("primary \\ candidate " + " ".join(f"{level:>8s}" for level in LEVELS))
+    for primary, counts in report["confusion"].items():
+        lines.append(f"{primary:>19s} " + " ".join(f"{count:8,d}" for count in counts.values()))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    from batch_score import DEFAULT_CHUNK_SIZE, detect_format, iter_chunks
+    from inference import feature_matrix, load_model_file
+
+    parser = argparse.ArgumentParser(description="Compare a candidate model with the served one on a patient file.")
+    parser.add_argument("candidate", help="candidate model artifact")
+    parser.add_argument("input", help="CSV/Parquet file of patients")
+    parser.add_argument("--primary", default=MODEL_PATH, help="served model artifact")
+    parser.add_argument("--workers", type=int, default=1, help="candidate worker processes")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE // 10,
+                        help="rows per block (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    primary = load_model_file(args.primary)
+    # Offline nothing is waiting on the primary, so let every block queue instead of shedding
+    with ShadowScorer(args.candidate, args.workers, max_pending=1 << 30) as shadow:
+        for chunk in iter_chunks(args.input, detect_format(args.input), args.chunk_size):
+            X = feature_matrix(chunk)
+            start = time.perf_counter()
+            proba = primary.predict_proba(X)
+            shadow.submit(X, primary.classes_, proba, time.perf_counter() - start)
+        shadow.wait()
+        print(format_report(shadow.report()))
+
+
+if __name__ == "__main__":
+    main()
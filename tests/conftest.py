@@ -0,0 +1,41 @@
+import os
+import pickle
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forest_engine import random_inputs  # noqa: E402
+from inference import EXPECTED_COLUMNS  # noqa: E402
+
+
+def risk_class(X):
+    # A learnable labelling: more smoking and genetic risk means a higher class
+    score = X[:, EXPECTED_COLUMNS.index("Smoking")] + X[:, EXPECTED_COLUMNS.index("Genetic Risk")]
+    return np.digitize(score, [8, 14])
+
+
+@pytest.fixture(scope="session")
+def forest():
+    """A small fitted forest on the app's schema (classes 0, 1, 2)."""
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+
+    X = random_inputs(3000, len(EXPECTED_COLUMNS), seed=1)
+    model = RandomForestClassifier(n_estimators=40, min_samples_leaf=5, random_state=0)
+    return model.fit(pd.DataFrame(X, columns=EXPECTED_COLUMNS), risk_class(X))
+
+
+@pytest.fixture(scope="session")
+def forest_path(forest, tmp_path_factory):
+    path = tmp_path_factory.mktemp("model") / "model.pkl"
+    with open(path, "wb") as file:
+        pickle.dump(forest, file)
+    return str(path)
+
+
+@pytest.fixture
+def rows():
+    return random_inputs(500, len(EXPECTED_COLUMNS), seed=2)
@@ -0,0 +1,79 @@
+import numpy as np
+
+from drift_monitor import DriftMonitor, ReferenceProfile, histograms
+from forest_engine import random_inputs
+from inference import EXPECTED_COLUMNS
+from metrics import MetricsRegistry
+from prediction_log import LEVELS
+
+
+def scored(n, seed=0):
+    X = random_inputs(n, len(EXPECTED_COLUMNS), seed=seed)
+    return X, np.random.default_rng(seed).choice(LEVELS, n)
+
+
+def monitor(**kwargs):
+    drift = DriftMonitor(reference_path=None, registry=MetricsRegistry(), **kwargs)
+    windows = []
+    report = drift._report
+    drift._report = lambda features, levels: (windows.append(int(levels.sum())), report(features, levels))
+    return drift, windows
+
+
+def test_blocks_are_split_at_window_boundaries():
+    drift, windows = monitor(window_rows=100, reference_rows=300)
+    X, levels = scored(1050)
+    drift.observe_many(X, levels)
+
+    assert drift.reference.rows == 300
+    assert windows == [100] * 7
+    assert drift.stats()["rows"] == 1050
+    assert drift._window_fill == 50
+
+
+def test_blocks_and_single_rows_count_the_same():
+    X, levels = scored(900, seed=1)
+    by_block, _ = monitor(window_rows=200, reference_rows=250)
+    for start, stop in ((0, 7), (7, 333), (333, 334), (334, 900)):
+        by_block.observe_many(X[start:stop], levels[start:stop])
+    by_row, _ = monitor(window_rows=200, reference_rows=250)
+    for features, level in zip(X, levels):
+        by_row.observe(features, level)
+
+    assert np.array_equal(by_block.reference.feature_counts, by_row.reference.feature_counts)
+    assert by_block.windows == by_row.windows == 3
+    assert by_block.last_report["psi"] == by_row.last_report["psi"]
+
+
+def test_bootstrap_saves_only_with_a_path(tmp_path):
+    X, levels = scored(100)
+    unsaved = DriftMonitor(reference_path=None, reference_rows=100, registry=MetricsRegistry())
+    unsaved.observe_many(X, levels)
+    assert unsaved.reference is not None
+    assert not list(tmp_path.iterdir())
+
+    path = str(tmp_path / "reference.json")
+    saved = DriftMonitor(reference_path=path, reference_rows=100, registry=MetricsRegistry())
+    assert saved.stats()["status"] == "bootstrapping"
+    saved.observe_many(X, levels)
+    loaded = ReferenceProfile.load(path)
+    assert np.array_equal(loaded.feature_counts, saved.reference.feature_counts)
+    assert np.array_equal(loaded.level_counts, histograms(X, levels)[1])
+    # A new monitor picks the saved reference up instead of bootstrapping again
+    assert DriftMonitor(reference_path=path, registry=MetricsRegistry()).reference.rows == 100
+
+
+def test_shifted_inputs_raise_an_alert():
+    X, levels = scored(2000, seed=2)
+    alerts = []
+    drift = DriftMonitor(reference=ReferenceProfile(*histograms(X, levels)), reference_path=None,
+                         window_rows=500, registry=MetricsRegistry(), on_alert=alerts.append)
+    drift.observe_many(X[:500], levels[:500])
+    assert drift.stats()["status"] == "ok"
+
+    shifted = X[500:1000].copy()
+    shifted[:, EXPECTED_COLUMNS.index("Smoking")] = 9
+    drift.observe_many(shifted, levels[500:1000])
+    assert drift.stats()["status"] == "alert"
+    assert list(alerts[-1]["psi"]) == ["Smoking"]
+    assert drift.registry.counters["drift_alerts"] == 1
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from forest_engine import CompiledForest, compile_forest, load_compiled, save_compiled
+from inference import EXPECTED_COLUMNS
+
+
+def sklearn_proba(forest, X):
+    return forest.predict_proba(pd.DataFrame(X, columns=EXPECTED_COLUMNS))
+
+
+def test_compiled_matches_sklearn(forest, rows):
+    compiled = compile_forest(forest)
+    expected = sklearn_proba(forest, rows)
+    # Small blocks split the rows unevenly, so block edges are covered too
+    for block_size in (1, 7 * compiled.n_estimators, 64_000):
+        assert np.abs(compiled.predict_proba(rows, block_size=block_size) - expected).max() < 1e-12
+    assert (compiled.predict(rows) == forest.predict(pd.DataFrame(rows, columns=EXPECTED_COLUMNS))).all()
+    assert list(compiled.classes_) == list(forest.classes_)
+
+
+def test_single_row(forest, rows):
+    compiled = compile_forest(forest)
+    assert compiled.predict_proba(rows[0]).shape == (1, len(forest.classes_))
+    assert np.abs(compiled.predict_proba(rows[0]) - sklearn_proba(forest, rows[:1])).max() < 1e-12
+
+
+@pytest.mark.parametrize("suffix", [".rfm", ".npz"])
+def test_saved_forest_round_trips(forest, rows, tmp_path, suffix):
+    compiled = compile_forest(forest)
+    path = str(tmp_path / f"model{suffix}")
+    save_compiled(compiled, path)
+    loaded = load_compiled(path)
+
+    assert np.array_equal(loaded.predict_proba(rows), compiled.predict_proba(rows))
+    assert list(loaded.feature_names_in_) == EXPECTED_COLUMNS
+    assert loaded.max_depth == compiled.max_depth
+
+
+def test_mapped_arrays_are_read_only(forest, tmp_path):
+    path = str(tmp_path / "model.rfm")
+    compile_forest(forest).save_mapped(path)
+    loaded = CompiledForest.load_mapped(path)
+    with pytest.raises(ValueError):
+        loaded.value[0, 0] = 1.0
+
+
+def test_load_mapped_rejects_other_files(tmp_path):
+    path = tmp_path / "model.rfm"
+    path.write_bytes(b"not a forest")
+    with pytest.raises(ValueError, match="not a memory-mapped forest"):
+        CompiledForest.load_mapped(str(path))
+
+
+def test_contributions_add_up_to_proba(forest, rows):
+    compiled = compile_forest(forest)
+    proba, contributions = compiled.predict_proba_contributions(rows)
+    assert np.array_equal(proba, compiled.predict_proba(rows))
+    assert np.abs(compiled.expected_value + contributions.sum(axis=1) - proba).max() < 1e-9
@@ -0,0 +1,84 @@
+import numpy as np
+
+from forest_engine import random_inputs
+from inference import EXPECTED_COLUMNS
+from population_stats import PopulationStats, feature_histogram
+from prediction_log import LEVELS, PredictionLog
+
+BUCKET = 300
+NOW = 10_000 * BUCKET + 150.0  # halfway through a bucket
+
+
+def add_at(stats, ts, seed=0):
+    ts = np.atleast_1d(np.asarray(ts, dtype=np.float64))
+    X = random_inputs(len(ts), len(EXPECTED_COLUMNS), seed=seed)
+    proba = np.random.default_rng(seed).dirichlet(np.ones(len(LEVELS)), len(ts))
+    stats.add(ts, X, proba)
+    return X
+
+
+def test_window_includes_the_bucket_it_starts_in():
+    stats = PopulationStats(bucket_seconds=BUCKET, retention_buckets=100)
+    start = NOW - 3600
+    add_at(stats, [start - 200, start - 100, start + 10, NOW])
+    # start - 100 shares the start's bucket and is counted; start - 200 is one bucket earlier
+    assert stats.snapshot(3600, now=NOW)["rows"] == 3
+    assert stats.snapshot(now=NOW)["rows"] == 4
+
+
+def test_window_never_misses_a_row():
+    stats = PopulationStats(bucket_seconds=BUCKET, retention_buckets=100)
+    rng = np.random.default_rng(0)
+    for window in (60, 299, 300, 301, 3600, 4000):
+        ts = NOW - rng.uniform(0, window, 50)
+        add_at(stats, ts)
+        inside = stats.snapshot(window, now=NOW)["rows"]
+        # Everything just added is inside; at most one extra bucket of older rows is too
+        before = stats.rows - 50
+        assert 50 <= inside <= 50 + before
+
+
+def test_rows_older_than_retention_are_ignored():
+    stats = PopulationStats(bucket_seconds=BUCKET, retention_buckets=10)
+    add_at(stats, [NOW - 9 * BUCKET, NOW])
+    assert stats.snapshot(now=NOW)["rows"] == 2
+    # Ten buckets later the ring has wrapped onto NOW's slot, so a late row for NOW is dropped
+    later = NOW + 10 * BUCKET
+    add_at(stats, [later, NOW])
+    assert stats.rows == 3
+    assert stats.snapshot(now=later)["rows"] == 1
+    assert stats.snapshot(now=NOW)["rows"] == 1  # only the row at NOW - 9 buckets is left
+
+
+def test_snapshot_counts_and_cache():
+    stats = PopulationStats(bucket_seconds=BUCKET, retention_buckets=100)
+    X = add_at(stats, np.full(40, NOW))
+    first = stats.snapshot(now=NOW)
+    assert stats.snapshot(now=NOW) is first
+    values, counts = feature_histogram(first, "Smoking")
+    assert counts.sum() == 40
+    assert counts[values == 3][0] == np.sum(X[:, EXPECTED_COLUMNS.index("Smoking")] == 3)
+    assert np.nansum(first["group_mean_proba"].sum(axis=-1) * first["group_counts"]) == 40.0
+
+    add_at(stats, [NOW], seed=1)
+    assert stats.snapshot(now=NOW) is not first
+    assert stats.snapshot(now=NOW)["rows"] == 41
+
+
+def test_refresh_tails_the_history(tmp_path):
+    path = str(tmp_path / "log.db")
+    log = PredictionLog(path, flush_interval=0.01)
+    classes = np.arange(len(LEVELS))
+    X = random_inputs(30, len(EXPECTED_COLUMNS))
+    proba = np.random.default_rng(0).dirichlet(np.ones(len(LEVELS)), 30)
+    log.record_many(X, classes, proba)
+    assert log.flush(timeout=5)
+
+    stats = PopulationStats()
+    assert stats.refresh(path, min_interval=0) == 30
+    assert stats.refresh(path, min_interval=0) == 0
+    log.record_many(X[:5], classes, proba[:5])
+    log.close()
+    assert stats.refresh(path, min_interval=0) == 5
+    assert stats.snapshot()["rows"] == 35
+    assert PopulationStats().refresh(str(tmp_path / "missing.db")) == 0
@@ -0,0 +1,74 @@
+import numpy as np
+
+from forest_engine import compile_forest
+from prediction_cache import PredictionCache, pack_features
+
+
+def test_pack_features_only_packs_small_whole_numbers():
+    assert pack_features([1, 2, 255]) == bytes([1, 2, 255])
+    assert pack_features([1.5, 2]) is None
+    assert pack_features([256]) is None
+    assert pack_features([-1]) is None
+
+
+def test_repeat_profiles_hit(forest, rows):
+    cache = PredictionCache()
+    cache.bind("v1")
+    first = cache.predict_one(forest, rows[0], "v1")
+    second = cache.predict_one(forest, rows[0], "v1")
+    assert first[0] == second[0]
+    assert second[1] is first[1]
+    assert not second[1].flags.writeable
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_rebinding_drops_the_old_models_entries(forest, rows):
+    cache = PredictionCache()
+    cache.bind("v1")
+    cache.predict_one(forest, rows[0], "v1")
+    cache.bind("v2")
+    assert cache.stats()["size"] == 0
+    cache.predict_one(forest, rows[0], "v2")
+    assert cache.stats()["misses"] == 2
+    # Binding the current fingerprint again keeps its entries
+    cache.bind("v2")
+    assert cache.stats()["size"] == 1
+
+
+def test_stale_snapshots_are_ignored():
+    cache = PredictionCache()
+    cache.bind("v1")
+    cache.bind("v2")
+    key = pack_features([1, 2, 3])
+    # A rerun still holding v1 neither stores into nor reads from v2's entries ...
+    cache.put(key, np.array([1.0, 0.0]), "v1")
+    assert cache.get(key, "v1") is None
+    assert cache.stats()["size"] == 0
+    # ... and cannot switch the cache back to v1
+    cache.bind("v1")
+    assert cache.model_token == "v2"
+    cache.put(key, np.array([0.0, 1.0]), "v2")
+    assert cache.get(key, "v2").tolist() == [0.0, 1.0]
+
+
+def test_lru_eviction():
+    cache = PredictionCache(maxsize=2)
+    cache.bind("v1")
+    for value in range(3):
+        cache.put(bytes([value]), value, "v1")
+        if value == 1:
+            cache.get(bytes([0]), "v1")  # 0 becomes the most recent, so 1 is evicted next
+    assert cache.get(bytes([0]), "v1") == 0
+    assert cache.get(bytes([1]), "v1") is None
+    assert cache.get(bytes([2]), "v1") == 2
+
+
+def test_explain_entries_are_kept_apart(forest, rows):
+    forest = compile_forest(forest)
+    cache = PredictionCache()
+    cache.bind("v1")
+    _, proba = cache.predict_one(forest, rows[0], "v1")
+    _, explained, contributions = cache.explain_one(forest, rows[0], "v1")
+    assert np.allclose(explained, proba)
+    assert contributions.shape[0] == rows.shape[1]
+    assert cache.stats()["size"] == 2
@@ -0,0 +1,117 @@
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from inference import EXPECTED_COLUMNS
+from prediction_log import TABLE, PredictionLog
+
+CLASSES = np.array([0, 1, 2])
+
+
+def block(n, seed=0):
+    rng = np.random.default_rng(seed)
+    proba = rng.dirichlet(np.ones(len(CLASSES)), n)
+    return rng.integers(1, 11, (n, len(EXPECTED_COLUMNS))), proba
+
+
+def stored(path, columns="*"):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT {columns} FROM {TABLE}").fetchall()
+
+
+def gated(log):
+    # Hold the writer inside its next batch until the returned event is set
+    gate, write = threading.Event(), log._write
+    log._write = lambda items: (gate.wait(), write(items))
+    return gate
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_close_flushes_queued_rows(tmp_path):
+    path = str(tmp_path / "log.db")
+    log = PredictionLog(path, batch_size=100, flush_interval=0.01)
+    for seed in range(5):
+        X, proba = block(60, seed)
+        log.record_many(X, CLASSES, proba, model_version="v1")
+    log.record(np.arange(1, 24), CLASSES, [0.1, 0.2, 0.7], latency_ms=1.5)
+    log.close()
+
+    assert log.stats()["written"] == 301
+    assert len(stored(path)) == 301
+    assert stored(path, '"risk_level", "latency_ms", "source"')[-1] == ("High", 1.5, "ui")
+
+
+def test_drop_overflow_counts_rows(tmp_path):
+    log = PredictionLog(str(tmp_path / "log.db"), max_queue=1, flush_interval=0.01)
+    gate = gated(log)
+    X, proba = block(10)
+    assert log.record_many(X, CLASSES, proba)
+    wait_until(lambda: log._queue.empty())  # the writer holds the first block
+    assert log.record_many(X, CLASSES, proba)  # fills the queue
+    assert not log.record_many(X, CLASSES, proba)
+    assert log.stats()["dropped"] == 10
+    gate.set()
+    log.close()
+    assert log.stats()["written"] == 20
+
+
+def test_block_overflow_waits_for_room(tmp_path):
+    log = PredictionLog(str(tmp_path / "log.db"), max_queue=1, flush_interval=0.01, overflow="block")
+    gate = gated(log)
+    X, proba = block(10)
+    log.record_many(X, CLASSES, proba)
+    wait_until(lambda: log._queue.empty())
+    log.record_many(X, CLASSES, proba)
+    producer = threading.Thread(target=log.record_many, args=(X, CLASSES, proba))
+    producer.start()
+    producer.join(0.2)
+    assert producer.is_alive()
+    gate.set()
+    producer.join(5)
+    assert not producer.is_alive()
+    log.close()
+    assert log.stats()["written"] == 30
+    assert log.stats()["dropped"] == 0
+
+
+def test_close_gives_up_on_a_stuck_writer(tmp_path):
+    log = PredictionLog(str(tmp_path / "log.db"), flush_interval=0.01, close_timeout=0.2)
+    gate = gated(log)
+    X, proba = block(10)
+    log.record_many(X, CLASSES, proba)
+    began = time.monotonic()
+    log.close()
+    assert time.monotonic() - began < 2.0
+    gate.set()
+
+
+def test_malformed_block_does_not_stop_the_writer(tmp_path):
+    path = str(tmp_path / "log.db")
+    log = PredictionLog(path, flush_interval=0.01)
+    X, proba = block(10)
+    # A model without a Medium class is fine: its probability is stored as 0
+    log.record_many(X, np.array([0, 2]), proba[:, [0, 2]])
+    # One with a class the history has no column for is dropped on its own
+    log.record_many(X, np.array([0, 7, 2]), proba)
+    assert log.flush(timeout=5)
+    log.record_many(X, CLASSES, proba)
+    log.close()
+
+    stats = log.stats()
+    assert (stats["written"], stats["dropped"], stats["errors"]) == (20, 10, 1)
+    assert stats["last_error"].startswith("KeyError")
+    assert all(medium == 0.0 for (medium,) in stored(path, '"Prob Medium"')[:10])
+
+
+def test_rejects_unknown_overflow(tmp_path):
+    with pytest.raises(ValueError, match="overflow"):
+        PredictionLog(str(tmp_path / "log.db"), overflow="wait")
@@ -0,0 +1,41 @@
+import time
+
+import numpy as np
+
+from forest_engine import random_inputs
+from inference import EXPECTED_COLUMNS, load_model_file
+from metrics import MetricsRegistry
+from shadow import ShadowScorer
+
+
+def test_self_shadow_agrees_at_the_same_speed(forest_path):
+    # The candidate runs on the engine the primary is served with, so shadowing
+    # a model against itself must agree everywhere at about 1x the latency
+    primary = load_model_file(forest_path)
+    X = random_inputs(20_000, len(EXPECTED_COLUMNS), seed=3)
+    with ShadowScorer(forest_path, workers=1, max_pending=1 << 30, registry=MetricsRegistry()) as shadow:
+        for start in range(0, len(X), 500):
+            block = X[start:start + 500]
+            began = time.perf_counter()
+            proba = primary.predict_proba(block)
+            shadow.submit(block, primary.classes_, proba, time.perf_counter() - began)
+            # One block at a time, so neither side is timed while the other competes for a core
+            assert shadow.wait(timeout=60)
+        report = shadow.report()
+
+    assert report["rows"] == len(X)
+    assert report["agreement"] == 1.0
+    assert max(report["mean_abs_delta"].values()) < 1e-12
+    assert 0.5 < report["relative_latency"] < 2.0
+    assert report["shed"] == report["errors"] == 0
+
+
+def test_shadow_sheds_instead_of_queueing(forest_path, rows):
+    primary = load_model_file(forest_path)
+    proba = primary.predict_proba(rows)
+    with ShadowScorer(forest_path, workers=1, max_pending=1, registry=MetricsRegistry()) as shadow:
+        accepted = [shadow.submit(rows, primary.classes_, proba) for _ in range(20)]
+        shadow.wait(timeout=60)
+        assert not all(accepted)
+        assert shadow.report()["shed"] == len(rows) * accepted.count(False)
+    assert np.isclose(proba.sum(axis=1), 1).all()
@@ -0,0 +1,301 @@
+"""Reproducible, parallel training of the served random forest.
+
+Trains a ``RandomForestClassifier`` on a CSV/Parquet file holding every
+``EXPECTED_COLUMNS`` column plus a label column (``Low``/``Medium``/``High``
+or the ``RISK_MAPPING`` class numbers), and publishes it as a new version
+directory that ``ModelManager`` picks up without a restart:
+
+    models/v003/model.pkl       the fitted sklearn forest
+    models/v003/model.rfm       its memory-mapped compiled export (what is served)
+    models/v003/metadata.json   feature order, classes, versions, params, metrics, timings
+
+Trees are built in parallel (``--jobs``), and the cross-validation folds
+run in parallel across cores with one single-threaded forest per fold, so
+the cores are not oversubscribed. ``--warm-start`` grows ``--add-trees``
+extra trees on the new data on top of an existing version instead of
+refitting from scratch; its folds are scored the same way (the base forest
+plus trees grown on the fold's training rows). Those scores are only held
+out if no row of the new file also trained the base forest, so the rows are
+checked against the training files of every ancestor version and the result
+is recorded as ``metrics.cross_validation.held_out``.
+
+    python train.py data.csv --label Level
+    python train.py new_data.parquet --label Level --warm-start models/v003 --add-trees 200
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import pickle
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from functools import partial
+
+import numpy as np
+
+from inference import EXPECTED_COLUMNS, RISK_MAPPING
+
+MODELS_DIR = os.environ.get("MODELS_DIR", "./models")
+# Hyperparameters of the shipped cancerModel100.pkl
+DEFAULT_PARAMS = {
+    "n_estimators": 1000,
+    "criterion": "entropy",
+    "max_features": "log2",
+    "min_samples_split": 27,
+    "min_samples_leaf": 6,
+    "max_depth": None,
+}
+LABEL_CLASSES = {label.lower(): cls for cls, label in RISK_MAPPING.items()}
+
+
+def encode_labels(values):
+    """Class numbers for a label column of ``RISK_MAPPING`` names or numbers."""
+    encoded = []
+    for value in values:
+        if isinstance(value, str) and value.strip().lower() in LABEL_CLASSES:
+            encoded.append(LABEL_CLASSES[value.strip().lower()])
+        elif not isinstance(value, str) and int(value) == value and int(value) in RISK_MAPPING:
+            encoded.append(int(value))
+        else:
+            raise ValueError(f"Unknown label {value!r}, expected one of {list(RISK_MAPPING.values())}")
+    return np.asarray(encoded, dtype=np.int64)
+
+
+def load_dataset(path, label):
+    """``(features DataFrame in EXPECTED_COLUMNS order, encoded labels)`` from a CSV/Parquet file."""
+    import pandas as pd
+
+    from batch_score import detect_format
+
+    df = pd.read_csv(path) if detect_format(path) == "csv" else pd.read_parquet(path)
+    missing = [col for col in EXPECTED_COLUMNS + [label] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    # Kept as a DataFrame so the forest records feature_names_in_, which ModelManager validates
+    return df[EXPECTED_COLUMNS].astype(np.float32), encode_labels(df[label].tolist())
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_keys(X):
+    """One 64-bit hash per feature row of ``X``, for matching rows across files."""
+    import pandas as pd
+
+    return pd.util.hash_pandas_object(X, index=False).to_numpy()
+
+
+def base_overlap(version_dir, metadata, X):
+    """Rows of ``X`` that also trained the forest of ``version_dir`` or one of its ancestors.
+
+    Returns ``None`` when that cannot be checked because an ancestor's
+    training file is gone or has changed since it was trained on.
+    """
+    keys = row_keys(X)
+    seen = np.zeros(len(keys), dtype=bool)
+    models_dir = os.path.dirname(os.path.abspath(version_dir))
+    while True:
+        dataset = metadata.get("dataset")
+        if not dataset or not os.path.exists(dataset["path"]) or file_sha256(dataset["path"]) != dataset["sha256"]:
+            return None
+        seen |= np.isin(keys, row_keys(load_dataset(dataset["path"], dataset["label"])[0]))
+        if metadata.get("parent_version") is None:
+            return int(seen.sum())
+        metadata_path = os.path.join(models_dir, metadata["parent_version"], "metadata.json")
+        if not os.path.exists(metadata_path):
+            return None
+        with open(metadata_path) as file:
+            metadata = json.load(file)
+
+
+def new_forest(params, n_jobs, random_state):
+    from sklearn.ensemble import RandomForestClassifier
+
+    return RandomForestClassifier(**params, n_jobs=n_jobs, random_state=random_state)
+
+
+def grow(base, add_trees, n_jobs):
+    """Copy of fitted forest ``base`` that will grow ``add_trees`` more trees on its next ``fit``."""
+    forest = copy.deepcopy(base)
+    forest.set_params(warm_start=True, n_estimators=base.n_estimators + add_trees, n_jobs=n_jobs)
+    return forest
+
+
+def _fit_and_score(make_forest, X, y, train, test):
+    # One cross-validation fold; runs in a joblib worker with a single-threaded forest
+    from sklearn.metrics import accuracy_score, f1_score
+
+    forest = make_forest()
+    start = time.perf_counter()
+    forest.fit(X.iloc[train], y[train])
+    fit_seconds = time.perf_counter() - start
+    predicted = forest.predict(X.iloc[test])
+    return {
+        "accuracy": float(accuracy_score(y[test], predicted)),
+        "f1_macro": float(f1_score(y[test], predicted, average="macro")),
+        "fit_seconds": fit_seconds,
+    }
+
+
+def cross_validate(make_forest, X, y, folds=5, n_jobs=-1, random_state=0):
+    """Score ``make_forest()`` on stratified folds, one fold per core at a time.
+
+    Returns the per-fold scores and their mean and standard deviation.
+    """
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import StratifiedKFold
+
+    splits = StratifiedKFold(folds, shuffle=True, random_state=random_state).split(np.zeros(len(y)), y)
+    scores = Parallel(n_jobs=n_jobs)(delayed(_fit_and_score)(make_forest, X, y, train, test)
+                                     for train, test in splits)
+    summary = {"folds": scores}
+    for metric in ("accuracy", "f1_macro"):
+        values = [fold[metric] for fold in scores]
+        summary[metric] = {"mean": float(np.mean(values)), "std": float(np.std(values))}
+    return summary
+
+
+def next_version_name(models_dir):
+    versions = [int(name[1:]) for name in os.listdir(models_dir)
+                if name.startswith("v") and name[1:].isdigit()] if os.path.isdir(models_dir) else []
+    return f"v{max(versions, default=0) + 1:03d}"
+
+
+def publish(forest, metadata, models_dir=MODELS_DIR):
+    """Write ``forest`` and ``metadata`` as the next version directory; returns its path.
+
+    The files are written to a staging directory beside ``models_dir`` and
+    the directory is renamed into place, so a watching ``ModelManager`` never
+    sees a half-written version.
+    """
+    import sklearn
+
+    from forest_engine import compile_forest
+
+    os.makedirs(models_dir, exist_ok=True)
+    version = next_version_name(models_dir)
+    staging = tempfile.mkdtemp(prefix=f".{version}-", dir=os.path.dirname(os.path.abspath(models_dir)))
+    try:
+        with open(os.path.join(staging, "model.pkl"), "wb") as file:
+            pickle.dump(forest, file, protocol=pickle.HIGHEST_PROTOCOL)
+        compile_forest(forest).save_mapped(os.path.join(staging, "model.rfm"))
+        metadata = {
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "feature_names": EXPECTED_COLUMNS,
+            "classes": {str(int(cls)): RISK_MAPPING[int(cls)] for cls in forest.classes_},
+            "sklearn_version": sklearn.__version__,
+            "numpy_version": np.__version__,
+            "python_version": platform.python_version(),
+            **metadata,
+        }
+        with open(os.path.join(staging, "metadata.json"), "w") as file:
+            json.dump(metadata, file, indent=2)
+        target = os.path.join(models_dir, version)
+        os.chmod(staging, 0o755)  # mkdtemp creates it private to this user
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return target
+
+
+def load_version(path):
+    """The fitted sklearn forest and metadata of a version directory written by ``publish``."""
+    with open(os.path.join(path, "model.pkl"), "rb") as file:
+        forest = pickle.load(file)
+    with open(os.path.join(path, "metadata.json")) as file:
+        return forest, json.load(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the risk forest and publish a new model version.")
+    parser.add_argument("input", help="CSV/Parquet file with EXPECTED_COLUMNS and a label column")
+    parser.add_argument("--label", default="Level", help="label column (default: %(default)s)")
+    parser.add_argument("--models-dir", default=MODELS_DIR, help="versioned model directory (default: %(default)s)")
+    parser.add_argument("--trees", type=int, default=DEFAULT_PARAMS["n_estimators"], help="trees in a new forest")
+    parser.add_argument("--max-depth", type=int, default=DEFAULT_PARAMS["max_depth"])
+    parser.add_argument("--warm-start", metavar="VERSION_DIR",
+                        help="grow an existing version instead of training from scratch")
+    parser.add_argument("--add-trees", type=int, default=100, help="trees to add with --warm-start")
+    parser.add_argument("--cv-folds", type=int, default=5, help="cross-validation folds (0 skips)")
+    parser.add_argument("--jobs", type=int, default=-1, help="cores for tree building and folds (-1: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    X, y = load_dataset(args.input, args.label)
+    parent = None
+    if args.warm_start:
+        base, parent = load_version(args.warm_start)
+        # New trees must learn the same class columns the base forest averages them with
+        base_classes, new_classes = {int(cls) for cls in base.classes_}, {int(cls) for cls in np.unique(y)}
+        if new_classes != base_classes:
+            names = lambda classes: ", ".join(RISK_MAPPING[cls] for cls in sorted(classes))
+            parser.error(f"--warm-start {parent['version']} was trained on {names(base_classes)} but "
+                         f"{args.input} has {names(new_classes)}; warm starting needs the same classes")
+        params = {name: base.get_params()[name] for name in DEFAULT_PARAMS}
+        params["n_estimators"] = base.n_estimators + args.add_trees
+        make_fold_forest = partial(grow, base, args.add_trees, 1)
+        forest = grow(base, args.add_trees, n_jobs=args.jobs)
+    else:
+        params = dict(DEFAULT_PARAMS, n_estimators=args.trees, max_depth=args.max_depth)
+        make_fold_forest = partial(new_forest, params, 1, args.seed)
+        forest = new_forest(params, args.jobs, args.seed)
+
+    cv, cv_seconds = None, None
+    if args.cv_folds > 1:
+        start = time.perf_counter()
+        cv = cross_validate(make_fold_forest, X, y, args.cv_folds, args.jobs, args.seed)
+        cv_seconds = time.perf_counter() - start
+        print(f"{args.cv_folds}-fold CV: accuracy {cv['accuracy']['mean']:.4f} +/- {cv['accuracy']['std']:.4f}, "
+              f"macro F1 {cv['f1_macro']['mean']:.4f} ({cv_seconds:.1f}s)")
+        # A warm-started fold's test rows may have trained the base forest's trees
+        overlap = base_overlap(args.warm_start, parent, X) if parent else 0
+        cv["base_overlap_rows"] = overlap
+        cv["held_out"] = overlap == 0
+        if not cv["held_out"]:
+            seen = (f"cannot check which rows trained {parent['version']} (a training file is gone or changed)"
+                    if overlap is None else f"{overlap:,} of {len(y):,} rows also trained {parent['version']}")
+            print(f"warning: {seen}, so the CV scores are not held out", file=sys.stderr)
+
+    start = time.perf_counter()
+    forest.fit(X, y)
+    training_seconds = time.perf_counter() - start
+    # Stored without the training-time settings, like the shipped artifact
+    forest.set_params(n_jobs=None, warm_start=False)
+    train_accuracy = float(np.mean(forest.predict(X) == y))
+    print(f"Trained {forest.n_estimators} trees on {len(y):,} rows in {training_seconds:.1f}s "
+          f"(training accuracy {train_accuracy:.4f})")
+
+    path = publish(forest, {
+        "params": params,
+        "random_state": args.seed,
+        "parent_version": parent["version"] if parent else None,
+        "dataset": {
+            "path": os.path.abspath(args.input),
+            "sha256": file_sha256(args.input),
+            "rows": len(y),
+            "label": args.label,
+            "class_counts": {RISK_MAPPING[int(cls)]: int(n) for cls, n in zip(*np.unique(y, return_counts=True))},
+        },
+        "metrics": {"train_accuracy": train_accuracy, "cross_validation": cv},
+        "training_seconds": training_seconds,
+        "cross_validation_seconds": cv_seconds,
+        "jobs": args.jobs,
+        "cpu_count": os.cpu_count(),
+    }, args.models_dir)
+    print(f"Published {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""What-if sensitivity sweep for one patient.
+
+Builds every single-feature variation of a patient's inputs (each 1-10
+input at every value, and age at a set of bands) as one matrix and scores
+it in a single forest call, instead of one call per variation. The
+result is small, plain NumPy data, so the app can cache it per patient
+profile.
+"""
+import numpy as np
+
+from inference import EXPECTED_COLUMNS, forest_proba
+
+AGE_BANDS = (20, 30, 40, 50, 60, 70, 80, 90)
+SLIDER_VALUES = tuple(range(1, 11))
+# Every input collected on a 1-10 scale
+SLIDER_COLUMNS = [col for col in EXPECTED_COLUMNS if col not in ("Age", "Gender")]
+
+
+def variation_matrix(features):
+    """One row per single-feature variation of ``features``: age bands first, then each slider 1-10."""
+    features = np.asarray(features, dtype=np.float32)
+    columns = [EXPECTED_COLUMNS.index("Age")] * len(AGE_BANDS)
+    values = list(AGE_BANDS)
+    for col in SLIDER_COLUMNS:
+        columns += [EXPECTED_COLUMNS.index(col)] * len(SLIDER_VALUES)
+        values += SLIDER_VALUES
+    X = np.repeat(features[None, :], len(values), axis=0)
+    X[np.arange(len(values)), columns] = values
+    return X
+
+
+def sweep(model, features):
+    """Score every variation of ``features`` in one forest call.
+
+    Returns ``(age_proba, slider_proba)``: class probabilities of shape
+    ``(len(AGE_BANDS), n_classes)`` for the age bands and
+    ``(len(SLIDER_COLUMNS), 10, n_classes)`` for the sliders, where
+    ``slider_proba[i, v - 1]`` is the patient with ``SLIDER_COLUMNS[i]``
+    set to ``v``.
+    """
+    proba = forest_proba(model, variation_matrix(features))
+    n_ages = len(AGE_BANDS)
+    return proba[:n_ages], proba[n_ages:].reshape(len(SLIDER_COLUMNS), len(SLIDER_VALUES), -1)